@@ -3,9 +3,9 @@
 from flask import Flask
 # Flask-Login: Gerenciamento de sessões de usuário.
 from flask_login import LoginManager
-# Importa as instâncias das extensões (SQLAlchemy, Bootstrap, etc.).
+# Importa as instâncias das extensões (SQLAlchemy, Bootstrap, cache etc.).
 # Presume-se que estas são definidas em um arquivo 'extensions.py'.
-from extensions import db, bootstrap, moment, mail
+from extensions import db, bootstrap, moment, mail, cache, shards, flights
 # os: Módulo para interagir com o sistema operacional, usado aqui para construir caminhos de arquivo.
 import os
 
@@ -24,6 +24,46 @@ login_manager = LoginManager()
 # dentro do blueprint 'auth'.
 login_manager.login_view = 'auth.login'  
 
+# Cria o filtro de buscas negativas por nome de usuário (ver app/lookup_filter.py).
+# Fica antes do despachante porque os modelos, importados por ele, usam o filtro.
+from .lookup_filter import UserLookupFilter
+lookup_filter = UserLookupFilter()
+
+# Cria o despachante da fila de saída de e-mails (tabela 'email_outbox').
+# A importação fica aqui, depois do login_manager, porque o módulo importa os modelos,
+# e os modelos importam o login_manager deste pacote.
+from .outbox import OutboxDispatcher
+outbox = OutboxDispatcher()
+
+# Cria o cache de página inteira para visitantes anônimos (ver app/page_cache.py).
+from .page_cache import PageCache
+page_cache = PageCache()
+
+# Cria o registro estruturado de acessos e eventos de autenticação (ver app/request_log.py).
+from .request_log import RequestLogger
+request_log = RequestLogger()
+
+# Cria a captura anonimizada de tráfego, reproduzida com 'flask traffic-replay' (ver app/traffic.py).
+from .traffic import TrafficCapture
+traffic = TrafficCapture()
+
+# Cria o profiler por amostragem de pilha (ver app/profiler.py).
+from .profiler import RequestProfiler
+profiler = RequestProfiler()
+
+# Cria o rastreador de presença ("online agora") em memória (ver app/presence.py).
+from .presence import PresenceTracker
+presence = PresenceTracker()
+
+# Cria o renderizador de formulários pré-compilados, usado pelos templates no lugar de wtf.quick_form
+# (ver app/form_render.py).
+from .form_render import FormRenderer
+form_renderer = FormRenderer()
+
+# Cria o controle de admissão, que limita a concorrência por classe de requisição (ver app/admission.py).
+from .admission import AdmissionControl
+admission = AdmissionControl()
+
 # Define a função factory 'create_app'.
 def create_app(config_name):
     """
@@ -44,24 +84,61 @@ def create_app(config_name):
     config[config_name].init_app(app)
     
     # --- Inicialização das Extensões ---
-    # Associa as instâncias das extensões (db, bootstrap, moment, mail) com a aplicação 'app'.
+    # Associa as instâncias das extensões (db, bootstrap, moment, mail, cache) com a aplicação 'app'.
     # O método .init_app() permite que as extensões sejam inicializadas separadamente
     # da criação da aplicação, essencial para o padrão factory.
+    # O particionamento abre os engines dos shards adicionais (ver sharding.py).
+    shards.init_app(app)
     db.init_app(app)
     bootstrap.init_app(app)
+    # Registra a função 'quick_form' dos templates (depois do Bootstrap, cuja macro é o fallback).
+    form_renderer.init_app(app)
     moment.init_app(app)
     mail.init_app(app)
+    cache.init_app(app)
+    flights.init_app(app)
     login_manager.init_app(app)
+    # O profiler é o primeiro a registrar seus hooks, para que a amostragem cubra todos os demais.
+    profiler.init_app(app)
+    # O registro de requisições vem antes do cache de página para que a latência
+    # das páginas servidas pelo cache também seja medida.
+    request_log.init_app(app)
+    # A captura de tráfego mede a mesma latência, também para as páginas servidas pelo cache.
+    traffic.init_app(app)
+    # O cache de página é registrado antes dos blueprints para que seu before_request
+    # rode primeiro e possa responder sem executar os demais hooks.
+    page_cache.init_app(app)
+    presence.init_app(app)
+    # Envolve o app.wsgi_app: fica por fora de todos os hooks, inclusive do profiler.
+    admission.init_app(app)
  
     # --- Criação do Banco de Dados ---
     # O 'app_context' garante que a aplicação esteja configurada corretamente
     # antes de interagir com suas extensões, como o banco de dados.
+    # Importa o módulo de busca antes do create_all(): ele registra o DDL do índice FTS5
+    # que é criado junto com a tabela 'users'.
+    from . import search
     with app.app_context():
         # db.create_all() cria todas as tabelas definidas nos modelos (em models.py)
         # que ainda não existem no banco de dados.
         # NOTA: Em produção, é altamente recomendável usar uma ferramenta de migração como Flask-Migrate
         # em vez de create_all() para gerenciar as mudanças no esquema do banco de dados.
         db.create_all()
+    # Acrescenta as colunas novas às tabelas de bancos que já existiam antes delas
+    # (antes da réplica de 'roles' nos shards, que lê todas as colunas).
+    from . import upgrade
+    upgrade.init_app(app)
+    with app.app_context():
+        # Cria as tabelas particionadas (e as réplicas de 'roles') nos shards adicionais.
+        shards.create_all()
+    # Cria o índice de busca em bancos que já existiam antes dele.
+    search.init_app(app)
+
+    # Inicializa o despachante de e-mails depois da criação das tabelas,
+    # já que a thread de envio (se habilitada) começa a ler a tabela 'email_outbox' imediatamente.
+    outbox.init_app(app)
+    # O filtro de buscas negativas lê a tabela 'users' já criada (e os shards).
+    lookup_filter.init_app(app)
 
     # --- Registro dos Blueprints ---
     # Importa o blueprint 'main' e o registra na aplicação.
@@ -75,5 +152,9 @@ def create_app(config_name):
     from .auth import auth as auth_blueprint
     app.register_blueprint(auth_blueprint, url_prefix='/auth')  
 
+    # Importa e registra o blueprint 'api', a API JSON versionada (ex: '/api/v1/me').
+    from .api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+
     # Retorna a instância da aplicação configurada.
     return app
\ No newline at end of file
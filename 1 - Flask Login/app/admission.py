@@ -0,0 +1,173 @@
+# Importa os módulos da biblioteca padrão usados pelo controle de admissão.
+import json
+import threading
+import time
+from collections import Counter, namedtuple
+from functools import partial
+
+# Importa os utilitários do Werkzeug usados para montar a resposta 503 sem passar pelo Flask.
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Request, Response
+from werkzeug.wsgi import ClosingIterator
+
+# Limites de uma classe de requisições: execuções simultâneas, tamanho da fila e espera máxima (segundos).
+ClassLimit = namedtuple('ClassLimit', 'concurrency queue timeout')
+
+
+class AdmissionControl:
+    """
+    Controle de admissão em volta do WSGI da aplicação (app.wsgi_app).
+
+    Cada requisição é classificada antes do roteamento do Flask:
+    - 'static': arquivos estáticos;
+    - 'read': GET/HEAD/OPTIONS (páginas, perfis, logout...);
+    - 'write': demais POSTs;
+    - 'auth': POSTs dos endpoints caros (verificação/geração de hash de senha, envio de e-mail),
+      listados em FLASKY_ADMISSION_HEAVY_ENDPOINTS.
+
+    Cada classe tem um limite de execuções simultâneas e uma fila limitada com tempo de espera.
+    Todas disputam FLASKY_ADMISSION_SLOTS vagas no total (o número de threads do servidor), e a
+    ordem das classes acima é a prioridade: uma vaga livre nunca vai para uma classe enquanto houver
+    requisição de uma classe mais prioritária esperando e podendo rodar. Assim, uma rajada de logins
+    ocupa no máximo as vagas da classe 'auth' e não atrasa o logout nem os arquivos estáticos.
+
+    Com a fila da classe cheia, ou esgotada a espera, a requisição é descartada na hora com
+    503 e o cabeçalho Retry-After, sem chegar à view. stats() retorna os contadores por classe.
+
+    Configuração:
+    - FLASKY_ADMISSION: liga o controle (lido em init_app).
+    - FLASKY_ADMISSION_SLOTS: execuções simultâneas no total.
+    - FLASKY_ADMISSION_LIMITS: {classe: (concorrência, fila, espera)}, mesclado aos padrões.
+    - FLASKY_ADMISSION_RETRY_AFTER: valor (em segundos) do cabeçalho Retry-After.
+    """
+
+    # Classes de requisições, da mais para a menos prioritária.
+    PRIORITIES = ('static', 'read', 'write', 'auth')
+
+    DEFAULT_LIMITS = {
+        'static': (8, 64, 1.0),
+        'read': (8, 32, 2.0),
+        'write': (4, 16, 5.0),
+        'auth': (2, 8, 5.0),
+    }
+
+    def __init__(self, app=None):
+        self.slots = 8
+        self.limits = {name: ClassLimit(*limit) for name, limit in self.DEFAULT_LIMITS.items()}
+        self.retry_after = 1
+        self._heavy = frozenset()
+        self._condition = threading.Condition()
+        self._running = 0
+        self._active = Counter()
+        self._waiting = Counter()
+        self._admitted = Counter()
+        self._shed = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_ADMISSION', False)
+        app.config.setdefault('FLASKY_ADMISSION_SLOTS', 8)
+        app.config.setdefault('FLASKY_ADMISSION_LIMITS', {})
+        app.config.setdefault('FLASKY_ADMISSION_RETRY_AFTER', 1)
+        app.config.setdefault('FLASKY_ADMISSION_HEAVY_ENDPOINTS', (
+            'auth.login', 'auth.register', 'auth.password_reset_request', 'auth.password_reset',
+            'api.get_token'))
+        app.extensions['admission'] = self
+        if not app.config['FLASKY_ADMISSION']:
+            return
+        limits = dict(self.DEFAULT_LIMITS, **app.config['FLASKY_ADMISSION_LIMITS'])
+        self.limits = {name: ClassLimit(*limits[name]) for name in self.PRIORITIES}
+        self.slots = app.config['FLASKY_ADMISSION_SLOTS']
+        self.retry_after = app.config['FLASKY_ADMISSION_RETRY_AFTER']
+        self._heavy = frozenset(app.config['FLASKY_ADMISSION_HEAVY_ENDPOINTS'])
+        # Envolve o WSGI da aplicação: o descarte acontece antes de qualquer hook do Flask.
+        app.wsgi_app = partial(self._middleware, app, app.wsgi_app)
+
+    def classify(self, app, environ):
+        """Retorna a classe da requisição a partir do método e do endpoint da rota."""
+        try:
+            endpoint, _ = app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            endpoint = None
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if endpoint is not None and endpoint.rpartition('.')[2] == 'static':
+            return 'static'
+        if method in ('GET', 'HEAD', 'OPTIONS'):
+            return 'read'
+        return 'auth' if endpoint in self._heavy else 'write'
+
+    def acquire(self, name):
+        """Espera uma vaga para a classe. Retorna False se a requisição deve ser descartada."""
+        limit = self.limits[name]
+        deadline = time.monotonic() + limit.timeout
+        with self._condition:
+            if not self._can_run(name):
+                if self._waiting[name] >= limit.queue:
+                    self._shed[name] += 1
+                    return False
+                self._waiting[name] += 1
+                try:
+                    while not self._can_run(name):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._shed[name] += 1
+                            return False
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting[name] -= 1
+            self._running += 1
+            self._active[name] += 1
+            self._admitted[name] += 1
+            return True
+
+    def release(self, name):
+        """Devolve a vaga da classe e acorda as requisições na fila."""
+        with self._condition:
+            self._running -= 1
+            self._active[name] -= 1
+            self._condition.notify_all()
+
+    def _can_run(self, name):
+        # Chamado com o lock adquirido.
+        if self._running >= self.slots or self._active[name] >= self.limits[name].concurrency:
+            return False
+        # Uma classe mais prioritária com requisições na fila (e vaga na própria classe) passa na frente.
+        for other in self.PRIORITIES[:self.PRIORITIES.index(name)]:
+            if self._waiting[other] and self._active[other] < self.limits[other].concurrency:
+                return False
+        return True
+
+    def stats(self):
+        """Retorna, por classe, as requisições em execução, na fila, admitidas, descartadas e os limites."""
+        with self._condition:
+            classes = {name: {'active': self._active[name], 'waiting': self._waiting[name],
+                              'admitted': self._admitted[name], 'shed': self._shed[name],
+                              'concurrency': self.limits[name].concurrency,
+                              'queue': self.limits[name].queue, 'timeout': self.limits[name].timeout}
+                       for name in self.PRIORITIES}
+            return {'slots': self.slots, 'running': self._running, 'classes': classes}
+
+    def _middleware(self, app, wsgi_app, environ, start_response):
+        name = self.classify(app, environ)
+        if not self.acquire(name):
+            return self._reject(name, environ, start_response)
+        try:
+            iterable = wsgi_app(environ, start_response)
+        except BaseException:
+            self.release(name)
+            raise
+        # A vaga só é devolvida quando o servidor termina de enviar o corpo da resposta.
+        return ClosingIterator(iterable, partial(self.release, name))
+
+    def _reject(self, name, environ, start_response):
+        # Resposta mínima, sem sessão nem templates: descartar tem que ser mais barato que atender.
+        accept = Request(environ).accept_mimetypes
+        headers = {'Retry-After': str(self.retry_after), 'X-Admission-Class': name}
+        if accept.accept_json and not accept.accept_html:
+            response = Response(json.dumps({'error': 'service unavailable', 'class': name}),
+                                status=503, mimetype='application/json', headers=headers)
+        else:
+            response = Response('Servidor sobrecarregado. Tente novamente em instantes.',
+                                status=503, mimetype='text/plain', headers=headers)
+        return response(environ, start_response)
@@ -0,0 +1,10 @@
+# Importa a classe Blueprint do Flask para modularizar a aplicação.
+from flask import Blueprint
+
+# Cria o blueprint 'api': a API JSON versionada, registrada em '/api/v1' (ver create_app).
+# Os clientes da API (serviços internos) não usam sessão, cookies nem formulários:
+# autenticam-se com um token assinado no cabeçalho 'Authorization: Bearer <token>'.
+api = Blueprint('api', __name__)
+
+# Importa os módulos do blueprint no final para evitar dependências circulares.
+from . import authentication, errors, users
@@ -0,0 +1,66 @@
+# Importa os objetos do Flask usados na autenticação da API.
+from flask import current_app, g, jsonify, request
+# Importa o blueprint 'api' e as respostas de erro.
+from . import api
+from .errors import unauthorized, forbidden, bad_request
+# Importa o modelo de usuário e o registro de eventos de autenticação.
+from app.models import User
+from app import request_log
+
+
+class TokenIdentity:
+    """
+    Identidade do cliente da API, montada apenas a partir do conteúdo do token assinado.
+    Oferece a mesma verificação de permissões do User (can), sem carregar o usuário do banco.
+    """
+
+    __slots__ = ('id', 'permissions', 'confirmed')
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.permissions = data['perm']
+        self.confirmed = data['confirmed']
+
+    def can(self, perm):
+        return self.permissions & perm == perm
+
+
+# Autentica todas as rotas da API, exceto a emissão de tokens.
+# A verificação é só da assinatura e da validade do token: nenhuma sessão ou consulta ao banco.
+@api.before_request
+def authenticate():
+    if request.endpoint == 'api.get_token':
+        return
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return unauthorized('token de acesso ausente')
+    data = User.verify_auth_token(token.strip())
+    if data is None:
+        return unauthorized('token de acesso inválido ou expirado')
+    g.api_identity = TokenIdentity(data)
+    # Assim como nas páginas, contas não confirmadas não têm acesso.
+    if not g.api_identity.confirmed:
+        return forbidden('conta não confirmada')
+
+
+# Emite um token de acesso. As credenciais vêm por HTTP Basic (email:senha) ou em um corpo JSON
+# {"email": ..., "password": ...}. A senha é verificada uma única vez, aqui; as requisições
+# seguintes usam apenas o token.
+@api.route('/tokens', methods=['POST'])
+def get_token():
+    if request.authorization is not None and request.authorization.type == 'basic':
+        email = request.authorization.username
+        password = request.authorization.password
+    else:
+        data = request.get_json(silent=True) or {}
+        email, password = data.get('email'), data.get('password')
+    if not email or not password:
+        return bad_request('informe email e senha')
+    # O id do usuário vem do cache de e-mails (ver User.id_by_email).
+    user = User.get_by_email(email)
+    if user is None or not user.verify_password(password):
+        request_log.auth_event('api_token', ok=False)
+        return unauthorized('e-mail ou senha inválidos')
+    request_log.auth_event('api_token', ok=True, user_id=user.id)
+    return jsonify({'token': user.generate_auth_token(),
+                    'expiration': current_app.config['FLASKY_API_TOKEN_EXPIRATION']})
@@ -0,0 +1,37 @@
+# Importa jsonify para montar as respostas de erro em JSON.
+from flask import jsonify
+# Importa o blueprint 'api'.
+from . import api
+
+
+# Respostas de erro da API. Sempre em JSON, no formato {"error": ..., "message": ...}.
+def bad_request(message):
+    response = jsonify({'error': 'bad request', 'message': message})
+    response.status_code = 400
+    return response
+
+
+def unauthorized(message):
+    response = jsonify({'error': 'unauthorized', 'message': message})
+    response.status_code = 401
+    # Indica ao cliente o esquema de autenticação esperado.
+    response.headers['WWW-Authenticate'] = 'Bearer realm="flasky"'
+    return response
+
+
+def forbidden(message):
+    response = jsonify({'error': 'forbidden', 'message': message})
+    response.status_code = 403
+    return response
+
+
+def not_found(message):
+    response = jsonify({'error': 'not found', 'message': message})
+    response.status_code = 404
+    return response
+
+
+# Erros 404 levantados pelas views da API (ex: usuário inexistente) também respondem em JSON.
+@api.errorhandler(404)
+def resource_not_found(e):
+    return not_found('recurso não encontrado')
@@ -0,0 +1,138 @@
+# Importa os objetos do Flask usados pelas rotas da API.
+from flask import abort, current_app, g, has_app_context, jsonify, request, url_for
+# Importa o evento de execução do SQLAlchemy, usado para contar as consultas de cada requisição.
+from sqlalchemy import event, or_
+from sqlalchemy.engine import Engine
+# Importa as opções de carregamento: apenas as colunas usadas e o papel na mesma consulta.
+from sqlalchemy.orm import joinedload, load_only
+# Importa o blueprint 'api'.
+from . import api
+# Importa a instância do banco de dados, o particionamento de usuários e os modelos.
+from app import db, shards
+from app.models import User, Role, Permission
+from .errors import bad_request, forbidden
+
+
+# Formata datas como ISO 8601 em UTC (o mesmo formato usado pelo Flask-Moment nas páginas).
+def _iso(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ') if value else None
+
+
+# Dados do cliente autenticado, lidos só do token (sem consulta ao banco).
+@api.route('/me')
+def get_me():
+    identity = g.api_identity
+    return jsonify({'id': identity.id,
+                    'permissions': identity.permissions,
+                    'url': url_for('api.get_user', id=identity.id)})
+
+
+# Verifica se o cliente autenticado tem uma permissão (ex: /api/v1/me/can/moderate).
+# Também sem consulta ao banco: os bits de permissão estão no token.
+@api.route('/me/can/<permission>')
+def can(permission):
+    name = permission.upper()
+    perm = Permission.all().get(name)
+    if perm is None:
+        abort(404)
+    return jsonify({'permission': name, 'granted': g.api_identity.can(perm)})
+
+
+# Conta as consultas SQL executadas durante a requisição, quando a rota pediu a contagem
+# (g.query_count existe). Fora disso, o custo é uma verificação por consulta.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and 'query_count' in g:
+        g.query_count += 1
+
+
+# Consulta de perfis: só as colunas da resposta e o nome do papel, em um único SELECT (com JOIN).
+def _profiles():
+    return db.select(User).options(
+        load_only(User.id, User.email, User.name, User.location, User.about_me,
+                  User.member_since, User.last_seen),
+        joinedload(User.role).load_only(Role.name))
+
+
+# Serializa o perfil. O e-mail só é incluído para administradores, como na página de perfil.
+def _profile_json(user, admin):
+    data = {'id': user.id,
+            'name': user.name,
+            'location': user.location,
+            'about_me': user.about_me,
+            'role': user.role.name if user.role is not None else None,
+            'member_since': _iso(user.member_since),
+            'last_seen': _iso(user.last_seen),
+            'url': url_for('api.get_user', id=user.id)}
+    if admin:
+        data['email'] = user.email
+    return data
+
+
+# Perfil de um usuário. Uma consulta pela chave primária, carregando só as colunas do perfil.
+@api.route('/users/<int:id>')
+def get_user(id):
+    with shards.route_id(id):
+        user = db.session.execute(_profiles().filter_by(id=id)).unique().scalar_one_or_none()
+    if user is None:
+        abort(404)
+    return jsonify(_profile_json(user, g.api_identity.can(Permission.ADMIN)))
+
+
+# Perfis de vários usuários de uma vez: /api/v1/users?ids=1,2,3 e/ou ?emails=a@x.com,b@x.com
+# (a busca por e-mail é restrita a administradores). Todos os perfis vêm de um único SELECT
+# com IN (um por shard envolvido, com o particionamento ligado); a resposta mantém a ordem pedida e lista em 'missing' o que não foi encontrado.
+# A resposta tem ETag: um cliente que reenviar o ETag em If-None-Match recebe 304 sem corpo
+# se nada mudou. O cabeçalho X-Query-Count informa quantas consultas o lote custou.
+@api.route('/users')
+def get_users():
+    g.query_count = 0
+    admin = g.api_identity.can(Permission.ADMIN)
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return bad_request('ids deve ser uma lista de inteiros separados por vírgula')
+    emails = [e.strip() for e in request.args.get('emails', '').split(',') if e.strip()]
+    if emails and not admin:
+        return forbidden('a busca por e-mail é restrita a administradores')
+    if not ids and not emails:
+        return bad_request('informe ids ou emails')
+    limit = current_app.config['FLASKY_API_BATCH_LIMIT']
+    if len(ids) + len(emails) > limit:
+        return bad_request(f'no máximo {limit} usuários por requisição')
+
+    # Uma consulta por shard envolvido (uma só, sem particionamento).
+    groups = {}
+    for shard, shard_ids in shards.group_ids(ids).items():
+        groups.setdefault(shard, ([], []))[0].extend(shard_ids)
+    for email in emails:
+        groups.setdefault(shards.shard_of_key(email) if shards.enabled else None, ([], []))[1].append(email)
+    users = []
+    for shard, (shard_ids, shard_emails) in groups.items():
+        conditions = []
+        if shard_ids:
+            conditions.append(User.id.in_(shard_ids))
+        if shard_emails:
+            conditions.append(User.email.in_(shard_emails))
+        if not conditions:
+            continue
+        with shards.route(shard):
+            users += db.session.execute(_profiles().where(or_(*conditions))).unique().scalars().all()
+    by_id = {u.id: u for u in users}
+    by_email = {u.email: u for u in users}
+
+    # Ordem pedida, sem repetições.
+    result, missing, seen = [], [], set()
+    for key, found in [(i, by_id.get(i)) for i in ids] + [(e, by_email.get(e)) for e in emails]:
+        if found is None:
+            missing.append(key)
+        elif found.id not in seen:
+            seen.add(found.id)
+            result.append(_profile_json(found, admin))
+
+    response = jsonify({'users': result, 'missing': missing})
+    response.headers['X-Query-Count'] = str(g.pop('query_count'))
+    # A resposta depende de quem pergunta (e-mails para administradores): cache apenas privado.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
@@ -1,8 +1,7 @@
 # Importa as classes e funções necessárias
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError
-from app.models import User
+from wtforms.validators import DataRequired, Length, Email, EqualTo
 
 # Define o formulário de login do usuário
 class LoginForm(FlaskForm):
@@ -56,10 +55,7 @@ class RegistrationForm(FlaskForm):
     # Botão para submeter o formulário de registro.
     submit = SubmitField('Registrar')
 
-    # Validador customizado para o campo 'email'.
-    # Este método é invocado automaticamente pelo WTForms durante a validação do formulário.
-    def validate_email(self, field):
-        # Verifica no banco de dados se já existe um usuário com o e-mail fornecido.
-        if User.query.filter_by(email=field.data).first():
-            # Se o e-mail já estiver em uso, lança um erro de validação com uma mensagem.
-            raise ValidationError('O e-mail já está em uso.')
\ No newline at end of file
+    # Não há validador de unicidade do e-mail: uma consulta prévia custaria uma ida ao banco
+    # e ainda deixaria uma janela para corrida entre dois registros simultâneos. A unicidade
+    # é garantida pelo índice único de 'users.email', e a view de registro converte a
+    # violação (IntegrityError) em erro deste formulário.
@@ -1,26 +1,32 @@
+# Importa uuid para gerar a chave de idempotência do e-mail de confirmação.
+import uuid
 # Importa as funções e classes necessárias do Flask, Flask-Login e de outros módulos da aplicação.
-from flask import render_template, redirect, request, url_for, flash
+from flask import render_template, redirect, request, url_for, flash, current_app, session
 from flask_login import login_user, logout_user, login_required, current_user
+# Importa a exceção lançada quando uma restrição do banco (ex: e-mail único) é violada.
+from sqlalchemy.exc import IntegrityError
 # Importa o blueprint 'auth' para registrar as rotas de autenticação.
 from . import auth
-# Importa o modelo de usuário.
-from app.models import User
+# Importa o modelo de usuário e a identidade enxuta usada como current_user.
+from app.models import User, Identity
 # Importa a instância do LoginManager para o user_loader.
 from app import login_manager
 # Importa os formulários de autenticação.
 from app.auth.forms import LoginForm, RegistrationForm, PasswordResetRequestForm, PasswordResetForm
-# Importa a instância do banco de dados.
-from app import db
-# Importa a função de envio de e-mail.
-from app.email import send_email
+# Importa a instância do banco de dados, o registro de eventos de autenticação e o rastreador de presença.
+from app import db, request_log, presence
+# Importa as funções de envio de e-mail (imediato e adiado).
+from app.email import defer_email, email_context, request_email, COALESCED, THROTTLED
 
 # Define uma função a ser executada antes de cada requisição na aplicação.
 @auth.before_app_request
 def before_request():
     # Verifica se o usuário está autenticado.
     if current_user.is_authenticated:
-        # Atualiza o timestamp de 'última vez visto' do usuário.
-        current_user.ping()
+        # Registra a atividade no rastreador de presença. O timestamp de 'última vez visto'
+        # só é atualizado (com um commit) na primeira requisição do usuário em cada minuto.
+        if presence.record(current_user.id):
+            current_user.ping()
         # Se o usuário estiver autenticado, mas não tiver confirmado sua conta,
         # e a requisição não for para uma rota de autenticação ('auth') ou um arquivo estático,
         # ele é redirecionado para a página de 'não confirmado'.
@@ -41,13 +47,22 @@ def register():
         user = User(email=form.email.data,
                     name=form.name.data,
                     password=form.password.data)
-        # Adiciona o novo usuário à sessão do banco de dados e commita.
         db.session.add(user)
-        db.session.commit()
-        # Gera um token de confirmação para o novo usuário.
-        token = user.generate_confirmation_token()
-        # Envia um e-mail de confirmação para o usuário.
-        send_email(user.email, 'Confirme sua conta', 'auth/email/confirm', user=user, token=token)
+        # Enfileira o e-mail de confirmação sem gerar o token nem renderizar os templates:
+        # isso é feito pelo despachante depois do commit, fora do tempo de resposta.
+        # A mensagem é gravada na mesma transação do usuário: ou os dois existem, ou nenhum.
+        # A chave é aleatória porque a unicidade já é garantida pelo e-mail do usuário.
+        defer_email(user.email, 'Confirme sua conta', 'auth/email/confirm',
+                    idempotency_key=uuid.uuid4().hex, email=user.email)
+        try:
+            # Um único INSERT do usuário (e um da mensagem) e o commit, sem consulta prévia.
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not _is_duplicate_email(e):
+                raise
+            form.email.errors.append('O e-mail já está em uso.')
+            return render_template('auth/register.html', form=form)
         # Exibe uma mensagem flash para o usuário.
         flash('Um e-mail de confirmação foi enviado para você por e-mail.')
         # Redireciona para a página inicial.
@@ -55,6 +70,30 @@ def register():
     # Se for uma requisição GET ou o formulário for inválido, renderiza o template de registro.
     return render_template('auth/register.html', form=form)
 
+# Indica se a violação de integridade veio do índice único de 'users.email'
+# (a mensagem varia com o banco: 'users.email' no SQLite, 'ix_users_email' no PostgreSQL e no MySQL).
+def _is_duplicate_email(error):
+    message = str(error.orig)
+    return 'users.email' in message or 'ix_users_email' in message
+
+# Monta o contexto do e-mail de confirmação adiado (ver defer_email). Executada pelo despachante.
+@email_context('auth/email/confirm')
+def confirm_email_context(email):
+    user = User.get_by_email(email)
+    return dict(user=user, token=user.generate_confirmation_token())
+
+# Monta o contexto do e-mail de redefinição de senha adiado. Executada pelo despachante.
+@email_context('auth/email/reset_password')
+def reset_email_context(email):
+    user = User.get_by_email(email)
+    return dict(user=user, token=user.generate_reset_token())
+
+# Mensagens exibidas quando um pedido de e-mail não gera uma mensagem nova (ver request_email).
+_REQUEST_EMAIL_MESSAGES = {
+    COALESCED: 'O e-mail já foi enviado há poucos minutos. Verifique sua caixa de entrada (e a de spam).',
+    THROTTLED: 'Muitos e-mails foram enviados para este endereço. Tente novamente mais tarde.',
+}
+
 @auth.route('/confirm/<token>')
 @login_required
 def confirm(token):
@@ -65,20 +104,23 @@ def confirm(token):
     if current_user.confirm(token):
         # Se a confirmação for bem-sucedida, commita a mudança no banco.
         db.session.commit()
+        request_log.auth_event('confirm', ok=True, user_id=current_user.id)
         flash('Você confirmou sua conta. Obrigado!')
     else:
         # Se o token for inválido ou expirado, informa o usuário.
+        request_log.auth_event('confirm', ok=False, user_id=current_user.id)
         flash('O link de confirmação é inválido ou expirou.')
     return redirect(url_for('main.index'))
 
 @auth.route('/confirm')
 @login_required
 def resend_confirmation():
-    # Gera um novo token de confirmação para o usuário logado.
-    token = current_user.generate_confirmation_token()
-    # Envia o novo e-mail de confirmação.
-    send_email(current_user.email, 'Confirme sua conta', 'auth/email/confirm', user=current_user, token=token)
-    flash('Um novo e-mail de confirmação foi enviado para você por e-mail.')
+    # Pede o e-mail de confirmação (o token é gerado pelo despachante, no envio) e commita.
+    # Cliques repetidos dentro da janela são agrupados na mensagem já enfileirada.
+    result = request_email(current_user.email, 'Confirme sua conta', 'auth/email/confirm',
+                           email=current_user.email)
+    db.session.commit()
+    flash(_REQUEST_EMAIL_MESSAGES.get(result, 'Um novo e-mail de confirmação foi enviado para você por e-mail.'))
     return redirect(url_for('main.index'))
 
 @auth.route('/reset/<token>', methods=['GET', 'POST'])
@@ -92,10 +134,12 @@ def password_reset(token):
         # Tenta redefinir a senha usando o token e a nova senha do formulário.
         if User.reset_password(token, form.password.data):
             db.session.commit()
+            request_log.auth_event('password_reset', ok=True)
             flash('Sua senha foi atualizada.')
             return redirect(url_for('auth.login'))
         else:
             # Se o token for inválido, redireciona para a página inicial.
+            request_log.auth_event('password_reset', ok=False)
             return redirect(url_for('main.index'))
     return render_template('auth/reset_password.html', form=form)
 
@@ -107,13 +151,16 @@ def password_reset_request():
     # Instancia o formulário de solicitação de redefinição de senha.
     form = PasswordResetRequestForm()
     if form.validate_on_submit():
-        # Procura o usuário pelo e-mail fornecido no formulário.
-        user = User.query.filter_by(email=form.email.data).first()
+        # Procura o usuário pelo e-mail fornecido no formulário (o id vem do cache).
+        user = User.get_by_email(form.email.data)
         if user:
-            # Se o usuário existir, gera um token de reset e envia o e-mail.
-            token = user.generate_reset_token()
-            send_email(user.email, 'Redefina sua senha', 'auth/email/reset_password', user=user, token=token)
-            flash('Um e-mail com instruções para redefinir sua senha foi enviado para você.')
+            # Se o usuário existir, pede o e-mail (o token é gerado pelo despachante, no envio).
+            # Pedidos repetidos dentro da janela são agrupados na mensagem já enfileirada.
+            result = request_email(user.email, 'Redefina sua senha', 'auth/email/reset_password',
+                                   email=user.email)
+            db.session.commit()
+            flash(_REQUEST_EMAIL_MESSAGES.get(
+                result, 'Um e-mail com instruções para redefinir sua senha foi enviado para você.'))
             return redirect(url_for('auth.login'))
         else:
             # Se o e-mail não for encontrado, informa o usuário.
@@ -135,12 +182,13 @@ def login():
     # Instancia o formulário de login.
     form = LoginForm()
     if form.validate_on_submit():
-        # Procura o usuário pelo e-mail fornecido.
-        user = User.query.filter_by(email=form.email.data).first()
+        # Procura o usuário pelo e-mail fornecido (o id vem do cache).
+        user = User.get_by_email(form.email.data)
         # Verifica se o usuário existe e se a senha está correta.
         if user is not None and user.verify_password(form.password.data):
             # Realiza o login do usuário com a ajuda do Flask-Login.
             login_user(user, form.remember_me.data)
+            request_log.auth_event('login', ok=True, user_id=user.id)
             # Obtém a URL da página que o usuário tentava acessar antes do login (se houver).
             next = request.args.get('next') 
             # Se não houver 'next' ou se for um link inseguro, redireciona para a página inicial.
@@ -148,6 +196,7 @@ def login():
                 next = url_for('main.index')
             return redirect(next)
         # Se o e-mail ou senha estiverem incorretos, exibe uma mensagem de erro.
+        request_log.auth_event('login', ok=False)
         flash('E-mail ou senha inválidos.')
     # Renderiza o template de login com o formulário.
     return render_template('auth/login.html', form=form)
@@ -156,13 +205,29 @@ def login():
 @auth.route('/logout')
 @login_required
 def logout():
+    # Guarda o id antes de deslogar, para o registro do evento.
+    user_id = current_user.id
     # Desloga o usuário com a função do Flask-Login.
     logout_user()
+    session.pop('_claims', None)
+    request_log.auth_event('logout', ok=True, user_id=user_id)
     flash('Você saiu do sistema.')
     return redirect(url_for('main.index'))
 
-# Callback do Flask-Login para recarregar o objeto do usuário a partir do ID armazenado na sessão.
+# Callback do Flask-Login para recarregar o usuário a partir do ID armazenado na sessão.
+# Retorna uma Identity (só as colunas de autenticação e autorização), ou None se o usuário não existir.
+# Com FLASKY_SESSION_CLAIMS ligado, a identidade vem das claims assinadas guardadas na sessão; o banco
+# só é consultado quando elas faltam, expiram ou ficam desatualizadas (versão incrementada), e então
+# as claims são regravadas.
 @login_manager.user_loader    
 def load_user(user_id):
-    # Retorna o usuário correspondente ao ID, ou None se não for encontrado.
-    return User.query.get(int(user_id))
\ No newline at end of file
+    user_id = int(user_id)
+    claims_enabled = current_app.config['FLASKY_SESSION_CLAIMS']
+    if claims_enabled:
+        identity = Identity.from_claims(session.get('_claims'), user_id)
+        if identity is not None:
+            return identity
+    identity = Identity.load(user_id)
+    if claims_enabled and identity is not None:
+        session['_claims'] = identity.to_claims()
+    return identity
\ No newline at end of file
@@ -1,54 +1,215 @@
-# Importa a instância do Flask-Mail, presumivelmente definida em extensions.py.
-from extensions import mail
-# Importa a classe Message para criar objetos de e-mail.
-from flask_mail import Message
+# Importa hashlib para derivar as chaves de idempotência das mensagens adiadas e pedidas.
+import hashlib
+# Importa json para guardar o contexto das mensagens adiadas.
+import json
+# Importa uuid para gerar as chaves das mensagens que não devem ser agrupadas.
+import uuid
+# Importa datetime e timedelta para as janelas de agrupamento e de cota.
+from datetime import datetime, timedelta
+# Importa os construtores de consulta do SQLAlchemy.
+from sqlalchemy import select, update
+# Importa os INSERTs com ON CONFLICT do SQLite e do PostgreSQL e a exceção de violação de integridade.
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 # Importa current_app para acessar a instância da aplicação e render_template para criar o corpo do e-mail a partir de arquivos de template.
-from flask import current_app, render_template
-# Importa a classe Thread para executar o envio de e-mail em uma thread separada (de forma assíncrona).
-from threading import Thread
+from flask import current_app, render_template, request
+# Importa a instância do banco de dados.
+from extensions import db
+# Importa o modelo da fila de saída de e-mails.
+from app.models.outbox import OutboxMessage
 
-# Define a função que será executada na thread de envio.
-def send_async_email(app,msg):
-    """
-    Função auxiliar para envio assíncrono de e-mails.
-    Executa o envio dentro do contexto da aplicação Flask.
-    Isso permite que o envio não bloqueie o fluxo principal da aplicação.
-    """
-    # O 'app_context' é necessário porque o envio de e-mail e a renderização de templates
-    # precisam acessar a configuração da aplicação, o que não está disponível por padrão em uma nova thread.
-    with app.app_context(): 
-        mail.send(msg)
-
-# Função principal para preparar e iniciar o envio de um e-mail.
-def send_email(to, subject, template, **kwargs):
+# Função principal para preparar e enfileirar um e-mail.
+def send_email(to, subject, template, idempotency_key=None, **kwargs):
     """
     Função para envio de e-mails.
     Parâmetros:
     - to: destinatário do e-mail.
     - subject: assunto do e-mail.
     - template: nome base do template (sem .txt ou .html) a ser usado para o corpo do e-mail.
+    - idempotency_key: chave opcional que identifica a mensagem. Para que envios repetidos
+      (ex: um duplo clique) resultem em uma única mensagem, informe uma chave estável, montada
+      por quem chamou (ex: f'confirm:{user.id}'). Se omitida, cada chamada gera uma mensagem nova:
+      o corpo não serve de chave, porque inclui valores gerados a cada chamada (ex: tokens).
     - **kwargs: argumentos de palavras-chave a serem passados para o template (ex: user=user, token=token).
 
-    Cria a mensagem, define remetente e dispara o envio em uma thread separada.
-    O uso de threads evita que o usuário espere pelo envio do e-mail.
+    Renderiza a mensagem e a grava na tabela 'email_outbox' usando a sessão atual do banco,
+    SEM fazer commit: a mensagem só passa a existir quando quem chamou efetivar a transação
+    (ex: o commit do registro do usuário). O envio em si é feito pelo despachante em app/outbox.py,
+    fora do ciclo da requisição, com novas tentativas em caso de falha.
+    Retorna o objeto OutboxMessage (novo ou já existente com a mesma chave).
+    """
+    app = current_app._get_current_object()
+    # Renderiza o corpo do e-mail em texto plano e em HTML a partir dos templates .txt e .html.
+    body = render_template(template + '.txt', **kwargs)
+    html = render_template(template + '.html', **kwargs)
+    # Monta o assunto com o prefixo definido na configuração.
+    subject = app.config['FLASKY_MAIL_SUBJECT_PREFIX'] + ' ' + subject
+    # Sem chave informada, a mensagem não é agrupada com nenhuma outra.
+    if idempotency_key is None:
+        idempotency_key = uuid.uuid4().hex
+    # Se a mensagem já está na fila, não cria outra.
+    msg = OutboxMessage.query.filter_by(idempotency_key=idempotency_key).first()
+    if msg is not None:
+        return msg
+    msg = OutboxMessage(idempotency_key=idempotency_key,
+                        recipient=to,
+                        subject=subject,
+                        body=body,
+                        html=html,
+                        template=template)
+    # Adiciona à sessão. O commit fica a cargo de quem chamou.
+    db.session.add(msg)
+    # Marca a sessão para que o despachante seja acordado logo após o commit.
+    db.session.info['outbox_dirty'] = True
+    return msg
+
+
+# Funções que montam o contexto de template das mensagens adiadas, por nome de template.
+_context_builders = {}
+
+
+def email_context(template):
     """
-    # 'current_app' é um proxy. Para passar a instância da aplicação para outra thread,
-    # precisamos obter o objeto real da aplicação com '_get_current_object()'.
+    Registra a função que transforma o contexto gravado de uma mensagem adiada
+    (valores simples, serializáveis em JSON) nos argumentos do template.
+    Ex:
+        @email_context('auth/email/confirm')
+        def confirm_context(user_id):
+            user = db.session.get(User, user_id)
+            return dict(user=user, token=user.generate_confirmation_token())
+    """
+    def decorator(f):
+        _context_builders[template] = f
+        return f
+    return decorator
+
+
+def defer_email(to, subject, template, idempotency_key=None, **context):
+    """
+    Variante de send_email que não faz nenhum trabalho durante a requisição: não renderiza
+    os templates, não gera tokens e não consulta a tabela 'email_outbox'. A mensagem é gravada
+    (na transação de quem chamou) apenas com o contexto em JSON; o despachante chama a função
+    registrada com email_context() para o template e renderiza o corpo depois do commit,
+    fora do ciclo da requisição.
+
+    Sem a consulta prévia, duas mensagens com a mesma chave fazem o commit falhar
+    (restrição única). Se 'idempotency_key' for omitida, ela é derivada do destinatário,
+    do template e do contexto.
+    """
+    msg = OutboxMessage(**_deferred_values(to, subject, template, idempotency_key, context))
+    db.session.add(msg)
+    db.session.info['outbox_dirty'] = True
+    return msg
+
+
+def _deferred_values(to, subject, template, idempotency_key, context):
+    # Colunas de uma mensagem adiada (ver defer_email).
+    if template not in _context_builders:
+        raise ValueError(f'Nenhum contexto registrado para o template {template}.')
     app = current_app._get_current_object()
-    with app.app_context():
-        # Cria o objeto Message com o assunto (prefixado), remetente (da config) e destinatário.
-        msg = Message(app.config['FLASKY_MAIL_SUBJECT_PREFIX'] + ' ' + subject,
-                    sender=app.config['FLASKY_MAIL_SENDER'], recipients=[to])
-        # Renderiza o corpo do e-mail em texto plano a partir do template .txt.
-        msg.body = render_template(template + '.txt', **kwargs)
-        # Renderiza o corpo do e-mail em HTML a partir do template .html.
-        msg.html = render_template(template + '.html', **kwargs)
-        # Cria uma thread para envio assíncrono do e-mail.
-        # O alvo é a nossa função 'send_async_email', e passamos a instância da app e a mensagem como argumentos.
-        thr = Thread(target=send_async_email, args=[app, msg])
-        # Inicia a execução da thread. O programa principal continua imediatamente.
-        thr.start()
-        # Retorna o objeto da thread, o que pode ser útil para gerenciamento avançado.
-        return thr
-        # Se preferir envio síncrono, descomente a linha abaixo
-        # mail.send(msg)
\ No newline at end of file
+    data = json.dumps(context, sort_keys=True)
+    if idempotency_key is None:
+        digest = hashlib.sha256('\x00'.join([to, template, data]).encode('utf-8'))
+        idempotency_key = digest.hexdigest()
+    return dict(idempotency_key=idempotency_key,
+                recipient=to,
+                subject=app.config['FLASKY_MAIL_SUBJECT_PREFIX'] + ' ' + subject,
+                template=template,
+                context=data,
+                # Guarda a URL da requisição para que url_for(_external=True) gere os mesmos links.
+                base_url=request.host_url if request else None)
+
+
+# Resultados de request_email().
+QUEUED = 'queued'
+COALESCED = 'coalesced'
+THROTTLED = 'throttled'
+
+
+def request_email(to, subject, template, **context):
+    """
+    Enfileira um e-mail pedido pelo usuário (reenvio da confirmação, redefinição de senha),
+    agrupando os pedidos repetidos. Uma única consulta às mensagens recentes do destinatário decide:
+
+    - COALESCED: já existe uma mensagem do mesmo template para ele, criada há menos de
+      FLASKY_MAIL_DEDUP_WINDOW segundos (pendente ou já enviada). O pedido é agrupado nela;
+    - THROTTLED: o destinatário já recebeu FLASKY_MAIL_QUOTA mensagens (de qualquer template)
+      nos últimos FLASKY_MAIL_QUOTA_PERIOD segundos;
+    - QUEUED: a mensagem é enfileirada com defer_email(): o token e os templates só são gerados
+      pelo despachante, então os pedidos agrupados ou barrados não custam renderização nem envio.
+
+    A chave de idempotência da mensagem é derivada do destinatário, do template e da fatia de
+    FLASKY_MAIL_DEDUP_WINDOW segundos em que o pedido caiu: dois pedidos simultâneos (que passaram
+    juntos pela consulta) geram a mesma chave, e o segundo INSERT é descartado e contado como COALESCED.
+
+    Os pedidos suprimidos são contados na própria mensagem (colunas 'coalesced' e 'throttled'),
+    no banco, e aparecem em outbox.stats(). Como send_email, não faz commit.
+    Retorna QUEUED, COALESCED ou THROTTLED.
+    """
+    app = current_app._get_current_object()
+    window = app.config['FLASKY_MAIL_DEDUP_WINDOW']
+    quota, period = app.config['FLASKY_MAIL_QUOTA'], app.config['FLASKY_MAIL_QUOTA_PERIOD']
+    now = datetime.utcnow()
+    if not quota:
+        period = 0
+    since = now - timedelta(seconds=max(window, period))
+    recent = db.session.execute(
+        select(OutboxMessage.id, OutboxMessage.template, OutboxMessage.status, OutboxMessage.created_at)
+        .where(OutboxMessage.recipient == to, OutboxMessage.created_at >= since)
+        .order_by(OutboxMessage.id.desc())).all()
+    if window:
+        for row in recent:
+            if row.template == template and row.status != OutboxMessage.DEAD and \
+                    row.created_at >= now - timedelta(seconds=window):
+                _suppressed(OutboxMessage.id == row.id, OutboxMessage.coalesced)
+                return COALESCED
+    if period and sum(1 for row in recent if row.created_at >= now - timedelta(seconds=period)) >= quota:
+        _suppressed(OutboxMessage.id == recent[0].id, OutboxMessage.throttled)
+        return THROTTLED
+    if window:
+        slot = int((now - datetime(1970, 1, 1)).total_seconds() // window)
+        key = hashlib.sha256('\x00'.join([to, template, str(slot)]).encode('utf-8')).hexdigest()
+    else:
+        # Sem janela, nada é agrupado: cada pedido aceito é uma mensagem nova.
+        key = uuid.uuid4().hex
+    if not _insert_new(_deferred_values(to, subject, template, key, context)):
+        # Outro pedido (de outro processo) enfileirou a mesma mensagem depois da consulta acima.
+        _suppressed(OutboxMessage.idempotency_key == key, OutboxMessage.coalesced)
+        return COALESCED
+    db.session.info['outbox_dirty'] = True
+    return QUEUED
+
+
+def _insert_new(values):
+    # Grava a mensagem na transação atual, a menos que a chave de idempotência já exista.
+    # Retorna False se já existia. No SQLite e no PostgreSQL, INSERT ... ON CONFLICT DO NOTHING;
+    # nos demais bancos, o INSERT roda em um savepoint, desfeito se violar a restrição única.
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert(OutboxMessage.__table__)
+        result = db.session.execute(insert.values(**values).on_conflict_do_nothing(
+            index_elements=['idempotency_key']))
+        return result.rowcount == 1
+    try:
+        with db.session.begin_nested():
+            db.session.add(OutboxMessage(**values))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _suppressed(condition, column):
+    # Incremento atômico no banco: pedidos simultâneos de vários processos não se perdem.
+    db.session.execute(update(OutboxMessage).where(condition).values({column: column + 1}))
+
+
+def render_deferred(app, msg):
+    """Renderiza o corpo de uma mensagem adiada. Chamada pelo despachante, dentro de um contexto de aplicação."""
+    builder = _context_builders[msg.template]
+    # Os templates usam url_for(_external=True), que precisa de um contexto de requisição.
+    with app.test_request_context(base_url=msg.base_url):
+        kwargs = builder(**json.loads(msg.context))
+        body = render_template(msg.template + '.txt', **kwargs)
+        html = render_template(msg.template + '.html', **kwargs)
+    # Só grava depois de renderizar as duas versões: uma falha no meio deixa a mensagem intacta para a retentativa.
+    msg.body, msg.html = body, html
@@ -0,0 +1,191 @@
+# Importa os módulos da biblioteca padrão usados pelo renderizador de formulários.
+import threading
+
+# Importa o proxy current_app, usado para chegar à macro original do Flask-Bootstrap.
+from flask import current_app
+# Importa as classes de escape de HTML usadas pelo Jinja.
+from markupsafe import Markup, escape
+# Importa os tipos de campo e de widget do WTForms tratados pela versão pré-compilada.
+from wtforms.fields import HiddenField
+from wtforms.widgets import CheckboxInput, FileInput, Input, SubmitInput
+
+# Valor marcador usado na compilação: onde ele aparece no HTML de um campo fica o valor dinâmico.
+_SLOT = 'flasky-form-slot-7f3a'
+
+
+class FormRenderer:
+    """
+    Substituto direto da macro wtf.quick_form do Flask-Bootstrap, registrado como a função global
+    'quick_form' dos templates ({{ quick_form(form) }}), com os mesmos parâmetros.
+
+    A macro percorre cada campo por macros Jinja aninhadas a cada requisição, mas, para um mesmo
+    formulário, quase todo o HTML é sempre igual: rótulos, ids, classes e atributos como
+    'required' e 'maxlength'. Na primeira renderização de cada classe de formulário (com as mesmas
+    opções), o HTML é montado uma vez, pelos próprios widgets do WTForms, e guardado como uma lista
+    de trechos estáticos e "slots". Só os slots são calculados a cada requisição:
+    - o valor de cada campo (escapado) e o estado 'checked' das caixas de seleção;
+    - as mensagens de erro (e a classe 'has-error' do grupo);
+    - os campos escondidos (token CSRF), por form.hidden_tag().
+
+    O HTML é o mesmo da macro, a menos de espaços em branco. Formulários com layout 'inline' ou
+    'horizontal', ou com campos de outros tipos (arquivos, seleção, rádio, subformulários), são
+    renderizados pela macro original. O HTML estático não pode mudar entre instâncias da mesma
+    classe (ex: rótulos trocados em uma única requisição).
+
+    Diferente da macro, que insere o texto dos rótulos das caixas de seleção e as descrições dos
+    campos com |safe, aqui eles são escapados, a menos que já sejam Markup
+    (ex: description=Markup('<em>Como aparece no perfil</em>')).
+
+    Configuração:
+    - FLASKY_FORM_PRECOMPILE: liga a versão pré-compilada (desligada, 'quick_form' chama a macro).
+    """
+
+    def __init__(self, app=None):
+        self._compiled = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_FORM_PRECOMPILE', True)
+        app.extensions['form_renderer'] = self
+        app.jinja_env.globals['quick_form'] = self.quick_form
+
+    def quick_form(self, form, action='', method='post', extra_classes=None, role='form', form_type='basic',
+                   horizontal_columns=('lg', 2, 10), enctype=None, button_map={}, id='', novalidate=False):
+        """Renderiza o formulário como wtf.quick_form. Retorna Markup."""
+        if not current_app.config['FLASKY_FORM_PRECOMPILE'] or form_type != 'basic':
+            return self.macro(form, action=action, method=method, extra_classes=extra_classes, role=role,
+                              form_type=form_type, horizontal_columns=horizontal_columns, enctype=enctype,
+                              button_map=button_map, id=id, novalidate=novalidate)
+        key = (type(form), tuple(form._fields), action, method, extra_classes, role, enctype, id, novalidate,
+               tuple(sorted(button_map.items())))
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = _compile(form, action, method, extra_classes, role, enctype, id, novalidate, button_map)
+            with self._lock:
+                self._compiled[key] = compiled
+        # Formulários que a versão pré-compilada não cobre ficam marcados com False.
+        if compiled is False:
+            return self.macro(form, action=action, method=method, extra_classes=extra_classes, role=role,
+                              enctype=enctype, button_map=button_map, id=id, novalidate=novalidate)
+        return Markup(''.join([part if part.__class__ is str else part(form) for part in compiled]))
+
+    @staticmethod
+    def macro(form, **kwargs):
+        """Renderiza o formulário com a macro original do Flask-Bootstrap."""
+        return current_app.jinja_env.get_template('bootstrap/wtf.html').module.quick_form(form, **kwargs)
+
+    def clear(self):
+        """Descarta os formulários compilados (ex: depois de trocar os templates ou os rótulos)."""
+        with self._lock:
+            self._compiled = {}
+
+
+# --- Compilação ---
+
+def _compile(form, action, method, extra_classes, role, enctype, id, novalidate, button_map):
+    # Retorna a lista de trechos (str) e slots (funções que recebem o formulário), ou False.
+    hidden, fields = [], []
+    for field in form:
+        if isinstance(field, HiddenField):
+            hidden.append(field.name)
+            continue
+        parts = _compile_field(field, button_map)
+        if parts is None:
+            return False
+        fields.extend(parts)
+    # Abertura do <form>, como na macro (os atributos na mesma ordem).
+    tag = '<form'
+    if action is not None:
+        tag += f' action="{escape(action)}"'
+    if id:
+        tag += f' id="{escape(id)}"'
+    if method:
+        tag += f' method="{escape(method)}"'
+    tag += ' class="form' + (f' {escape(extra_classes)}' if extra_classes else '') + '"'
+    if enctype:
+        tag += f' enctype="{escape(enctype)}"'
+    if role:
+        tag += f' role="{escape(role)}"'
+    if novalidate:
+        tag += ' novalidate'
+    tag += '>'
+
+    def hidden_tag(form):
+        return str(form.hidden_tag())
+
+    def hidden_errors(form):
+        # Erros dos campos escondidos (ex: token CSRF expirado), como form_errors(form, hiddens='only').
+        return ''.join(f'<p class="error">{escape(error)}</p>' for name in hidden for error in form[name].errors)
+
+    return _merge([tag, hidden_tag, hidden_errors] + fields + ['</form>'])
+
+
+def _compile_field(field, button_map):
+    name = field.name
+    widget = field.widget
+    kwargs = {'required': True} if field.flags.required else {}
+    if isinstance(widget, SubmitInput):
+        # O texto do botão é o rótulo do campo: nada dinâmico.
+        return [str(field(class_='btn btn-%s' % button_map.get(name, 'default'), **kwargs))]
+    if isinstance(widget, CheckboxInput):
+        variants = {}
+        had_checked = 'checked' in field.__dict__
+        previous = field.__dict__.get('checked')
+        try:
+            for checked in (False, True):
+                field.checked = checked
+                variants[checked] = _split(str(field(value=_SLOT)))
+        finally:
+            if had_checked:
+                field.checked = previous
+            else:
+                del field.checked
+
+        def checkbox(form):
+            f = form[name]
+            before, after = variants[bool(getattr(f, 'checked', f.data))]
+            return f'{before}{escape(f._value())}{after}'
+
+        return ['<div class="checkbox"><label>', checkbox, f' {escape(field.label.text)}</label></div>']
+    if not isinstance(widget, Input) or isinstance(widget, FileInput):
+        return None
+    required = ' required' if field.flags.required else ''
+    groups = (f'<div class="form-group{required}">', f'<div class="form-group has-error{required}">')
+    description = f'<p class="help-block">{escape(field.description)}</p>' if field.description else ''
+
+    def group(form):
+        return groups[bool(form[name].errors)]
+
+    def errors(form):
+        f = form[name]
+        if f.errors:
+            return ''.join(f'<p class="help-block">{escape(error)}</p>' for error in f.errors)
+        return description
+
+    parts = [group, str(field.label(class_='control-label'))]
+    before, after = _split(str(field(class_='form-control', value=_SLOT, **kwargs)))
+    if after is None:
+        # Sem o marcador (ex: senhas, que nunca repetem o valor): o campo inteiro é estático.
+        parts.append(before)
+    else:
+        parts += [before, lambda form: str(escape(form[name]._value())), after]
+    return parts + [errors, '</div>']
+
+
+def _split(html):
+    # Divide o HTML de um campo no marcador. Retorna (antes, depois), ou (html, None) sem marcador.
+    before, found, after = html.partition(_SLOT)
+    return (before, after) if found else (html, None)
+
+
+def _merge(parts):
+    # Junta os trechos estáticos vizinhos, para que a renderização concatene o mínimo de partes.
+    merged = []
+    for part in parts:
+        if part.__class__ is str and merged and merged[-1].__class__ is str:
+            merged[-1] += part
+        else:
+            merged.append(part)
+    return tuple(merged)
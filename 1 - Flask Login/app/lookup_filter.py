@@ -0,0 +1,260 @@
+# Importa os módulos da biblioteca padrão usados pelo filtro de buscas.
+import threading
+import time
+from collections import defaultdict
+
+# Importa o proxy current_app, usado para reconstruir o filtro em segundo plano.
+from flask import current_app
+# Importa os construtores de consulta do SQLAlchemy.
+from sqlalchemy import func, select
+
+# Importa o filtro de Bloom (definido em bloom.py).
+from bloom import BloomFilter
+# Importa a instância do banco de dados, o cache e o particionamento de usuários.
+from extensions import db, cache, shards
+
+
+class UserLookupFilter:
+    """
+    Filtro de buscas negativas por nome de usuário.
+
+    O nome não tem índice e a busca da página inicial percorre todos os shards; o e-mail, com
+    índice único, é mais barato de consultar do que de filtrar e fica de fora.
+    Guarda em memória um filtro de Bloom para cada coluna de COLUMNS, montado na inicialização
+    com uma leitura em streaming da tabela 'users' (em todos os shards).
+    might_exist(coluna, valor) responde False quando o valor certamente não existe, e a
+    consulta ao banco pode ser pulada; True significa "talvez" e a consulta é feita.
+    Uma resposta negativa não consulta nem o banco nem o cache.
+
+    - Inserções e mudanças de nome feitas por este processo entram no filtro na hora
+      (evento after_insert/after_update), mesmo durante uma reconstrução.
+    - Inserções feitas por outros processos (workers), e as cargas em massa que não passam pelos
+      eventos (ex: seed_users), são lidas pelo id: no máximo a cada FLASKY_LOOKUP_FILTER_CHECK
+      segundos, os usuários com id maior que o último lido (pela chave primária, em cada shard)
+      entram no filtro. Até essa leitura, um nome recém-criado por outro processo pode ser dado
+      como inexistente.
+    - Renomeações e remoções feitas por qualquer processo (e invalidate()) incrementam a tag
+      'users' do cache (GENERATION_TAG) depois do commit. Quando ela muda (inclusive quando volta
+      a 0, em um Cache.clear()), o filtro responde "talvez" até ser reconstruído. Por isso o filtro
+      exige um cache compartilhado entre os processos (CACHE_BACKEND='sqlite'): com outro
+      backend, ele fica desligado.
+    - Valores removidos e antigos (renomeados) só saem do filtro na reconstrução, que também
+      acontece em segundo plano a cada FLASKY_LOOKUP_FILTER_REBUILD segundos, ou quando o filtro
+      passa da capacidade.
+
+    stats() retorna, por coluna, o tamanho em memória, a taxa de falsos positivos estimada e a
+    observada (buscas "talvez" que não encontraram nada).
+
+    Configuração:
+    - FLASKY_LOOKUP_FILTER: liga o filtro (desligado, might_exist() sempre responde True).
+    - FLASKY_LOOKUP_FILTER_ERROR_RATE: taxa de falsos positivos desejada.
+    - FLASKY_LOOKUP_FILTER_CAPACITY: capacidade mínima; o filtro é dimensionado para o dobro dos usuários.
+    - FLASKY_LOOKUP_FILTER_REBUILD: intervalo de reconstrução, em segundos.
+    - FLASKY_LOOKUP_FILTER_CHECK: intervalo entre as leituras de usuários novos e da tag 'users', em segundos.
+    """
+
+    COLUMNS = ('name',)
+    # Tag do cache incrementada por renomeações, remoções e mudanças em massa na tabela 'users'.
+    GENERATION_TAG = 'users'
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.error_rate = 0.01
+        self.min_capacity = 10000
+        self.rebuild_interval = 3600
+        self.check_interval = 1
+        self._filters = {}
+        self._built_at = 0
+        self._checked_at = 0
+        # Versão da tag 'users' usada na última montagem e a última lida.
+        self._generation = None
+        self._latest_generation = None
+        # Maior id já lido em cada shard (None com o particionamento desligado).
+        self._max_ids = {}
+        self._rebuilding = None
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'lookups': 0, 'skipped': 0, 'false_positives': 0})
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_LOOKUP_FILTER', False)
+        app.config.setdefault('FLASKY_LOOKUP_FILTER_ERROR_RATE', 0.01)
+        app.config.setdefault('FLASKY_LOOKUP_FILTER_CAPACITY', 10000)
+        app.config.setdefault('FLASKY_LOOKUP_FILTER_REBUILD', 3600)
+        app.config.setdefault('FLASKY_LOOKUP_FILTER_CHECK', 1)
+        self.enabled = app.config['FLASKY_LOOKUP_FILTER']
+        self.error_rate = app.config['FLASKY_LOOKUP_FILTER_ERROR_RATE']
+        self.min_capacity = app.config['FLASKY_LOOKUP_FILTER_CAPACITY']
+        self.rebuild_interval = app.config['FLASKY_LOOKUP_FILTER_REBUILD']
+        self.check_interval = app.config['FLASKY_LOOKUP_FILTER_CHECK']
+        if self.enabled and not cache.shared:
+            # Com um cache por processo, renomeações feitas por outros workers não seriam vistas.
+            app.logger.warning('FLASKY_LOOKUP_FILTER ignorado: exige um cache compartilhado '
+                               "(CACHE_BACKEND='sqlite').")
+            self.enabled = False
+        with self._lock:
+            self._stats.clear()
+            self._filters = {}
+            self._max_ids = {}
+        app.extensions['lookup_filter'] = self
+        if self.enabled:
+            self.rebuild(app)
+
+    # --- Construção ---
+
+    def rebuild(self, app):
+        """
+        Monta filtros novos a partir da tabela 'users' e troca os atuais por eles.
+        Valores adicionados durante a leitura (add()) também entram nos novos filtros.
+        """
+        with self._lock:
+            # Valores adicionados enquanto a leitura roda, aplicados nos filtros novos antes da troca.
+            # A lista já existe quando a reconstrução foi disparada em segundo plano (_maybe_rebuild).
+            if self._rebuilding is None:
+                self._rebuilding = []
+            pending = self._rebuilding
+        try:
+            with app.app_context():
+                # Lida antes da leitura: uma mudança durante a leitura força outra reconstrução.
+                generation = cache.tag_version(self.GENERATION_TAG)
+                count = sum(db.session.execute(select(func.count()).select_from(db.metadata.tables['users']))
+                            .scalar() for _ in shards.each())
+                capacity = max(self.min_capacity, 2 * count)
+                filters = {column: BloomFilter(capacity, self.error_rate) for column in self.COLUMNS}
+                users = db.metadata.tables['users']
+                max_ids = {}
+                for shard in shards.each():
+                    max_ids[shard] = 0
+                    # Leitura em streaming: as linhas chegam em blocos, sem carregar a tabela inteira.
+                    rows = db.session.execute(select(users.c.id, *(users.c[c] for c in self.COLUMNS))
+                                              .execution_options(yield_per=5000))
+                    for row in rows:
+                        max_ids[shard] = max(max_ids[shard], row[0])
+                        for column, value in zip(self.COLUMNS, row[1:]):
+                            if value is not None:
+                                filters[column].add(value)
+                db.session.remove()
+            with self._lock:
+                for column, value in pending:
+                    filters[column].add(value)
+                self._filters = filters
+                self._generation = generation
+                if self._latest_generation is None:
+                    self._latest_generation = generation
+                # Usuários novos lidos durante a montagem (_check) já estão em 'pending'.
+                for shard, max_id in max_ids.items():
+                    self._max_ids[shard] = max(self._max_ids.get(shard, 0), max_id)
+                self._built_at = self._checked_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._rebuilding = None
+
+    def _maybe_rebuild(self, app, force=False):
+        # Reconstrói em segundo plano quando o intervalo passou, algum filtro passou da capacidade
+        # ou 'force' é verdadeiro (a tag 'users' mudou).
+        with self._lock:
+            if self._rebuilding is not None or not self._filters:
+                return
+            full = any(len(f) > f.capacity for f in self._filters.values())
+            if not force and not full and time.monotonic() - self._built_at < self.rebuild_interval:
+                return
+            self._rebuilding = []
+        threading.Thread(target=self.rebuild, args=(app,), name='flasky-lookup-filter', daemon=True).start()
+
+    def _check(self, app):
+        # No máximo uma vez por intervalo (e por uma única thread): lê a tag 'users' e os usuários
+        # criados depois da última leitura, em todos os shards (busca pela chave primária).
+        with self._lock:
+            now = time.monotonic()
+            if not self._filters or now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            max_ids = dict(self._max_ids)
+        generation = cache.tag_version(self.GENERATION_TAG)
+        users = db.metadata.tables['users']
+        rows = []
+        for shard in shards.each():
+            rows.extend((shard, row) for row in db.session.execute(
+                select(users.c.id, *(users.c[c] for c in self.COLUMNS))
+                .where(users.c.id > max_ids.get(shard, 0))))
+        with self._lock:
+            self._latest_generation = generation
+            for shard, row in rows:
+                self._max_ids[shard] = max(self._max_ids.get(shard, 0), row[0])
+                for column, value in zip(self.COLUMNS, row[1:]):
+                    if value is not None:
+                        self._add(column, value)
+            stale = generation != self._generation
+        if stale:
+            self._maybe_rebuild(app, force=True)
+
+    def _add(self, column, value):
+        # Chamada com o lock: adiciona ao filtro atual e à reconstrução em andamento.
+        if column in self._filters:
+            self._filters[column].add(value)
+        if self._rebuilding is not None:
+            self._rebuilding.append((column, value))
+
+    def add(self, column, value):
+        """
+        Adiciona um valor ao filtro da coluna (e à reconstrução em andamento, se houver).
+        Chamada pelos eventos de User (ver models/user.py); os outros processos leem o usuário
+        novo pelo id.
+        """
+        if not self.enabled or value is None or column not in self.COLUMNS:
+            return
+        with self._lock:
+            self._add(column, value)
+
+    def invalidate(self):
+        """
+        Avisa todos os processos que a tabela 'users' mudou de um jeito que a leitura pelo id não
+        cobre (renomeações, remoções). Os filtros respondem "talvez" até serem reconstruídos.
+        """
+        cache.invalidate_tag(self.GENERATION_TAG)
+
+    # --- Consultas ---
+
+    def might_exist(self, column, value):
+        """
+        Retorna False se nenhum usuário tem 'value' na coluna (a consulta pode ser pulada),
+        ou True se talvez exista. Depois de uma consulta que não encontrou nada, chame
+        false_positive(coluna) para alimentar as estatísticas.
+        """
+        if not self.enabled or value is None:
+            return True
+        app = current_app._get_current_object()
+        self._maybe_rebuild(app)
+        self._check(app)
+        with self._lock:
+            bloom = self._filters.get(column)
+            # Sem filtro (ainda em construção ou coluna não filtrada), com o filtro desatualizado
+            # (a tag 'users' mudou) ou com o valor possivelmente presente: consulta o banco.
+            exists = (bloom is None or self._latest_generation != self._generation
+                      or value in bloom)
+            self._stats[column]['lookups'] += 1
+            if not exists:
+                self._stats[column]['skipped'] += 1
+        return exists
+
+    def false_positive(self, column):
+        """Registra que uma busca liberada pelo filtro não encontrou nada."""
+        if self.enabled:
+            with self._lock:
+                self._stats[column]['false_positives'] += 1
+
+    def stats(self):
+        """Retorna, por coluna, os dados do filtro de Bloom e os contadores de buscas."""
+        with self._lock:
+            filters = dict(self._filters)
+            stats = {column: dict(counters) for column, counters in self._stats.items()}
+        result = {}
+        for column in self.COLUMNS:
+            counters = stats.get(column, {'lookups': 0, 'skipped': 0, 'false_positives': 0})
+            checked = counters['lookups'] - counters['skipped']
+            counters['observed_false_positive_rate'] = counters['false_positives'] / checked if checked else 0.0
+            if column in filters:
+                counters.update(filters[column].stats())
+            result[column] = counters
+        return result
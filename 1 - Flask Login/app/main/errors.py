@@ -1,11 +1,19 @@
-from flask import render_template 
+from flask import render_template, request, jsonify
 from . import main
 
+
+# Clientes da API (que aceitam JSON, mas não HTML) recebem os erros em JSON, inclusive
+# para URLs que não pertencem a nenhuma rota (ex: /api/v1/inexistente).
+def _wants_json():
+    return request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html
+
 # O decorator @app.errorhandler registra uma função para ser chamada quando um erro HTTP específico ocorre.
 # Neste caso, o erro 403 (Acesso Negado).
 @main.app_errorhandler(403)
 def forbidden(e):
     """Renderiza a página de erro 403 personalizada."""
+    if _wants_json():
+        return jsonify({'error': 'forbidden'}), 403
     # Retorna o template '403.html' e o código de status 403.
     return render_template('403.html'), 403
 
@@ -15,6 +23,8 @@ def forbidden(e):
 @main.app_errorhandler(404)
 def page_not_found(e):
     """Renderiza a página de erro 404 personalizada."""
+    if _wants_json():
+        return jsonify({'error': 'not found'}), 404
     # Retorna o template '404.html' e o código de status 404.
     return render_template('404.html'), 404
 
@@ -23,5 +33,7 @@ def page_not_found(e):
 @main.app_errorhandler(500)
 def internal_server_error(e):
     """Renderiza a página de erro 500 personalizada."""
+    if _wants_json():
+        return jsonify({'error': 'internal server error'}), 500
     # Retorna o template '500.html' e o código de status 500.
     return render_template('500.html'), 500
\ No newline at end of file
@@ -2,12 +2,19 @@
 from datetime import datetime
 
 # Importa funções e objetos do Flask para renderizar templates, gerenciar sessões, redirecionar, etc.
-from flask import render_template, session, redirect, url_for, flash, current_app
+from flask import render_template, session, redirect, url_for, flash, current_app, request, jsonify, abort
+from flask_login import login_required, current_user
 
-# Importa a instância do banco de dados (db) da aplicação.
-from app import db
+# Importa a instância do banco de dados (db), o cache de página, o rastreador de presença, os shards,
+# o controle de admissão, o agrupamento de leituras simultâneas, a fila de e-mails
+# e o filtro de buscas negativas.
+from app import db, page_cache, presence, shards, admission, flights, outbox, lookup_filter
 # Importa os modelos de dados User e Role, e o formulário NameForm.
-from app.models import User, Role, NameForm
+from app.models import User, Role, NameForm, Permission, AccessEntry
+# Importa o decorador de permissões.
+from app.models.decorators import permission_required, admin_required
+# Importa a busca de usuários (índice FTS5).
+from app.search import search_users
 # Importa a função de envio de e-mail.
 from app.email import send_email
 
@@ -22,8 +29,16 @@ def index():
     
     # Verifica se o formulário foi submetido (POST) e se os dados são válidos.
     if form.validate_on_submit():
-        # Consulta o banco de dados por um usuário com o nome informado.
-        user = User.query.filter_by(name=form.name.data).first()
+        # Consulta o banco de dados por um usuário com o nome informado (em todos os shards).
+        # Nomes que certamente não existem (filtro de Bloom) não chegam ao banco.
+        user = None
+        if lookup_filter.might_exist('name', form.name.data):
+            for _ in shards.each():
+                user = User.query.filter_by(name=form.name.data).first()
+                if user is not None:
+                    break
+            if user is None:
+                lookup_filter.false_positive('name')
         
         # Se o usuário não existe, cadastra e envia e-mail de notificação.
         if user is None:
@@ -48,19 +63,96 @@ def index():
         return redirect(url_for('.index'))
         
     # Para requisições GET (ou se o formulário for inválido), renderiza a página inicial.
+    # A data/hora atual é declarada como um "buraco" do cache de página: ela é preenchida
+    # a cada requisição mesmo quando o resto da página vem do cache.
+    current_time = page_cache.hole('current_time', utcnow_iso)
     # Passa as variáveis necessárias para o template Jinja2.
     return render_template('index.html', 
                            form=form, 
                            name=session.get('name'), 
                            known=session.get('known', False),
-                           current_time=datetime.utcnow())
+                           current_time=current_time)
+
+# Retorna a data/hora UTC atual no formato ISO 8601 usado pelo Flask-Moment.
+def utcnow_iso():
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# Carrega o usuário em uma sessão própria e o devolve desanexado dela. O objeto é repartido entre
+# as requisições agrupadas pelo single-flight, então não pode pertencer à sessão de nenhuma delas.
+def _load_profile(id):
+    session = db.session.session_factory()
+    try:
+        with shards.route_id(id):
+            return session.scalars(db.select(User).filter_by(id=id)).first()
+    finally:
+        session.close()
 
 # Define uma rota para exibir o perfil de um usuário específico.
 # '<id>' é uma parte dinâmica da URL que corresponde ao ID do usuário.
-@main.route('/user/<id>')
+@main.route('/user/<int:id>')
 def user(id):
-    # Busca o usuário no banco de dados pelo ID fornecido.
-    # 'first_or_404()' retorna o primeiro resultado ou, se não encontrar, aborta com um erro 404 (Not Found).
-    user = User.query.filter_by(id=id).first_or_404()
-    # Renderiza o template 'user.html', passando o objeto 'user' encontrado.
-    return render_template('user.html', user=user)
\ No newline at end of file
+    # Busca o usuário no banco de dados (no shard dele) pelo ID fornecido, ou aborta com 404 (Not Found).
+    # Visitas simultâneas ao mesmo perfil compartilham uma única consulta (ver _load_profile); cada
+    # requisição incorpora à sua sessão uma cópia do usuário carregado, sem consultar o banco de novo.
+    profile = flights.do('profile', id, _load_profile, id)
+    if profile is None:
+        abort(404)
+    user = db.session.merge(profile, load=False)
+    # Renderiza o template 'user.html', passando o objeto 'user' encontrado
+    # e se ele esteve ativo nos últimos minutos (consulta em memória, sem tocar no banco).
+    return render_template('user.html', user=user, online=presence.is_online(user.id))
+
+# Rota de busca de usuários por nome, localização e biografia.
+# Restrita a moderadores e administradores (equipe de suporte).
+@main.route('/search')
+@login_required
+@permission_required(Permission.MODERATE)
+def search():
+    # Lê o termo de busca e a página da query string (ex: /search?q=mar&page=2).
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    users, has_next = search_users(query, page=max(page, 1)) if query else ([], False)
+    # E-mails visíveis: usuários sobre os quais o usuário atual tem ADMIN (pelo papel ou por entradas
+    # de acesso). Uma única consulta para a página inteira, qualquer que seja o número de resultados.
+    email_ids = AccessEntry.allowed_ids(current_user, users, Permission.ADMIN)
+    return render_template('search.html', query=query, users=users, page=page, has_next=has_next,
+                           email_ids=email_ids)
+
+# Rota de administração com os usuários ativos na janela informada (ex: /admin/online?minutes=15).
+# A contagem e a lista vêm do rastreador de presença; o banco só é consultado para os usuários da lista.
+@main.route('/admin/online')
+@login_required
+@admin_required
+def online():
+    minutes = min(max(request.args.get('minutes', 5, type=int), 1), presence.window)
+    users = []
+    for shard, ids in shards.group_ids(presence.active_users(minutes)).items():
+        with shards.route(shard):
+            users += User.query.filter(User.id.in_(ids)).all() if ids else []
+    users.sort(key=lambda u: u.last_seen, reverse=True)
+    return render_template('online.html', minutes=minutes, users=users,
+                           counts={m: presence.count(m) for m in (1, 5, 15, presence.window)})
+
+# Rota de administração com o estado do controle de admissão (em JSON): requisições em execução
+# e na fila por classe, e quantas foram descartadas com 503 desde o início do processo.
+@main.route('/admin/admission')
+@login_required
+@admin_required
+def admission_stats():
+    return jsonify(admission.stats())
+
+# Rota de administração com o estado da fila de e-mails (em JSON): mensagens por estado e, por
+# template, quantos pedidos foram agrupados ou barrados pela cota em vez de gerar um envio.
+@main.route('/admin/outbox')
+@login_required
+@admin_required
+def outbox_stats():
+    return jsonify(outbox.stats())
+
+# Rota de administração com o estado do filtro de buscas negativas (em JSON): memória usada,
+# taxa de falsos positivos estimada e observada, e quantas consultas foram evitadas.
+@main.route('/admin/lookup-filter')
+@login_required
+@admin_required
+def lookup_filter_stats():
+    return jsonify(lookup_filter.stats())
@@ -2,4 +2,7 @@ from .user import User
 from .role import Role
 from .nameform import NameForm
 from .anonymous import Anonymous
-from .permission import Permission
\ No newline at end of file
+from .permission import Permission
+from .outbox import OutboxMessage
+from .identity import Identity
+from .access import AccessEntry
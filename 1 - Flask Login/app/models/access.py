@@ -0,0 +1,137 @@
+# models/access.py
+# Importa os construtores de consulta do SQLAlchemy usados na busca das entradas.
+from sqlalchemy import and_, or_, select
+# Importa a instância do banco de dados (db).
+from app import db
+# Importa o tipo de coluna Bitset, o mesmo das permissões dos papéis.
+from .permission import Permission, Bitset
+
+
+# Define o modelo 'AccessEntry' (tabela 'acl_entries'): permissões concedidas sobre objetos específicos.
+# Cada entrada concede bits de Permission sobre um objeto ('object_type' + 'object_id') a um usuário,
+# a um papel ou, sem nenhum dos dois, a todos os usuários logados. Sem 'object_id', a entrada vale
+# para todos os objetos do tipo.
+#
+# As permissões de um usuário sobre um objeto são a soma (OU) de:
+# - as permissões efetivas do papel dele (o que ele pode em toda a aplicação);
+# - as entradas que se aplicam a ele e ao objeto;
+# - todas as permissões, se ele for o dono do objeto (coluna indicada por __acl_owner__ no modelo).
+#
+# As verificações são feitas para uma lista inteira de objetos de uma vez (allowed_ids, filter_query):
+# uma única consulta às entradas do usuário, e os bits são combinados em memória, sem uma consulta por linha.
+class AccessEntry(db.Model):
+    __tablename__ = 'acl_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Tipo do objeto: o nome da tabela do modelo (ex: 'users').
+    object_type = db.Column(db.String(64), nullable=False)
+    # Id do objeto, ou None para todos os objetos do tipo.
+    object_id = db.Column(db.Integer)
+    # Usuário que recebe as permissões. Sem chave estrangeira: a tabela 'users' pode estar particionada.
+    user_id = db.Column(db.Integer, index=True)
+    # Papel que recebe as permissões (todos os usuários com esse papel).
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id', ondelete='CASCADE'), index=True)
+    # Permissões concedidas (bits de Permission).
+    permissions = db.Column(Bitset(255), nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_acl_entries_object', 'object_type', 'object_id'),)
+
+    # Concede permissões sobre um objeto (instância de um modelo) ou sobre todos os objetos de um
+    # modelo (a própria classe). Sem 'user' nem 'role', vale para todos os usuários logados.
+    # A entrada existente para o mesmo alvo e destinatário é reaproveitada. Não faz commit.
+    @staticmethod
+    def grant(target, perm, user=None, role=None):
+        entry = AccessEntry._entry(target, user, role)
+        if entry is None:
+            object_type, object_id = _target(target)
+            entry = AccessEntry(object_type=object_type, object_id=object_id, permissions=0,
+                                user_id=user.id if user is not None else None,
+                                role_id=role.id if role is not None else None)
+            db.session.add(entry)
+        entry.permissions |= Permission.mask(perm)
+        return entry
+
+    # Retira permissões concedidas por grant() (a entrada é removida quando fica vazia). Não faz commit.
+    @staticmethod
+    def revoke(target, perm, user=None, role=None):
+        entry = AccessEntry._entry(target, user, role)
+        if entry is not None:
+            entry.permissions &= ~Permission.mask(perm)
+            if not entry.permissions:
+                db.session.delete(entry)
+
+    @staticmethod
+    def _entry(target, user, role):
+        object_type, object_id = _target(target)
+        return AccessEntry.query.filter_by(object_type=object_type, object_id=object_id,
+                                           user_id=user.id if user is not None else None,
+                                           role_id=role.id if role is not None else None).first()
+
+    # Busca as permissões do usuário sobre objetos de um modelo, em uma única consulta.
+    # Retorna (bits válidos para todos os objetos, {id do objeto: bits}). Com 'ids', só as entradas
+    # desses objetos são lidas; sem 'ids', todas as entradas do usuário para o modelo.
+    @staticmethod
+    def grants(user, model, ids=None):
+        if user is None or not user.is_authenticated:
+            return 0, {}
+        subject = [AccessEntry.user_id == user.id, and_(AccessEntry.user_id.is_(None), AccessEntry.role_id.is_(None))]
+        if user.role_id is not None:
+            subject.append(AccessEntry.role_id == user.role_id)
+        query = select(AccessEntry.object_id, AccessEntry.permissions).where(
+            AccessEntry.object_type == model.__tablename__, or_(*subject))
+        if ids is not None:
+            query = query.where(or_(AccessEntry.object_id.is_(None), AccessEntry.object_id.in_(ids)))
+        rows = db.session.execute(query)
+        base = user.permissions or 0
+        objects = {}
+        for object_id, bits in rows:
+            if object_id is None:
+                base |= bits
+            else:
+                objects[object_id] = objects.get(object_id, 0) | bits
+        return base, objects
+
+    # Retorna o conjunto de ids dos objetos (instâncias do mesmo modelo, já carregadas) sobre os
+    # quais o usuário tem a permissão. Uma consulta, qualquer que seja o número de objetos.
+    @staticmethod
+    def allowed_ids(user, objects, perm):
+        objects = list(objects)
+        if not objects:
+            return set()
+        perm = Permission.mask(perm)
+        model = type(objects[0])
+        ids = [obj.id for obj in objects]
+        base, granted = AccessEntry.grants(user, model, ids)
+        if base & perm == perm:
+            return set(ids)
+        owner = getattr(model, '__acl_owner__', None)
+        user_id = user.id if user is not None and user.is_authenticated else None
+        return {obj.id for obj in objects
+                if (base | granted.get(obj.id, 0)) & perm == perm
+                or (owner is not None and user_id is not None and getattr(obj, owner) == user_id)}
+
+    # Restringe uma consulta do modelo aos objetos sobre os quais o usuário tem a permissão.
+    # Faz uma consulta às entradas do usuário; a consulta devolvida tem um único filtro
+    # (ids concedidos ou dono), então a listagem continua sendo uma consulta só.
+    @staticmethod
+    def filter_query(query, model, user, perm):
+        perm = Permission.mask(perm)
+        base, granted = AccessEntry.grants(user, model)
+        if base & perm == perm:
+            return query
+        ids = [object_id for object_id, bits in granted.items() if (base | bits) & perm == perm]
+        condition = model.id.in_(ids)
+        owner = getattr(model, '__acl_owner__', None)
+        if owner is not None and user is not None and user.is_authenticated:
+            condition = or_(condition, getattr(model, owner) == user.id)
+        return query.filter(condition)
+
+    def __repr__(self):
+        return f'<AccessEntry {self.object_type}:{self.object_id} {self.permissions:#x}>'
+
+
+# Converte o alvo de grant()/revoke() em (tipo, id): uma instância ou a classe do modelo (todos os objetos).
+def _target(target):
+    if isinstance(target, type):
+        return target.__tablename__, None
+    return type(target).__tablename__, target.id
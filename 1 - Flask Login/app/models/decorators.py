@@ -12,6 +12,9 @@ from .permission import Permission
 # Define um decorador que verifica se o usuário logado possui uma permissão específica.
 # Este é um "decorator factory", pois ele recebe um argumento (a permissão) e retorna o decorador real.
 def permission_required(permission):
+    # A permissão pode ser um valor (Permission.WRITE) ou o nome de uma permissão registrada ('WRITE').
+    # O valor é resolvido uma única vez, aqui: cada requisição faz apenas o E bit a bit de 'can()'.
+    permission = Permission.mask(permission)
     # A função 'decorator' recebe a função que será "embrulhada" (ex: uma view do Flask).
     def decorator(f):
         # '@wraps(f)' garante que a função 'decorated_function' se pareça com a função original 'f'
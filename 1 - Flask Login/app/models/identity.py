@@ -0,0 +1,137 @@
+# models/identity.py
+# Importa datetime para atualizar o 'last_seen'.
+from datetime import datetime
+# Importa os construtores de consulta do SQLAlchemy.
+from sqlalchemy import bindparam, select, update
+# Importa o objeto da aplicação atual e o serializador usado para assinar as claims da sessão.
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer as Serializer, BadSignature
+# Importa a instância do banco de dados (db), o particionamento de usuários
+# e o agrupamento de leituras simultâneas.
+from app import db, shards, flights
+# Importa os modelos usados na consulta da identidade.
+from .user import User
+from .role import Role
+from .permission import Permission
+
+
+# Identidade do usuário logado, usada como 'current_user' pelo Flask-Login.
+# O user_loader roda em toda requisição; em vez de carregar a linha inteira de 'users'
+# (incluindo 'about_me', 'location' e 'password_hash'), ele busca apenas as colunas usadas
+# na autenticação e na autorização, em uma única consulta com JOIN no papel.
+# O objeto User completo só é carregado se uma view precisar dele (atributo 'user'),
+# e qualquer atributo que não esteja aqui é repassado a ele.
+class Identity:
+    # __slots__ evita o dicionário por instância e impede atributos acidentais.
+    __slots__ = ('id', 'name', 'email', 'confirmed', 'permissions', 'claims_version', 'role_id', '_user')
+
+    # Consulta do user_loader, montada uma única vez: colunas na ordem do construtor e JOIN no papel.
+    # As permissões são as efetivas do papel (já com as herdadas).
+    QUERY = select(User.id, User.name, User.email, User.confirmed, Role.effective_permissions,
+                   User.claims_version, User.role_id) \
+        .outerjoin(Role, User.role_id == Role.id).where(User.id == bindparam('user_id'))
+
+    # Salt das claims da sessão, para que elas não sirvam como nenhum outro token da aplicação.
+    CLAIMS_SALT = 'flasky-claims'
+
+    def __init__(self, id, name, email, confirmed, permissions, claims_version=0, role_id=None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.confirmed = bool(confirmed)
+        self.permissions = permissions or 0
+        self.claims_version = claims_version or 0
+        self.role_id = role_id
+        self._user = None
+
+    # Busca a identidade pelo id guardado na sessão (ou None, se o usuário não existir mais).
+    # Requisições simultâneas do mesmo usuário (abas, recursos da página) compartilham uma única
+    # consulta; cada uma recebe a sua própria Identity, montada a partir da linha (uma tupla imutável).
+    @classmethod
+    def load(cls, user_id):
+        row = flights.do('identity', user_id, cls._fetch, user_id)
+        return cls(*row) if row is not None else None
+
+    @classmethod
+    def _fetch(cls, user_id):
+        with shards.route_id(user_id):
+            row = db.session.execute(cls.QUERY, {'user_id': user_id}).first()
+        return tuple(row) if row is not None else None
+
+    # Claims da sessão (modo FLASKY_SESSION_CLAIMS): a identidade inteira em uma lista compacta,
+    # assinada e com data de emissão, guardada na sessão depois de uma consulta ao banco.
+    def to_claims(self):
+        s = Serializer(current_app.config['SECRET_KEY'], salt=self.CLAIMS_SALT)
+        return s.dumps([self.id, self.name, self.email, int(self.confirmed), self.permissions,
+                        self.claims_version, self.role_id])
+
+    # Monta a identidade a partir das claims, sem consultar a tabela 'users'. Retorna None (e a
+    # identidade deve ser recarregada do banco) se as claims forem inválidas, de outro usuário,
+    # mais antigas que FLASKY_SESSION_CLAIMS_TTL, de uma versão anterior à atual do usuário
+    # ou em um formato antigo (sem o papel).
+    @classmethod
+    def from_claims(cls, claims, user_id):
+        if not claims:
+            return None
+        s = Serializer(current_app.config['SECRET_KEY'], salt=cls.CLAIMS_SALT)
+        try:
+            data = s.loads(claims, max_age=current_app.config['FLASKY_SESSION_CLAIMS_TTL'])
+        except BadSignature:
+            return None
+        if len(data) != 7 or data[0] != user_id or User.claims_version_of(user_id) != data[5]:
+            return None
+        return cls(*data)
+
+    # Propriedades e métodos exigidos pelo Flask-Login (os mesmos do UserMixin).
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_active(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+    # Verificações de permissão feitas com os bits do papel, sem carregar o User.
+    def can(self, perm):
+        return self.permissions & perm == perm
+
+    def is_administrator(self):
+        return self.can(Permission.ADMIN)
+
+    # Atualiza o 'last_seen' com um UPDATE direto, sem carregar a linha do usuário.
+    def ping(self):
+        with shards.route_id(self.id):
+            db.session.execute(update(User).where(User.id == self.id).values(last_seen=datetime.utcnow()))
+        db.session.commit()
+
+    # O objeto User completo, carregado na primeira utilização.
+    @property
+    def user(self):
+        if self._user is None:
+            with shards.route_id(self.id):
+                self._user = db.session.get(User, self.id)
+        return self._user
+
+    # Qualquer outro atributo (ex: confirm(), generate_confirmation_token(), about_me) vem do User completo.
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        if isinstance(other, (Identity, User)):
+            return self.id == other.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<Identity {self.id}>'
@@ -0,0 +1,75 @@
+# models/outbox.py
+# Importa a instância do banco de dados (db) da aplicação.
+from app import db
+# Importa datetime para trabalhar com timestamps.
+from datetime import datetime
+
+
+# Define o modelo 'OutboxMessage', que mapeia para a tabela 'email_outbox'.
+# Cada linha é um e-mail já renderizado, aguardando envio pelo despachante (app/outbox.py).
+# Como a mensagem é gravada na mesma transação da mudança que a originou (ex: o registro
+# de um usuário), ela só existe se essa mudança for efetivada e sobrevive a reinícios do processo.
+class OutboxMessage(db.Model):
+    # __tablename__ especifica o nome da tabela no banco de dados.
+    __tablename__ = 'email_outbox'
+
+    # Estados possíveis de uma mensagem na fila.
+    # PENDING: aguardando envio (ou uma nova tentativa).
+    PENDING = 'pending'
+    # SENDING: reservada por um despachante. Se o processo morrer, a reserva expira e ela volta à fila.
+    SENDING = 'sending'
+    # SENT: enviada com sucesso.
+    SENT = 'sent'
+    # DEAD: esgotou as tentativas (dead letter). Fica guardada para inspeção manual.
+    DEAD = 'dead'
+
+    # Chave primária. A ordem dos ids também define a ordem de envio.
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Chave de idempotência: a mesma chave nunca gera duas mensagens na fila.
+    # Também é usada como Message-ID, para que o servidor de destino possa descartar duplicatas.
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)
+
+    # Destinatário, assunto e corpos (texto e HTML) já renderizados.
+    recipient = db.Column(db.String(120), index=True)
+    subject = db.Column(db.String(255))
+    body = db.Column(db.Text())
+    html = db.Column(db.Text())
+
+    # Nome base do template usado para gerar a mensagem (ex: 'auth/email/confirm').
+    template = db.Column(db.String(120))
+
+    # Mensagens adiadas (ver defer_email em app/email.py) são gravadas sem corpo: apenas com o
+    # contexto em JSON e a URL base da requisição de origem. O despachante renderiza o corpo
+    # no primeiro envio e o guarda, para que as retentativas enviem exatamente a mesma mensagem.
+    context = db.Column(db.Text())
+    base_url = db.Column(db.String(255))
+
+    # Estado atual da mensagem (ver constantes acima). Indexado porque o despachante filtra por ele.
+    status = db.Column(db.String(16), default=PENDING, index=True)
+
+    # Número de tentativas de envio já realizadas.
+    attempts = db.Column(db.Integer, default=0)
+
+    # Momento a partir do qual a mensagem pode ser (re)tentada.
+    # Para mensagens em SENDING, marca o fim da reserva do despachante.
+    next_attempt_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
+
+    # Identificador do lote/despachante que reservou a mensagem.
+    claimed_by = db.Column(db.String(32), index=True)
+
+    # Última mensagem de erro recebida do servidor SMTP.
+    last_error = db.Column(db.Text())
+
+    # Pedidos repetidos que foram agrupados nesta mensagem em vez de gerar outra (ver request_email em
+    # app/email.py): 'coalesced' conta os repetidos dentro da janela, 'throttled' os barrados pela cota
+    # do destinatário (contados na mensagem mais recente dele).
+    coalesced = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    throttled = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    # Datas de criação e de envio efetivo.
+    created_at = db.Column(db.DateTime(), default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime())
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.recipient} {self.status}>'
@@ -1,7 +1,12 @@
+# Importa o tipo base do SQLAlchemy usado para gravar os conjuntos de bits.
+from sqlalchemy.types import String, TypeDecorator
+
+
 # Define uma classe para gerenciar as permissões dos usuários.
-# Esta abordagem utiliza valores que são potências de 2 (1, 2, 4, 8, 16...).
-# Isso permite que as permissões de um usuário sejam combinadas em um único número inteiro
-# usando operações bitwise (OU para adicionar, E para verificar).
+# Cada permissão é um bit de um inteiro (1, 2, 4, 8, 16...), e as permissões de um papel são
+# combinadas em um único número usando operações bitwise (OU para adicionar, E para verificar).
+# Os inteiros do Python não têm limite de tamanho, então o número de permissões também não tem:
+# novas permissões são criadas com Permission.register() e recebem o próximo bit livre.
 class Permission:
     # Permissão para seguir outros usuários.
     FOLLOW = 1
@@ -13,3 +18,52 @@ class Permission:
     MODERATE = 8
     # Permissão total de administrador.
     ADMIN = 16
+
+    # Registro das permissões: nome -> valor (bit). As cinco acima mantêm os valores históricos.
+    _registry = {'FOLLOW': 1, 'COMMENT': 2, 'WRITE': 4, 'MODERATE': 8, 'ADMIN': 16}
+
+    # Registra uma nova permissão (ex: Permission.register('EDIT_PROFILE')) e retorna o seu valor.
+    # A permissão também fica disponível como atributo (Permission.EDIT_PROFILE). Registrar de novo
+    # o mesmo nome retorna o valor já atribuído. Os bits são dados na ordem de registro, então
+    # novas permissões devem ser registradas sempre depois das existentes (e nunca removidas).
+    @classmethod
+    def register(cls, name):
+        name = name.upper()
+        if name not in cls._registry:
+            cls._registry[name] = 1 << len(cls._registry)
+            setattr(cls, name, cls._registry[name])
+        return cls._registry[name]
+
+    # Retorna o valor combinado das permissões informadas (nomes ou valores).
+    @classmethod
+    def mask(cls, *perms):
+        bits = 0
+        for perm in perms:
+            bits |= cls._registry[perm.upper()] if isinstance(perm, str) else perm
+        return bits
+
+    # Retorna os nomes das permissões presentes em um conjunto de bits, na ordem de registro.
+    @classmethod
+    def names(cls, bits):
+        return [name for name, value in cls._registry.items() if bits & value]
+
+    # Retorna o registro completo (nome -> valor).
+    @classmethod
+    def all(cls):
+        return dict(cls._registry)
+
+
+# Tipo de coluna para conjuntos de bits de qualquer tamanho. O INTEGER do SQLite tem 64 bits,
+# então o valor é gravado como texto hexadecimal ('0x1f'). Valores antigos, gravados como
+# inteiros antes desta mudança, continuam sendo lidos normalmente.
+class Bitset(TypeDecorator):
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else format(value, '#x')
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return int(value, 0)
@@ -1,8 +1,19 @@
 # models/role.py
-# Importa a instância do banco de dados (db) da aplicação.
-from app import db
-# Importa a classe Permission para definir os níveis de acesso.
-from .permission import Permission
+# Importa o sistema de eventos e a sessão do SQLAlchemy, usados para recalcular as permissões efetivas.
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload
+# Importa a instância do banco de dados (db), do cache e do particionamento de usuários.
+from app import db, cache, shards
+# Importa a classe Permission (e o tipo de coluna Bitset) para definir os níveis de acesso.
+from .permission import Permission, Bitset
+
+
+# Tabela de associação da herança de papéis: cada linha diz que 'role_id' herda as permissões de 'parent_id'.
+role_parents = db.Table(
+    'role_parents',
+    db.Column('role_id', db.Integer, db.ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('parent_id', db.Integer, db.ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+)
 
 
 # Define o modelo de dados 'Role' que mapeia para a tabela 'roles' no banco de dados.
@@ -27,9 +38,21 @@ class Role(db.Model):
     # index=True cria um índice nesta coluna para otimizar as buscas por papéis padrão.
     default = db.Column(db.Boolean, default=False, index=True)
 
-    # Define uma coluna de inteiro para armazenar as permissões do papel.
-    # Este número é uma máscara de bits (bitmask) que representa a combinação de todas as permissões concedidas.
-    permissions = db.Column(db.Integer)
+    # Define a coluna que armazena as permissões concedidas diretamente ao papel.
+    # Este número é uma máscara de bits (bitmask) que representa a combinação dessas permissões.
+    # Bitset grava o número em hexadecimal, sem o limite de 64 bits do INTEGER (até ~1000 permissões).
+    permissions = db.Column(Bitset(255))
+
+    # Permissões efetivas: as do próprio papel somadas (OU) às de todos os papéis herdados.
+    # Não deve ser alterada diretamente: é recalculada sempre que algum papel muda (veja
+    # _update_effective_permissions abaixo), para que as verificações sejam um único E bit a bit.
+    effective_permissions = db.Column(Bitset(255))
+
+    # Papéis dos quais este papel herda as permissões (e, no sentido inverso, 'children').
+    parents = db.relationship('Role', secondary=role_parents,
+                              primaryjoin=id == role_parents.c.role_id,
+                              secondaryjoin=id == role_parents.c.parent_id,
+                              backref='children')
 
     # Define a relação entre Role e User. Isso não cria uma coluna no banco de dados.
     # 'User' é o nome da classe do modelo do outro lado da relação.
@@ -48,6 +71,8 @@ class Role(db.Model):
         # Garante que, se nenhuma permissão for fornecida na criação, o papel comece com 0 (sem permissões).
         if self.permissions is None:
             self.permissions = 0
+        if self.effective_permissions is None:
+            self.effective_permissions = self.permissions
 
     # Adiciona uma permissão ao papel.
     def add_permission(self, perm):
@@ -55,45 +80,49 @@ class Role(db.Model):
         if not self.has_permission(perm):
             # Adiciona a permissão usando o operador de OU bit a bit (bitwise OR).
             # Isso "liga" o bit correspondente à nova permissão sem afetar as outras.
-            self.permissions += perm
+            self.permissions |= perm
 
     # Remove uma permissão do papel.
     def remove_permission(self, perm):
         # Verifica se o papel atualmente possui a permissão.
         if self.has_permission(perm):
-            # Remove a permissão usando subtração.
-            # Isso funciona porque os valores de permissão são potências de 2.
-            self.permissions -= perm
+            # Remove a permissão usando E com o complemento (bitwise AND NOT).
+            # Isso "desliga" apenas os bits da permissão, mesmo que 'perm' combine várias delas.
+            self.permissions &= ~perm
 
     # Reseta todas as permissões do papel, definindo o valor como 0.
     def reset_permissions(self):
         self.permissions = 0
 
-    # Verifica se o papel possui uma permissão específica.
+    # Verifica se o papel possui uma permissão concedida diretamente a ele (sem herança).
     def has_permission(self, perm):
         # Usa o operador E bit a bit (bitwise AND) para verificar se o bit da permissão está "ligado".
         # Ex: Se permissions=3 (011) e perm=2 (010), (011 & 010) resulta em 2 (010), que é igual a perm.
         # Ex: Se permissions=1 (001) e perm=2 (010), (001 & 010) resulta em 0 (000), que não é igual a perm.
         return self.permissions & perm == perm
 
+    # Verifica se o papel possui uma permissão, própria ou herdada.
+    # Um único E bit a bit nas permissões efetivas, pré-calculadas: nenhum percurso pela herança.
+    def can(self, perm):
+        return (self.effective_permissions or 0) & perm == perm
+
     # Método estático para popular o banco de dados com papéis e permissões predefinidos.
     # Pode ser chamado para configurar a aplicação na primeira vez que ela é executada.
     @staticmethod
     def insert_roles():
-        # Dicionário que mapeia nomes de papéis a uma lista de suas permissões.
+        # Dicionário que mapeia nomes de papéis às suas permissões próprias e aos papéis herdados.
+        # Cada papel lista apenas o que acrescenta: Moderator herda de User e Administrator de Moderator.
         roles = {
-            'User': [Permission.FOLLOW, Permission.COMMENT,
-                     Permission.WRITE],
-            'Moderator': [Permission.FOLLOW, Permission.COMMENT,
-                          Permission.WRITE, Permission.MODERATE],
-            'Administrator': [Permission.FOLLOW, Permission.COMMENT,
-                              Permission.WRITE, Permission.MODERATE,
-                              Permission.ADMIN]
+            'User': ([Permission.FOLLOW, Permission.COMMENT, Permission.WRITE], []),
+            'Moderator': ([Permission.MODERATE], ['User']),
+            'Administrator': ([Permission.ADMIN], ['Moderator']),
         }
         # Define qual papel será o padrão para novos usuários.
         default_role = 'User'
-        # Itera sobre os papéis definidos no dicionário.
-        for r in roles:
+        # Papéis já carregados ou criados, para ligar os herdados sem consultar de novo.
+        created = {}
+        # Itera sobre os papéis definidos no dicionário (os herdados aparecem antes de quem herda).
+        for r, (perms, parents) in roles.items():
             # Verifica se o papel já existe no banco de dados.
             role = Role.query.filter_by(name=r).first()
             # Se não existir, cria uma nova instância.
@@ -102,17 +131,115 @@ class Role(db.Model):
             # Reseta as permissões existentes para garantir um estado limpo.
             role.reset_permissions()
             # Adiciona cada permissão da lista ao papel.
-            for perm in roles[r]:
+            for perm in perms:
                 role.add_permission(perm)
+            role.parents = [created[name] for name in parents]
             # Define a propriedade 'default' como True se o nome do papel for o padrão.
             role.default = (role.name == default_role)
             # Adiciona o objeto do papel à sessão do banco de dados para ser salvo.
             db.session.add(role)
+            created[r] = role
         # Commita (salva) todas as mudanças na sessão para o banco de dados.
+        # As permissões efetivas, as versões das claims dos usuários afetados, a réplica nos shards
+        # e a invalidação do cache são tratadas pelos eventos da sessão (veja abaixo).
         db.session.commit()
 
+    # Retorna o id do papel com o nome informado (ou None), guardando o resultado no cache.
+    # O cache guarda apenas o id: objetos do SQLAlchemy pertencem a uma sessão e não podem ser compartilhados.
+    @staticmethod
+    @cache.memoize('roles', tags=['roles'])
+    def id_by_name(name):
+        role = db.session.query(Role.id).filter_by(name=name).first()
+        return role.id if role else None
+
+    # Retorna o id do papel padrão para novos usuários (ou None), guardando o resultado no cache.
+    @staticmethod
+    @cache.memoize('roles', tags=['roles'])
+    def default_id():
+        role = db.session.query(Role.id).filter_by(default=True).first()
+        return role.id if role else None
+
     # O método __repr__ (representação) fornece uma representação em string "oficial" do objeto.
     # É útil para depuração, pois permite ver uma representação legível do objeto
     # ao imprimi-lo ou exibi-lo no console.
     def __repr__(self):
-        return f'<Role {self.name} {self.permissions}>'
\ No newline at end of file
+        return f'<Role {self.name} {self.permissions}>'
+
+
+# Recalcula as permissões efetivas de todos os papéis antes de gravar qualquer mudança em papéis
+# (permissões próprias, herança, criação ou remoção). É o único lugar onde a herança é percorrida:
+# as verificações de permissão leem apenas 'effective_permissions'.
+# Os usuários dos papéis cujas permissões efetivas mudaram têm a versão das claims incrementada
+# na mesma transação, para que as sessões e as identidades guardadas sejam recarregadas.
+@event.listens_for(Session, 'before_flush')
+def _update_effective_permissions(session, flush_context, instances):
+    touched = [obj for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, Role)]
+    if not touched:
+        return
+    with session.no_autoflush:
+        roles = set(session.query(Role).options(selectinload(Role.parents)))
+        roles.update(obj for obj in session.new if isinstance(obj, Role))
+        roles.difference_update(obj for obj in session.deleted if isinstance(obj, Role))
+        effective = effective_permissions(roles)
+    changed = []
+    for role, bits in effective.items():
+        if role.effective_permissions != bits:
+            role.effective_permissions = bits
+            if role.id is not None and role not in session.new:
+                changed.append(role.id)
+    if changed:
+        from .user import User
+        for _ in shards.each():
+            session.execute(db.update(User).where(User.role_id.in_(changed))
+                            .values(claims_version=User.claims_version + 1)
+                            .execution_options(synchronize_session=False))
+    session.info['roles_changed'] = True
+
+
+# Depois do commit, replica os papéis nos shards e invalida as buscas de papéis e as versões das claims.
+@event.listens_for(Session, 'after_commit')
+def _roles_committed(session):
+    if session.info.pop('roles_changed', False):
+        shards.replicate()
+        cache.invalidate_tag('roles', 'claims')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _roles_rolled_back(session):
+    session.info.pop('roles_changed', None)
+
+
+def effective_permissions(roles):
+    """
+    Calcula as permissões efetivas de cada papel: {papel: bits}. Cada papel é visitado uma única
+    vez (os resultados dos herdados são reaproveitados), então o custo é proporcional ao número de
+    papéis e de ligações de herança. Papéis fora de 'roles' (ex: removidos) são ignorados.
+    Levanta ValueError se a herança tiver um ciclo.
+    """
+    roles = set(roles)
+    result = {}
+    for start in roles:
+        if start in result:
+            continue
+        # Busca em profundidade sem recursão: [papel, herdados, índice do próximo herdado a visitar].
+        stack = [[start, [p for p in start.parents if p in roles], 0]]
+        visiting = {start}
+        while stack:
+            frame = stack[-1]
+            role, parents, index = frame
+            if index < len(parents):
+                frame[2] += 1
+                parent = parents[index]
+                if parent in visiting:
+                    raise ValueError(f'Ciclo na herança de papéis: {parent.name}')
+                if parent not in result:
+                    visiting.add(parent)
+                    stack.append([parent, [p for p in parent.parents if p in roles], 0])
+                continue
+            bits = role.permissions or 0
+            for parent in parents:
+                bits |= result[parent]
+            result[role] = bits
+            visiting.discard(role)
+            stack.pop()
+    return result
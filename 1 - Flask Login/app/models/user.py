@@ -1,6 +1,10 @@
 # models/user.py
-# Importa a instância do banco de dados (db) da aplicação.
-from app import db
+# Importa a instância do banco de dados (db), do cache, do particionamento de usuários,
+# do agrupamento de leituras simultâneas e do filtro de buscas negativas.
+from app import db, cache, shards, flights, lookup_filter
+# Importa o sistema de eventos do SQLAlchemy, usado para invalidar o cache quando usuários mudam.
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 # Importa funções de segurança para gerar e verificar hashes de senha.
 from werkzeug.security import generate_password_hash, check_password_hash
 # Importa UserMixin, que fornece implementações padrão para os métodos exigidos pelo Flask-Login (is_authenticated, etc.).
@@ -20,6 +24,9 @@ from datetime import datetime
 class User(UserMixin, db.Model):
     # __tablename__ especifica o nome da tabela no banco de dados.
     __tablename__ = 'users'
+
+    # Coluna com o dono do objeto nas verificações de AccessEntry: cada usuário é dono do próprio perfil.
+    __acl_owner__ = 'id'
     
     # Define a coluna 'id' como a chave primária da tabela.
     # db.Column é usado para definir uma coluna.
@@ -60,6 +67,10 @@ class User(UserMixin, db.Model):
     # Define a coluna 'confirmed' para indicar se o usuário confirmou seu e-mail.
     # O valor padrão é False, significando que o usuário não está confirmado inicialmente.
     confirmed = db.Column(db.Boolean, default=False)
+
+    # Versão das claims de autorização guardadas na sessão (ver Identity.from_claims).
+    # É incrementada sempre que 'confirmed', a senha ou o papel mudam, o que invalida as claims antigas.
+    claims_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # A anotação @property cria uma propriedade 'password' que não pode ser lida.
     # Tentar acessar user.password diretamente levantará um AttributeError.
@@ -114,6 +125,32 @@ class User(UserMixin, db.Model):
         s = Serializer(current_app.config['SECRET_KEY'])
         return s.dumps({'reset': self.id})
     
+    # Gera o token de acesso da API (Authorization: Bearer <token>).
+    # O token carrega o id, os bits de permissão do papel e a confirmação da conta, para que
+    # cada requisição da API seja autorizada só com a verificação da assinatura, sem sessão e
+    # sem consulta ao banco. O salt próprio impede que ele seja aceito como outro tipo de token.
+    # Mudanças de papel só passam a valer no próximo token, então a validade deve ser curta.
+    def generate_auth_token(self):
+        s = Serializer(current_app.config['SECRET_KEY'], salt='flasky-api')
+        return s.dumps({'id': self.id,
+                        'perm': self.role.effective_permissions if self.role is not None else 0,
+                        'confirmed': bool(self.confirmed)})
+
+    # Retorna a versão atual das claims do usuário (ou None, se ele não existir), guardando-a no cache.
+    # É a única leitura por requisição no modo FLASKY_SESSION_CLAIMS, e quase sempre vem do cache.
+    @staticmethod
+    @cache.memoize('claims', tags=lambda user_id: ['claims', 'users', f'claims:{user_id}'])
+    def claims_version_of(user_id):
+        with shards.route_id(user_id):
+            return db.session.query(User.claims_version).filter_by(id=user_id).scalar()
+
+    # Valida um token de acesso da API e retorna o seu conteúdo (ou None se inválido ou expirado).
+    # Rajadas de um mesmo cliente (o mesmo token) verificam a assinatura uma única vez.
+    # O dicionário retornado é compartilhado entre essas requisições: não deve ser alterado.
+    @staticmethod
+    def verify_auth_token(token):
+        return flights.do('auth_token', token, _load_auth_token, token)
+
     # Método estático para redefinir a senha de um usuário usando um token.
     @staticmethod
     def reset_password(token, new_password):
@@ -124,8 +161,12 @@ class User(UserMixin, db.Model):
             data = s.loads(token.encode('utf-8'))
         except:
             return False
-        # Busca o usuário no banco de dados usando o ID do token.
-        user = User.query.get(data.get('reset'))
+        # Busca o usuário no banco de dados (no shard dele) usando o ID do token.
+        user_id = data.get('reset')
+        if not isinstance(user_id, int):
+            return False
+        with shards.route_id(user_id):
+            user = db.session.get(User, user_id)
         if user is None:
             return False
         # Define a nova senha (o setter cuidará do hashing).
@@ -133,11 +174,16 @@ class User(UserMixin, db.Model):
         db.session.add(user)
         return True
     
+    # Bits das permissões efetivas do papel do usuário (o mesmo atributo de Identity).
+    @property
+    def permissions(self):
+        return self.role.effective_permissions if self.role is not None else 0
+
     # Verifica se o usuário tem uma permissão específica.
     def can(self, perm):
-        # Delega a verificação para o papel (Role) do usuário.
+        # Delega a verificação para o papel (Role) do usuário, que já inclui as permissões herdadas.
         # Retorna False se o usuário não tiver um papel associado.
-        return self.role is not None and self.role.has_permission(perm)
+        return self.role is not None and self.role.can(perm)
     
     # Verifica se o usuário é um administrador.
     def is_administrator(self):
@@ -148,8 +194,8 @@ class User(UserMixin, db.Model):
     def ping(self):
         self.last_seen = datetime.utcnow()
         db.session.add(self)
-        # Nota: Chamar commit() aqui em cada requisição pode adicionar sobrecarga.
-        # Em aplicações de alto tráfego, pode ser melhor otimizar isso.
+        # O before_request só chama ping() uma vez por minuto por usuário (ver app/presence.py),
+        # então este commit não acontece em toda requisição.
         db.session.commit()
     
 
@@ -158,17 +204,134 @@ class User(UserMixin, db.Model):
         super(User, self).__init__(**kwargs)
         # Se nenhum papel (role) for atribuído ao criar o usuário...
         if self.role is None:
-            # ...verifica se o e-mail do usuário corresponde ao e-mail do administrador definido na configuração.
-            if self.email == current_app.config['FLASKY_ADMIN']:
-                # Se for o admin, atribui o papel de 'Administrator'.
-                self.role = Role.query.filter_by(name='Administrator').first()
-            # Se ainda não tiver um papel (ou seja, não é o admin)...
-            if self.role is None:
-                # ...atribui o papel que está marcado como padrão no banco de dados (geralmente 'User').
-                self.role = Role.query.filter_by(default=True).first()
+            # Os ids dos papéis vêm do cache; db.session.get() usa o mapa de identidade da sessão
+            # e só consulta o banco (pela chave primária) se o papel ainda não estiver carregado.
+            # no_autoflush evita que o usuário, ainda incompleto, seja enviado ao banco durante a busca.
+            with db.session.no_autoflush:
+                # ...verifica se o e-mail do usuário corresponde ao e-mail do administrador definido na configuração.
+                if self.email == current_app.config['FLASKY_ADMIN']:
+                    # Se for o admin, atribui o papel de 'Administrator'.
+                    self.role = _get_role(Role.id_by_name('Administrator'))
+                # Se ainda não tiver um papel (ou seja, não é o admin)...
+                if self.role is None:
+                    # ...atribui o papel que está marcado como padrão no banco de dados (geralmente 'User').
+                    self.role = _get_role(Role.default_id())
+
+    # Retorna o id do usuário com o e-mail informado (ou None), guardando o resultado no cache.
+    # Resultados negativos não são guardados: um usuário criado por outro processo (ou entre o flush
+    # e o commit de um registro) não pode continuar "inexistente" até o fim do TTL. A tag por e-mail
+    # é invalidada depois do commit que cria, altera ou remove o usuário (ver _invalidate_user_cache).
+    @staticmethod
+    @cache.memoize('users', tags=lambda email: ['users', 'email:' + str(email)], cache_none=False)
+    def id_by_email(email):
+        # Com o particionamento ligado, a consulta vai direto para o shard do e-mail.
+        with shards.route_key(email):
+            user = db.session.query(User.id).filter_by(email=email).first()
+        return user.id if user else None
+
+    # Busca o usuário pelo e-mail, usando o id guardado no cache.
+    @staticmethod
+    def get_by_email(email):
+        user_id = User.id_by_email(email)
+        if user_id is None:
+            return None
+        with shards.route_id(user_id):
+            return db.session.get(User, user_id)
 
     # O método __repr__ (representação) fornece uma representação em string "oficial" do objeto.
     # É útil para depuração, pois permite ver uma representação legível do objeto
     # ao imprimi-lo ou exibi-lo no console.
     def __repr__(self):
-        return f'<User {self.email}>'
\ No newline at end of file
+        return f'<User {self.email}>'
+
+
+# Retorna o papel com o id informado, ou None.
+def _get_role(role_id):
+    return db.session.get(Role, role_id) if role_id is not None else None
+
+
+# Verifica a assinatura e a validade do token de acesso da API (ver User.verify_auth_token).
+def _load_auth_token(token):
+    s = Serializer(current_app.config['SECRET_KEY'], salt='flasky-api')
+    try:
+        return s.loads(token, max_age=current_app.config['FLASKY_API_TOKEN_EXPIRATION'])
+    except Exception:
+        return None
+
+
+# Guarda tags do cache para serem invalidadas só depois do commit (ver _invalidate_committed_tags).
+# Invalidar durante o flush deixaria uma janela em que outra requisição lê o valor antigo, ainda
+# não substituído no banco, e o guarda de novo no cache com a versão nova da tag.
+def _invalidate_after_commit(target, *tags):
+    session = db.inspect(target).session
+    if session is None:
+        cache.invalidate_tag(*tags)
+    else:
+        session.info.setdefault('cache_tags', set()).update(tags)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        cache.invalidate_tag(*tags)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_tags(session):
+    session.info.pop('cache_tags', None)
+
+# Invalida as entradas do cache ligadas ao e-mail de um usuário criado ou removido.
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_cache(mapper, connection, target):
+    _invalidate_after_commit(target, 'email:' + str(target.email))
+
+# Mudanças que alteram a autorização (confirmação, senha, papel) incrementam a versão das claims,
+# no mesmo UPDATE. O ping e as edições de perfil não mexem nela.
+@event.listens_for(User, 'before_update')
+def _bump_claims_version(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('confirmed', 'password_hash', 'role_id', 'role')):
+        target.claims_version = (target.claims_version or 0) + 1
+
+# Depois do commit do UPDATE (ou da remoção), invalida a versão guardada no cache: a próxima
+# requisição recarrega a identidade. Uma sessão de um usuário removido deixa de ser aceita.
+@event.listens_for(User, 'after_update')
+def _invalidate_claims_version(mapper, connection, target):
+    if db.inspect(target).attrs.claims_version.history.has_changes():
+        _invalidate_after_commit(target, f'claims:{target.id}')
+
+@event.listens_for(User, 'after_delete')
+def _invalidate_claims_on_delete(mapper, connection, target):
+    _invalidate_after_commit(target, f'claims:{target.id}')
+
+# Na atualização, só invalida se o e-mail mudou (o ping, por exemplo, atualiza o usuário a cada requisição).
+@event.listens_for(User, 'after_update')
+def _invalidate_user_cache_on_email_change(mapper, connection, target):
+    history = db.inspect(target).attrs.email.history
+    emails = (history.deleted or ()) + (history.added or ())
+    if emails:
+        _invalidate_after_commit(target, *('email:' + str(email) for email in emails))
+
+# Mantém o filtro de buscas negativas (ver app/lookup_filter.py) com o nome dos usuários criados
+# e com o novo nome dos alterados. Os outros processos leem os usuários criados pelo id; as
+# renomeações e remoções incrementam a tag do filtro depois do commit, e eles o reconstroem.
+@event.listens_for(User, 'after_insert')
+def _add_to_lookup_filter(mapper, connection, target):
+    for column in lookup_filter.COLUMNS:
+        lookup_filter.add(column, getattr(target, column))
+
+@event.listens_for(User, 'after_update')
+def _update_lookup_filter(mapper, connection, target):
+    state = db.inspect(target)
+    changed = False
+    for column in lookup_filter.COLUMNS:
+        history = state.attrs[column].history
+        if list(history.added or ()) != list(history.deleted or ()):
+            lookup_filter.add(column, getattr(target, column))
+            changed = True
+    if changed:
+        _invalidate_after_commit(target, lookup_filter.GENERATION_TAG)
+
+@event.listens_for(User, 'after_delete')
+def _invalidate_lookup_filter(mapper, connection, target):
+    _invalidate_after_commit(target, lookup_filter.GENERATION_TAG)
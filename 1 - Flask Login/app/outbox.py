@@ -0,0 +1,200 @@
+# Importa os módulos da biblioteca padrão usados pelo despachante.
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+# Importa o evento de sessão do SQLAlchemy, usado para acordar o despachante após um commit.
+from sqlalchemy import event, func, select, update
+# Importa o proxy current_app, usado pelo evento de commit para localizar o despachante.
+from flask import current_app
+# Importa a classe Message para criar objetos de e-mail.
+from flask_mail import Message
+
+# Importa as instâncias do banco de dados e do Flask-Mail.
+from extensions import db, mail
+# Importa o modelo da fila de saída de e-mails.
+from app.models.outbox import OutboxMessage
+# Importa a renderização das mensagens adiadas.
+from app.email import render_deferred
+
+
+class OutboxDispatcher:
+    """
+    Despachante da fila de saída de e-mails (tabela 'email_outbox').
+
+    Lê as mensagens pendentes em lotes, reserva cada lote com um identificador próprio
+    (o que permite rodar mais de um despachante ao mesmo tempo), envia o lote inteiro
+    por uma única conexão SMTP e registra o resultado de cada mensagem.
+    Falhas são retentadas com espera exponencial; depois de FLASKY_OUTBOX_MAX_ATTEMPTS
+    tentativas a mensagem vai para o estado 'dead' (dead letter).
+
+    Segue o padrão das extensões Flask: a instância é criada em app/__init__.py
+    e associada à aplicação com init_app() dentro de create_app().
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Valores padrão, que podem ser sobrescritos em config.py.
+        app.config.setdefault('FLASKY_OUTBOX_BATCH_SIZE', 50)
+        app.config.setdefault('FLASKY_OUTBOX_MAX_ATTEMPTS', 5)
+        app.config.setdefault('FLASKY_OUTBOX_BACKOFF', 30)
+        app.config.setdefault('FLASKY_OUTBOX_LEASE', 300)
+        app.config.setdefault('FLASKY_OUTBOX_POLL_INTERVAL', 10)
+        app.config.setdefault('FLASKY_OUTBOX_WORKER', False)
+        app.config.setdefault('FLASKY_MAIL_DEDUP_WINDOW', 300)
+        app.config.setdefault('FLASKY_MAIL_QUOTA', 5)
+        app.config.setdefault('FLASKY_MAIL_QUOTA_PERIOD', 3600)
+        app.extensions['outbox'] = self
+        # A thread de envio é opcional: sem ela, a fila é drenada com o comando 'flask outbox'.
+        if app.config['FLASKY_OUTBOX_WORKER']:
+            worker = _OutboxWorker(self, app)
+            app.extensions['outbox_worker'] = worker
+            worker.start()
+
+    def dispatch(self, app, batch_size=None):
+        """
+        Processa um lote de mensagens e retorna um dicionário com as contagens
+        ('sent', 'retried', 'dead'). Deve ser chamada dentro de um contexto de aplicação.
+        """
+        batch_size = batch_size or app.config['FLASKY_OUTBOX_BATCH_SIZE']
+        stats = {'sent': 0, 'retried': 0, 'dead': 0}
+        messages = self._claim(app, batch_size)
+        if not messages:
+            return stats
+        try:
+            # Uma única conexão SMTP para o lote inteiro.
+            with mail.connect() as conn:
+                for msg in messages:
+                    try:
+                        # Mensagens adiadas são renderizadas aqui, no primeiro envio.
+                        if msg.body is None and msg.context is not None:
+                            render_deferred(app, msg)
+                        conn.send(self._build_message(app, msg))
+                    except Exception as e:
+                        self._failed(app, msg, e, stats)
+                    else:
+                        msg.status = OutboxMessage.SENT
+                        msg.sent_at = datetime.utcnow()
+                        msg.last_error = None
+                        stats['sent'] += 1
+        except Exception as e:
+            # Falha ao abrir (ou fechar) a conexão: todas as mensagens ainda não resolvidas voltam à fila.
+            for msg in messages:
+                if msg.status == OutboxMessage.SENDING:
+                    self._failed(app, msg, e, stats)
+        db.session.commit()
+        return stats
+
+    def drain(self, app, batch_size=None):
+        """Processa lotes até não restar mensagem pronta para envio. Retorna as contagens somadas."""
+        total = {'sent': 0, 'retried': 0, 'dead': 0}
+        while True:
+            stats = self.dispatch(app, batch_size)
+            for key in total:
+                total[key] += stats[key]
+            if not any(stats.values()):
+                return total
+
+    def stats(self):
+        """
+        Retorna as mensagens por estado e, por template, as enfileiradas e os pedidos suprimidos
+        (agrupados em uma mensagem existente ou barrados pela cota). Deve ser chamada dentro de
+        um contexto de aplicação.
+        """
+        status = dict(db.session.execute(select(OutboxMessage.status, func.count())
+                                         .group_by(OutboxMessage.status)).all())
+        templates = {row.template: {'messages': row.messages, 'coalesced': row.coalesced or 0,
+                                    'throttled': row.throttled or 0}
+                     for row in db.session.execute(
+                         select(OutboxMessage.template, func.count().label('messages'),
+                                func.sum(OutboxMessage.coalesced).label('coalesced'),
+                                func.sum(OutboxMessage.throttled).label('throttled'))
+                         .group_by(OutboxMessage.template))}
+        return {'status': status, 'templates': templates}
+
+    def notify(self, app):
+        """Acorda a thread de envio (se houver) para processar a fila imediatamente."""
+        worker = app.extensions.get('outbox_worker')
+        if worker is not None:
+            worker.wakeup.set()
+
+    def _claim(self, app, batch_size):
+        # Reserva um lote. Mensagens em SENDING cuja reserva expirou (o despachante morreu
+        # no meio do envio) também são elegíveis, por isso o filtro usa apenas next_attempt_at.
+        now = datetime.utcnow()
+        ids = [row.id for row in db.session.query(OutboxMessage.id)
+               .filter(OutboxMessage.status.in_([OutboxMessage.PENDING, OutboxMessage.SENDING]),
+                       OutboxMessage.next_attempt_at <= now)
+               .order_by(OutboxMessage.id)
+               .limit(batch_size)]
+        if not ids:
+            return []
+        claim = uuid.uuid4().hex
+        lease = now + timedelta(seconds=app.config['FLASKY_OUTBOX_LEASE'])
+        # O UPDATE condicional garante que dois despachantes não reservem a mesma mensagem.
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids),
+                   OutboxMessage.status.in_([OutboxMessage.PENDING, OutboxMessage.SENDING]),
+                   OutboxMessage.next_attempt_at <= now)
+            .values(status=OutboxMessage.SENDING, claimed_by=claim, next_attempt_at=lease))
+        db.session.commit()
+        return OutboxMessage.query.filter_by(claimed_by=claim, status=OutboxMessage.SENDING) \
+            .order_by(OutboxMessage.id).all()
+
+    def _build_message(self, app, msg):
+        message = Message(msg.subject, sender=app.config['FLASKY_MAIL_SENDER'], recipients=[msg.recipient])
+        message.body = msg.body
+        message.html = msg.html
+        # A chave de idempotência vira o Message-ID: reenvios da mesma mensagem têm o mesmo id.
+        message.msgId = f'<{msg.idempotency_key}@flasky>'
+        return message
+
+    def _failed(self, app, msg, error, stats):
+        msg.attempts = (msg.attempts or 0) + 1
+        msg.last_error = str(error)
+        if msg.attempts >= app.config['FLASKY_OUTBOX_MAX_ATTEMPTS']:
+            msg.status = OutboxMessage.DEAD
+            stats['dead'] += 1
+        else:
+            # Espera exponencial: BACKOFF, 2*BACKOFF, 4*BACKOFF...
+            delay = app.config['FLASKY_OUTBOX_BACKOFF'] * 2 ** (msg.attempts - 1)
+            msg.status = OutboxMessage.PENDING
+            msg.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            stats['retried'] += 1
+
+
+class _OutboxWorker(threading.Thread):
+    # Thread em segundo plano que drena a fila periodicamente ou quando acordada após um commit.
+    def __init__(self, dispatcher, app):
+        super().__init__(name='flasky-outbox', daemon=True)
+        self.dispatcher = dispatcher
+        self.app = app
+        self.wakeup = threading.Event()
+
+    def run(self):
+        interval = self.app.config['FLASKY_OUTBOX_POLL_INTERVAL']
+        while True:
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.dispatcher.drain(self.app)
+                except Exception:
+                    # Um erro inesperado (ex: banco indisponível) não pode matar a thread.
+                    self.app.logger.exception('Falha ao despachar a fila de e-mails')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+# Acorda o despachante logo após o commit de uma transação que enfileirou e-mails.
+@event.listens_for(db.session, 'after_commit')
+def _wake_dispatcher(session):
+    if session.info.pop('outbox_dirty', False):
+        dispatcher = current_app.extensions.get('outbox')
+        if dispatcher is not None:
+            dispatcher.notify(current_app)
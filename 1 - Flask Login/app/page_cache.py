@@ -0,0 +1,154 @@
+# Importa os módulos da biblioteca padrão usados pelo cache.
+import threading
+import time
+from collections import OrderedDict
+
+# Importa os objetos do Flask usados para inspecionar a requisição e montar a resposta.
+from flask import current_app, g, request, session
+# Importa o gerador de tokens CSRF do Flask-WTF, usado para preencher o "buraco" do token.
+from flask_wtf.csrf import generate_csrf
+
+
+class PageCache:
+    """
+    Cache de página inteira para requisições GET de visitantes anônimos.
+
+    Na primeira requisição (miss) a página é renderizada normalmente pelo Jinja; em seguida,
+    os trechos que mudam a cada visitante (os "buracos": token CSRF, data/hora atual...) são
+    trocados por marcadores e o resultado (a "casca") é guardado em memória, uma vez por rota.
+    Nas requisições seguintes (hit) a casca é servida direto do before_request, preenchendo os
+    marcadores por substituição simples de texto, sem passar pela view nem pelos templates.
+
+    O cache é ignorado (bypass) quando a sessão tem qualquer coisa além do token CSRF:
+    mensagens flash, usuário logado, nome salvo pelo formulário da página inicial etc.
+    """
+
+    # Chaves de sessão que não tornam a página diferente para o visitante.
+    SAFE_SESSION_KEYS = frozenset(['csrf_token', '_fresh', '_permanent'])
+
+    # Formato do marcador que ocupa o lugar de cada buraco na casca.
+    MARKER = '\x00hole:{}\x00'
+
+    def __init__(self, app=None):
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'bypasses': 0, 'stores': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_PAGE_CACHE', False)
+        app.config.setdefault('FLASKY_PAGE_CACHE_ENDPOINTS', (
+            'main.index', 'auth.login', 'auth.register', 'auth.password_reset_request'))
+        app.config.setdefault('FLASKY_PAGE_CACHE_TTL', 300)
+        app.config.setdefault('FLASKY_PAGE_CACHE_MAX_ENTRIES', 256)
+        app.extensions['page_cache'] = self
+        # Os hooks são sempre registrados; FLASKY_PAGE_CACHE é lido a cada requisição.
+        app.before_request(self._serve)
+        app.after_request(self._store)
+
+    def hole(self, name, provider):
+        """
+        Declara um trecho da página que muda a cada requisição.
+        Chama 'provider' (uma função sem argumentos que retorna uma string), registra o valor
+        para que ele seja trocado por um marcador na casca, e retorna o valor para a view usar.
+        Ex: current_time = page_cache.hole('current_time', utcnow_iso)
+        """
+        value = provider()
+        holes = g.setdefault('page_cache_holes', {})
+        holes[name] = (value, provider)
+        return value
+
+    def stats(self):
+        """Retorna os contadores do cache e a taxa de acerto (hits / (hits + misses))."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._pages)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Descarta todas as páginas guardadas (ex: depois de mudar um template) e zera os contadores."""
+        with self._lock:
+            self._pages.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _cacheable(self):
+        # Só GETs para as rotas configuradas, com o cache ligado.
+        config = current_app.config
+        return config['FLASKY_PAGE_CACHE'] \
+            and request.method == 'GET' \
+            and request.endpoint in config['FLASKY_PAGE_CACHE_ENDPOINTS']
+
+    def _anonymous(self):
+        # O cookie "lembrar de mim" restaura o login na própria requisição, mesmo com a sessão vazia.
+        if current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in request.cookies:
+            return False
+        # Qualquer chave de sessão além das "seguras" (flash, usuário logado, nome...) personaliza a página.
+        return set(session.keys()) <= self.SAFE_SESSION_KEYS
+
+    def _serve(self):
+        if not self._cacheable():
+            return None
+        if not self._anonymous():
+            self._count('bypasses')
+            g.page_cache_status = 'BYPASS'
+            return None
+        key = request.full_path
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None and entry['expires'] > now:
+                # Move a entrada para o fim: as menos usadas são descartadas primeiro.
+                self._pages.move_to_end(key)
+            else:
+                entry = None
+        if entry is None:
+            self._count('misses')
+            g.page_cache_status = 'MISS'
+            g.page_cache_key = key
+            return None
+        self._count('hits')
+        g.page_cache_status = 'HIT'
+        # Preenche os buracos com os valores desta requisição.
+        body = entry['body']
+        for name, provider in entry['providers'].items():
+            body = body.replace(self.MARKER.format(name), provider())
+        return current_app.response_class(body, status=200, mimetype=entry['mimetype'])
+
+    def _store(self, response):
+        status = g.pop('page_cache_status', None)
+        if status is not None:
+            response.headers['X-Page-Cache'] = status
+        key = g.pop('page_cache_key', None)
+        # Só guarda respostas 200 em HTML de requisições que ainda são anônimas depois da view.
+        if key is None or response.status_code != 200 or response.mimetype != 'text/html' \
+                or response.direct_passthrough or not self._anonymous():
+            return response
+        body = response.get_data(as_text=True)
+        providers = {}
+        # O token CSRF é gerado (e guardado em g) pelo próprio template ao renderizar o formulário.
+        holes = dict(g.get('page_cache_holes', {}))
+        if 'csrf_token' in g:
+            holes['csrf_token'] = (g.csrf_token, generate_csrf)
+        for name, (value, provider) in holes.items():
+            if value and value in body:
+                body = body.replace(value, self.MARKER.format(name))
+                providers[name] = provider
+        config = current_app.config
+        with self._lock:
+            self._pages[key] = {'body': body,
+                                'mimetype': response.mimetype,
+                                'providers': providers,
+                                'expires': time.monotonic() + config['FLASKY_PAGE_CACHE_TTL']}
+            self._pages.move_to_end(key)
+            while len(self._pages) > config['FLASKY_PAGE_CACHE_MAX_ENTRIES']:
+                self._pages.popitem(last=False)
+            self._stats['stores'] += 1
+        return response
@@ -0,0 +1,137 @@
+# Importa os módulos da biblioteca padrão usados pelo rastreador de presença.
+import os
+import threading
+import time
+
+# Importa o gerenciador de conexões SQLite compartilhado com o backend de cache.
+from caching import SQLiteConnections
+
+
+def current_minute(now=None):
+    # Número do minuto desde a época Unix; cada minuto é um "balde" de atividade.
+    return int((time.time() if now is None else now) // 60)
+
+
+class MemoryPresenceStore:
+    """
+    Guarda a atividade em um buffer circular de conjuntos de ids, um conjunto por minuto.
+    A posição do minuto no buffer é 'minuto % tamanho'; ao reutilizar uma posição de um minuto
+    antigo, o conjunto é zerado. Cada processo (worker) tem o seu próprio buffer.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._buckets = [(None, set()) for _ in range(size)]
+        self._lock = threading.Lock()
+
+    def add(self, minute, user_id):
+        """Registra a atividade. Retorna True se foi a primeira do usuário neste minuto."""
+        slot = minute % self.size
+        with self._lock:
+            stamp, users = self._buckets[slot]
+            if stamp != minute:
+                users = set()
+                self._buckets[slot] = (minute, users)
+            if user_id in users:
+                return False
+            users.add(user_id)
+            return True
+
+    def active(self, minute, window):
+        """Retorna os ids ativos nos últimos 'window' minutos (incluindo o atual)."""
+        result = set()
+        with self._lock:
+            for m in range(minute - window + 1, minute + 1):
+                stamp, users = self._buckets[m % self.size]
+                if stamp == m:
+                    result |= users
+        return result
+
+
+class SQLitePresenceStore:
+    """
+    Agrega a atividade de todos os workers em um arquivo SQLite compartilhado
+    (de preferência em memória, ex: /dev/shm). Cada worker mantém um buffer em memória
+    só para saber se já gravou o usuário no minuto atual, então cada usuário gera no
+    máximo uma gravação por minuto por worker.
+    """
+
+    def __init__(self, path, size):
+        self.size = size
+        self._local = MemoryPresenceStore(size)
+        self._connection = SQLiteConnections(path).get
+        self._pruned = None
+        # WITHOUT ROWID com chave (minute, user_id): a consulta por janela é uma leitura de intervalo na chave.
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS presence (minute INTEGER NOT NULL, user_id INTEGER NOT NULL, '
+            'PRIMARY KEY (minute, user_id)) WITHOUT ROWID')
+
+    def add(self, minute, user_id):
+        if not self._local.add(minute, user_id):
+            return False
+        conn = self._connection()
+        conn.execute('INSERT OR IGNORE INTO presence (minute, user_id) VALUES (?, ?)', (minute, user_id))
+        # Uma vez por minuto, apaga os baldes que saíram da janela.
+        if self._pruned != minute:
+            self._pruned = minute
+            conn.execute('DELETE FROM presence WHERE minute <= ?', (minute - self.size,))
+        return True
+
+    def active(self, minute, window):
+        rows = self._connection().execute(
+            'SELECT DISTINCT user_id FROM presence WHERE minute > ? AND minute <= ?',
+            (minute - window, minute))
+        return {row[0] for row in rows}
+
+
+class PresenceTracker:
+    """
+    Rastreador de presença ("online agora") em memória.
+
+    O hook before_request registra a atividade do usuário logado no balde do minuto atual.
+    As consultas ("quantos usuários estiveram ativos nos últimos N minutos") percorrem apenas
+    os N baldes da janela, sem tocar na tabela 'users'.
+
+    Configuração:
+    - FLASKY_PRESENCE_BACKEND: 'memory' (por processo) ou 'sqlite' (agregado entre workers).
+    - FLASKY_PRESENCE_WINDOW: maior janela consultável, em minutos (tamanho do buffer circular).
+    - FLASKY_PRESENCE_SQLITE_PATH: arquivo do backend SQLite.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self.window = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_PRESENCE_BACKEND', 'memory')
+        app.config.setdefault('FLASKY_PRESENCE_WINDOW', 60)
+        app.config.setdefault('FLASKY_PRESENCE_SQLITE_PATH', os.path.join(app.instance_path, 'presence.sqlite'))
+        self.window = app.config['FLASKY_PRESENCE_WINDOW']
+        if app.config['FLASKY_PRESENCE_BACKEND'] == 'sqlite':
+            path = app.config['FLASKY_PRESENCE_SQLITE_PATH']
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.store = SQLitePresenceStore(path, self.window)
+        else:
+            self.store = MemoryPresenceStore(self.window)
+        app.extensions['presence'] = self
+
+    def record(self, user_id, now=None):
+        """
+        Registra a atividade do usuário. Retorna True se foi a primeira dele no minuto atual
+        (neste worker); o before_request usa isso para atualizar 'last_seen' no máximo uma vez por minuto.
+        """
+        return self.store.add(current_minute(now), user_id)
+
+    def active_users(self, minutes=5, now=None):
+        """Retorna o conjunto de ids dos usuários ativos nos últimos 'minutes' minutos."""
+        return self.store.active(current_minute(now), min(minutes, self.window))
+
+    def count(self, minutes=5, now=None):
+        """Retorna o número de usuários ativos nos últimos 'minutes' minutos."""
+        return len(self.active_users(minutes, now))
+
+    def is_online(self, user_id, minutes=5, now=None):
+        """Indica se o usuário esteve ativo nos últimos 'minutes' minutos."""
+        return user_id in self.active_users(minutes, now)
@@ -0,0 +1,180 @@
+# Importa os módulos da biblioteca padrão usados pelo profiler.
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+# Importa os objetos do Flask usados para inspecionar a requisição.
+from flask import current_app, g, request
+# Importa o serializador usado para assinar o token do cabeçalho de profiling.
+from itsdangerous import URLSafeTimedSerializer as Serializer, BadSignature
+
+
+class RequestProfiler:
+    """
+    Profiler por amostragem de pilha para requisições em produção.
+
+    Uma requisição é perfilada quando traz no cabeçalho FLASKY_PROFILER_HEADER um token
+    assinado gerado para um administrador (comando 'flask profile-token'), ou, com
+    FLASKY_PROFILER ligado, para uma fração FLASKY_PROFILER_SAMPLE_RATE das requisições.
+
+    Enquanto houver requisições perfiladas, uma thread amostra a pilha de cada uma delas a cada
+    FLASKY_PROFILER_INTERVAL segundos (sys._current_frames). Ao final da requisição, as pilhas
+    contadas são gravadas em FLASKY_PROFILER_DIR/<endpoint>/ no formato "collapsed stacks"
+    (uma pilha por linha, funções separadas por ';', seguida da contagem), o mesmo usado
+    pelo flamegraph.pl e pelo speedscope. O comando 'flask profile-report' agrega esses arquivos.
+
+    Os hooks são registrados antes de todos os outros, então a amostragem cobre o pipeline
+    inteiro: before_request (incluindo o ping), carregamento do usuário, validação do
+    formulário e renderização do template.
+    """
+
+    # Salt do token de profiling, para que ele não sirva como nenhum outro token da aplicação.
+    TOKEN_SALT = 'flasky-profile'
+
+    def __init__(self, app=None):
+        self._sampler = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_PROFILER', False)
+        app.config.setdefault('FLASKY_PROFILER_SAMPLE_RATE', 0.01)
+        app.config.setdefault('FLASKY_PROFILER_INTERVAL', 0.005)
+        app.config.setdefault('FLASKY_PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+        app.config.setdefault('FLASKY_PROFILER_HEADER', 'X-Flasky-Profile')
+        app.config.setdefault('FLASKY_PROFILER_TOKEN_AGE', 3600)
+        app.extensions['profiler'] = self
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+
+    def generate_token(self, user):
+        """Gera o token do cabeçalho de profiling. Apenas administradores podem recebê-lo."""
+        if not user.is_administrator():
+            raise ValueError('Apenas administradores podem gerar tokens de profiling.')
+        s = Serializer(current_app.config['SECRET_KEY'], salt=self.TOKEN_SALT)
+        return s.dumps({'admin': user.id})
+
+    def verify_token(self, token):
+        # A verificação usa só a assinatura: o token já foi emitido para um administrador.
+        s = Serializer(current_app.config['SECRET_KEY'], salt=self.TOKEN_SALT)
+        try:
+            s.loads(token, max_age=current_app.config['FLASKY_PROFILER_TOKEN_AGE'])
+        except BadSignature:
+            return False
+        return True
+
+    def _should_profile(self):
+        token = request.headers.get(current_app.config['FLASKY_PROFILER_HEADER'])
+        if token:
+            return self.verify_token(token)
+        config = current_app.config
+        return config['FLASKY_PROFILER'] and random.random() < config['FLASKY_PROFILER_SAMPLE_RATE']
+
+    def _get_sampler(self):
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = _StackSampler(current_app.config['FLASKY_PROFILER_INTERVAL'])
+                self._sampler.start()
+            return self._sampler
+
+    def _start(self):
+        if not self._should_profile():
+            return
+        g.profiler_ident = threading.get_ident()
+        g.profiler_started = time.time()
+        self._get_sampler().register(g.profiler_ident)
+
+    def _stop(self, exc):
+        ident = g.pop('profiler_ident', None)
+        if ident is None:
+            return
+        stacks = self._sampler.unregister(ident)
+        if not stacks:
+            return
+        directory = os.path.join(current_app.config['FLASKY_PROFILER_DIR'], request.endpoint or 'unknown')
+        os.makedirs(directory, exist_ok=True)
+        filename = '{:.6f}-{}-{}.folded'.format(g.pop('profiler_started'), os.getpid(), ident)
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class _StackSampler(threading.Thread):
+    # Thread que amostra periodicamente a pilha das threads registradas.
+    def __init__(self, interval):
+        super().__init__(name='flasky-profiler', daemon=True)
+        self.interval = interval
+        self.active = {}
+        self.condition = threading.Condition()
+
+    def register(self, ident):
+        with self.condition:
+            self.active[ident] = Counter()
+            self.condition.notify()
+
+    def unregister(self, ident):
+        with self.condition:
+            return self.active.pop(ident, None)
+
+    def run(self):
+        while True:
+            # Dorme sem custo algum enquanto nenhuma requisição está sendo perfilada.
+            with self.condition:
+                while not self.active:
+                    self.condition.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.condition:
+                for ident, counter in self.active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counter[collapse_stack(frame)] += 1
+
+
+def collapse_stack(frame):
+    """Converte uma pilha em uma linha 'raiz;...;folha', no formato de collapsed stacks."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename):
+    # Remove os prefixos de instalação do Python, deixando apenas o caminho a partir do pacote.
+    for prefix in sorted(set(sys.path), key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def aggregate_profiles(directory, endpoint=None):
+    """
+    Soma as pilhas de todos os arquivos .folded em 'directory' (ou apenas os do endpoint
+    informado) e retorna um Counter {pilha: contagem}.
+    """
+    stacks = Counter()
+    if not os.path.isdir(directory):
+        return stacks
+    endpoints = [endpoint] if endpoint else sorted(os.listdir(directory))
+    for name in endpoints:
+        path = os.path.join(directory, name)
+        if not os.path.isdir(path):
+            continue
+        for filename in os.listdir(path):
+            if not filename.endswith('.folded'):
+                continue
+            with open(os.path.join(path, filename), encoding='utf-8') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        stacks[stack] += int(count)
+    return stacks
@@ -0,0 +1,224 @@
+# Importa os módulos da biblioteca padrão usados pelo registro de requisições.
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+# Importa os objetos do Flask usados para inspecionar a requisição.
+from flask import current_app, g, request, session
+
+
+class RequestLogger:
+    """
+    Registro estruturado de acessos e de eventos de autenticação.
+
+    As threads que atendem requisições apenas montam um dicionário compacto e o colocam
+    em uma fila em memória (sem E/S de arquivo). Uma única thread em segundo plano retira
+    os registros em lotes, converte para JSON e os grava em arquivos JSONL com rotação por tamanho.
+    Se a fila estiver cheia, o registro é descartado e contado em 'dropped', em vez de
+    atrasar a requisição. Registros que não puderam ser gravados (ex: valor não serializável,
+    disco cheio) são contados em 'errors', e a thread continua rodando.
+
+    Tipos de registro:
+    - 'access': endpoint, método, status, latência (ms) e id do usuário; sujeito a amostragem por endpoint.
+    - 'auth': resultado de login, logout, confirmação de conta e redefinição de senha; nunca amostrado.
+    """
+
+    def __init__(self, app=None):
+        self._queue = None
+        self._lock = threading.Lock()
+        self._stats = {'written': 0, 'dropped': 0, 'sampled_out': 0, 'errors': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Sem FLASKY_REQUEST_LOG (caminho do arquivo), o registro fica desligado.
+        app.config.setdefault('FLASKY_REQUEST_LOG', None)
+        app.config.setdefault('FLASKY_REQUEST_LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('FLASKY_REQUEST_LOG_BATCH_SIZE', 500)
+        app.config.setdefault('FLASKY_REQUEST_LOG_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('FLASKY_REQUEST_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('FLASKY_REQUEST_LOG_BACKUP_COUNT', 5)
+        app.config.setdefault('FLASKY_REQUEST_LOG_SAMPLING', {})
+        app.extensions['request_log'] = self
+        path = app.config['FLASKY_REQUEST_LOG']
+        if not path:
+            return
+        if self._queue is None:
+            self._queue = queue.Queue(maxsize=app.config['FLASKY_REQUEST_LOG_QUEUE_SIZE'])
+            self._writer = _LogWriter(self, path,
+                                      batch_size=app.config['FLASKY_REQUEST_LOG_BATCH_SIZE'],
+                                      flush_interval=app.config['FLASKY_REQUEST_LOG_FLUSH_INTERVAL'],
+                                      max_bytes=app.config['FLASKY_REQUEST_LOG_MAX_BYTES'],
+                                      backup_count=app.config['FLASKY_REQUEST_LOG_BACKUP_COUNT'])
+            self._writer.start()
+            # Grava o que ainda estiver na fila quando o processo terminar normalmente.
+            atexit.register(self.close)
+        app.before_request(self._start_timer)
+        app.after_request(self._log_access)
+
+    @property
+    def enabled(self):
+        return self._queue is not None
+
+    def auth_event(self, event, ok, user_id=None):
+        """
+        Registra o resultado de um evento de autenticação.
+        Ex: request_log.auth_event('login', ok=False)
+        """
+        if self._queue is None:
+            return
+        self._enqueue({'t': 'auth',
+                       'ts': time.time(),
+                       'event': event,
+                       'ok': ok,
+                       'uid': user_id,
+                       'ip': request.remote_addr})
+
+    def stats(self):
+        """Retorna os contadores de registros gravados, descartados, removidos pela amostragem e perdidos por erro."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+    def close(self, timeout=5):
+        """Esvazia a fila e encerra a thread de gravação."""
+        if self._queue is None:
+            return
+        writer = self._writer
+        self._queue = None
+        writer.stop(timeout)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _enqueue(self, record):
+        q = self._queue
+        if q is None:
+            return
+        try:
+            q.put_nowait(record)
+        except queue.Full:
+            self._count('dropped')
+
+    def _start_timer(self):
+        g.request_log_start = time.perf_counter()
+
+    def _log_access(self, response):
+        start = g.pop('request_log_start', None)
+        if start is None or self._queue is None:
+            return response
+        endpoint = request.endpoint
+        # Amostragem por endpoint: com taxa 0.1, apenas ~10% das requisições são registradas.
+        rate = current_app.config['FLASKY_REQUEST_LOG_SAMPLING'].get(endpoint, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self._count('sampled_out')
+            return response
+        # O id do usuário é lido direto da sessão, para não forçar o carregamento do usuário.
+        self._enqueue({'t': 'access',
+                       'ts': time.time(),
+                       'endpoint': endpoint,
+                       'method': request.method,
+                       'status': response.status_code,
+                       'ms': round((time.perf_counter() - start) * 1000, 3),
+                       'uid': session.get('_user_id'),
+                       'rate': rate})
+        return response
+
+
+class _LogWriter(threading.Thread):
+    # Thread que grava os registros da fila em lotes, com rotação por tamanho de arquivo.
+    _STOP = object()
+
+    def __init__(self, logger, path, batch_size, flush_interval, max_bytes, backup_count):
+        super().__init__(name='flasky-request-log', daemon=True)
+        self.logger = logger
+        self.queue = logger._queue
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.stream = None
+
+    def stop(self, timeout):
+        self.queue.put(self._STOP)
+        self.join(timeout)
+
+    def run(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.stream = open(self.path, 'a', encoding='utf-8')
+        try:
+            while True:
+                try:
+                    batch = [self.queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                # Retira o que mais estiver disponível, até o tamanho do lote, sem esperar.
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = self._STOP in batch
+                records = [r for r in batch if r is not self._STOP]
+                if records:
+                    try:
+                        self._write(records)
+                    except Exception:
+                        # Uma falha de E/S perde só este lote: a thread segue gravando os próximos.
+                        self.logger._count('errors', len(records))
+                        self._reopen()
+                if stop:
+                    return
+        finally:
+            if self.stream is not None:
+                self.stream.close()
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+            except (TypeError, ValueError):
+                # Registro com um valor que não vira JSON: descarta só ele.
+                self.logger._count('errors')
+        self.stream.write(''.join(lines))
+        self.stream.flush()
+        self.logger._count('written', len(lines))
+        if self.max_bytes and self.stream.tell() >= self.max_bytes:
+            try:
+                self._rotate()
+            except OSError:
+                # Os registros já foram gravados: segue no arquivo atual (reaberto, se preciso).
+                self._reopen()
+
+    def _rotate(self):
+        # Renomeia requests.jsonl -> requests.jsonl.1 -> requests.jsonl.2 ... e reabre o arquivo.
+        self.stream.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{i}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{i + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.stream = open(self.path, 'a', encoding='utf-8')
+
+    def _reopen(self):
+        # Depois de uma falha (ex: na rotação), garante um arquivo aberto para o próximo lote.
+        try:
+            if self.stream is not None and not self.stream.closed:
+                self.stream.close()
+        except OSError:
+            pass
+        try:
+            self.stream = open(self.path, 'a', encoding='utf-8')
+        except OSError:
+            self.stream = None
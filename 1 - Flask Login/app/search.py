@@ -0,0 +1,173 @@
+# Importa o módulo de expressões regulares, usado para separar os termos da busca.
+import re
+
+# Importa os construtores de SQL do SQLAlchemy usados pelo índice de busca.
+from sqlalchemy import DDL, event, text
+
+# Importa a instância do banco de dados e o particionamento de usuários (um índice por shard).
+from extensions import db, shards
+# Importa o modelo de usuário, cuja tabela é indexada.
+from app.models import User
+
+# Nome da tabela virtual FTS5 que indexa os usuários.
+INDEX = 'users_fts'
+# Colunas de 'users' que são indexadas, na ordem usada pelos pesos do bm25.
+COLUMNS = ('name', 'location', 'about_me')
+# Pesos do bm25 por coluna: um termo no nome vale mais que na localização, que vale mais que na biografia.
+WEIGHTS = (10.0, 2.0, 1.0)
+
+
+def _create_index_sql(name):
+    # Tabela FTS5 de "conteúdo externo": o texto fica apenas em 'users', o índice guarda só os termos.
+    # remove_diacritics faz 'Joao' encontrar 'João'; prefix='2 3' acelera buscas por prefixo curtas.
+    return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+            f"{', '.join(COLUMNS)}, content='users', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+
+
+def _trigger_sql(index, suffix='', when=''):
+    # Gatilhos que mantêm o índice sincronizado com a tabela 'users', dentro da mesma transação.
+    # O gatilho de UPDATE só dispara quando uma coluna indexada muda: o ping (last_seen) não toca no índice.
+    cols = ', '.join(COLUMNS)
+    new = ', '.join('new.' + c for c in COLUMNS)
+    old = ', '.join('old.' + c for c in COLUMNS)
+    when_new = f'WHEN {when.format(row="new")} ' if when else ''
+    when_old = f'WHEN {when.format(row="old")} ' if when else ''
+    delete = f"INSERT INTO {index} ({index}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {index} (rowid, {cols}) VALUES (new.id, {new});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai{suffix} AFTER INSERT ON users {when_new}BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad{suffix} AFTER DELETE ON users {when_old}BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au{suffix} AFTER UPDATE OF {cols} ON users {when_old}"
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def _drop_sql(index, suffix=''):
+    return [f'DROP TRIGGER IF EXISTS {index}_{kind}{suffix}' for kind in ('ai', 'ad', 'au')] + \
+        [f'DROP TABLE IF EXISTS {index}']
+
+
+# Cria (e remove) o índice junto com a tabela 'users' em db.create_all() / db.drop_all().
+# execute_if limita o DDL ao SQLite, o único banco com FTS5.
+for _statement in [_create_index_sql(INDEX)] + _trigger_sql(INDEX):
+    event.listen(User.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in _drop_sql(INDEX):
+    event.listen(User.__table__, 'before_drop', DDL(_statement).execute_if(dialect='sqlite'))
+
+
+def init_app(app):
+    """
+    Garante que o índice exista em bancos criados antes dele (quando a tabela 'users'
+    já existia e, portanto, o evento 'after_create' não foi disparado).
+    """
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return
+        for _ in shards.each():
+            exists = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': INDEX}).first()
+            if not exists:
+                _rebuild(batch_size=5000)
+
+
+def _match_expression(query):
+    # Converte o texto digitado em uma expressão FTS5 segura: cada palavra vira um termo
+    # entre aspas (sem operadores vindos do usuário) com '*' para busca por prefixo.
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_users(query, page=1, per_page=20):
+    """
+    Busca usuários por nome, localização e biografia, com correspondência por prefixo
+    e ordenação por relevância (bm25). Retorna (lista de usuários, há mais resultados).
+    Com o particionamento ligado, cada shard tem o seu índice: os melhores resultados de
+    cada um são combinados pela pontuação do bm25.
+    """
+    match = _match_expression(query)
+    if not match:
+        return [], False
+    weights = ', '.join(str(w) for w in WEIGHTS)
+    offset = (page - 1) * per_page
+    # Busca uma linha a mais que o fim da página para saber se existe uma próxima página.
+    # Sem particionamento, o próprio banco aplica o OFFSET.
+    single = not shards.enabled
+    rows = []
+    for _ in shards.each():
+        rows += db.session.execute(text(
+            f'SELECT rowid, bm25({INDEX}, {weights}) AS rank FROM {INDEX} WHERE {INDEX} MATCH :match '
+            'ORDER BY rank LIMIT :limit OFFSET :offset'),
+            {'match': match, 'limit': per_page + 1 if single else offset + per_page + 1,
+             'offset': offset if single else 0}).all()
+    if not single:
+        rows = sorted(rows, key=lambda row: row.rank)[offset:]
+    ids = [row.rowid for row in rows[:per_page]]
+    users = {}
+    for shard, shard_ids in shards.group_ids(ids).items():
+        with shards.route(shard):
+            users.update({u.id: u for u in User.query.filter(User.id.in_(shard_ids))} if shard_ids else {})
+    # Mantém a ordem de relevância devolvida pelo índice.
+    return [users[i] for i in ids if i in users], len(rows) > per_page
+
+
+def rebuild(batch_size=5000):
+    """
+    Reconstrói o índice em lotes, sem bloquear a tabela 'users' por muito tempo.
+
+    O novo índice é montado em uma tabela separada ('users_fts_new'), um lote de ids por
+    transação. Enquanto isso, gatilhos temporários replicam no novo índice as mudanças feitas
+    em linhas que já foram copiadas (id <= cursor); linhas ainda não copiadas serão lidas já
+    atualizadas pelo próximo lote. No final, uma única transação curta troca o índice antigo
+    pelo novo. Com o particionamento ligado, reconstrói o índice de cada shard.
+    Retorna o número de usuários indexados.
+    """
+    return sum(_rebuild(batch_size) for _ in shards.each())
+
+
+def _rebuild(batch_size):
+    # Reconstrói o índice do banco atual (ou do shard direcionado por shards.route).
+    new = INDEX + '_new'
+    cursor_table = INDEX + '_rebuild'
+    session = db.session
+    cols = ', '.join(COLUMNS)
+    # Prepara o novo índice, a tabela do cursor e os gatilhos temporários.
+    for statement in _drop_sql(new) + [f'DROP TRIGGER IF EXISTS {new}_{k}_rebuild' for k in ('ai', 'ad', 'au')]:
+        session.execute(text(statement))
+    session.execute(text(_create_index_sql(new)))
+    session.execute(text(f'CREATE TABLE IF NOT EXISTS {cursor_table} (cursor INTEGER NOT NULL)'))
+    session.execute(text(f'DELETE FROM {cursor_table}'))
+    session.execute(text(f'INSERT INTO {cursor_table} (cursor) VALUES (0)'))
+    for statement in _trigger_sql(new, suffix='_rebuild',
+                                  when=f'{{row}}.id <= (SELECT cursor FROM {cursor_table})'):
+        session.execute(text(statement))
+    session.commit()
+
+    # Copia os usuários em lotes, cada um em uma transação curta.
+    cursor = 0
+    total = 0
+    while True:
+        last = session.execute(text(
+            'SELECT max(id) FROM (SELECT id FROM users WHERE id > :cursor ORDER BY id LIMIT :limit)'),
+            {'cursor': cursor, 'limit': batch_size}).scalar()
+        if last is None:
+            break
+        result = session.execute(text(
+            f'INSERT INTO {new} (rowid, {cols}) SELECT id, {cols} FROM users WHERE id > :cursor AND id <= :last'),
+            {'cursor': cursor, 'last': last})
+        session.execute(text(f'UPDATE {cursor_table} SET cursor = :last'), {'last': last})
+        session.commit()
+        total += result.rowcount
+        cursor = last
+
+    # Troca o índice antigo pelo novo em uma única transação.
+    for statement in _drop_sql(INDEX):
+        session.execute(text(statement))
+    for kind in ('ai', 'ad', 'au'):
+        session.execute(text(f'DROP TRIGGER IF EXISTS {new}_{kind}_rebuild'))
+    session.execute(text(f'DROP TABLE IF EXISTS {cursor_table}'))
+    session.execute(text(f'ALTER TABLE {new} RENAME TO {INDEX}'))
+    for statement in _trigger_sql(INDEX):
+        session.execute(text(statement))
+    session.commit()
+    return total
@@ -0,0 +1,172 @@
+# Importa os módulos da biblioteca padrão usados pelo gerador de dados.
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+# Importa o proxy current_app, usado para reconstruir o filtro de buscas negativas.
+from flask import current_app
+# Importa a função que gera o hash de senha, calculado uma única vez para todos os usuários.
+from werkzeug.security import generate_password_hash
+
+# Importa a instância do banco de dados e o particionamento de usuários.
+from extensions import db, shards
+# Importa o modelo de papéis, cujos ids são distribuídos entre os usuários.
+from app.models import Role
+# Importa o índice de busca e o filtro de buscas negativas, reconstruídos de uma vez no final da carga.
+from app import search, lookup_filter
+
+# Listas usadas para montar nomes, e-mails, localizações e biografias plausíveis.
+FIRST_NAMES = ('Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela',
+               'João', 'Larissa', 'Lucas', 'Mariana', 'Mateus', 'Natália', 'Pedro', 'Rafaela', 'Rodrigo',
+               'Sofia', 'Thiago', 'Valentina', 'Vinícius', 'Maria', 'José', 'Beatriz', 'Gustavo')
+LAST_NAMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares',
+              'Fernandes', 'Vieira', 'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Moreira')
+# Só domínios reservados para exemplos (RFC 2606): nenhuma mensagem para as contas geradas chega a alguém.
+DOMAINS = ('example.com', 'example.org', 'example.net')
+# Poucas cidades concentram a maior parte dos usuários (pesos no formato da lei de Zipf).
+CITIES = ('São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Porto Alegre', 'Curitiba', 'Salvador',
+          'Recife', 'Fortaleza', 'Brasília', 'Manaus', 'Florianópolis', 'Goiânia', 'Belém', 'Natal')
+ABOUT = ('Desenvolvedor', 'Estudante de computação', 'Gosto de café e de Python', 'Fotógrafo amador',
+         'Professora', 'Apaixonado por futebol', 'Leitor voraz', 'Trabalho com dados', 'Músico nas horas vagas')
+
+# Fração dos papéis entre os usuários gerados.
+ROLE_WEIGHTS = (('User', 0.9889), ('Moderator', 0.01), ('Administrator', 0.0001))
+# Fração das contas abandonadas (last_seen espalhado desde o cadastro).
+DORMANT_RATIO = 0.2
+# Idade máxima das contas geradas (member_since), em dias antes da data de referência.
+MAX_ACCOUNT_AGE = 5 * 365
+
+
+def _cum_weights(weights):
+    return list(accumulate(weights))
+
+
+class UserGenerator:
+    """
+    Gera linhas da tabela 'users' de forma determinística: a mesma semente e a mesma data de
+    referência ('anchor') produzem exatamente as mesmas linhas, na mesma ordem.
+
+    - Papéis: ~98,9% 'User', 1% 'Moderator', 0,01% 'Administrator' (ids de Role.insert_roles).
+    - Contas confirmadas: fração 'confirmed_ratio'; as demais ficam não confirmadas.
+    - member_since: uniforme nos últimos 5 anos.
+    - last_seen: contas ativas seguem uma distribuição de cauda longa (Pareto), com muitos usuários
+      vistos nas últimas horas; 20% das contas estão abandonadas, com a última visita em qualquer
+      momento desde o cadastro. Nunca antes de member_since.
+    - Localização e biografia: ausentes para parte dos usuários; cidades com pesos de Zipf.
+    - Senha: um único hash, calculado uma vez (todas as contas aceitam a mesma senha).
+    """
+
+    def __init__(self, role_ids, seed=0, anchor=None, confirmed_ratio=0.85, password='cat', start=0):
+        self.rng = random.Random(seed)
+        self.anchor = anchor or datetime(2025, 1, 1)
+        self.confirmed_ratio = confirmed_ratio
+        self.password_hash = generate_password_hash(password)
+        self.next_index = start
+        self.roles = [role_ids[name] for name, _ in ROLE_WEIGHTS]
+        self.role_weights = _cum_weights([weight for _, weight in ROLE_WEIGHTS])
+        self.city_weights = _cum_weights([1 / (rank + 1) for rank in range(len(CITIES))])
+
+    def rows(self, count):
+        """Gera 'count' linhas como tuplas na ordem de COLUMNS (sem o id)."""
+        rng = self.rng
+        choice, choices, random_ = rng.choice, rng.choices, rng.random
+        for _ in range(count):
+            n = self.next_index
+            self.next_index += 1
+            first, last = choice(FIRST_NAMES), choice(LAST_NAMES)
+            # O índice sequencial garante e-mails únicos.
+            email = f'{first.lower()}.{last.lower()}.{n}@{choice(DOMAINS)}'
+            member_since = self.anchor - timedelta(seconds=random_() * MAX_ACCOUNT_AGE * 86400)
+            if random_() < DORMANT_RATIO:
+                # Conta abandonada: última visita em qualquer momento desde o cadastro.
+                last_seen = member_since + (self.anchor - member_since) * random_()
+            else:
+                # Conta ativa: horas desde a última visita com Pareto (alfa 1,2) em escala de 2 horas.
+                idle = timedelta(hours=(rng.paretovariate(1.2) - 1) * 2)
+                last_seen = max(self.anchor - idle, member_since)
+            # Datas já no formato gravado pelo SQLAlchemy no SQLite.
+            member_since = f'{member_since:%Y-%m-%d %H:%M:%S.%f}'
+            last_seen = f'{last_seen:%Y-%m-%d %H:%M:%S.%f}'
+            location = choices(CITIES, cum_weights=self.city_weights)[0] if random_() < 0.6 else None
+            about_me = choice(ABOUT) if random_() < 0.3 else None
+            yield (email, f'{first} {last}', location, about_me, member_since, last_seen,
+                   choices(self.roles, cum_weights=self.role_weights)[0], self.password_hash,
+                   random_() < self.confirmed_ratio, 0)
+
+
+# Colunas preenchidas pela carga, na ordem das tuplas do gerador.
+COLUMNS = ('email', 'name', 'location', 'about_me', 'member_since', 'last_seen',
+           'role_id', 'password_hash', 'confirmed', 'claims_version')
+
+
+def _insert(engine, rows, with_ids):
+    # INSERT direto pelo driver (executemany), uma transação por lote, sem passar pelo ORM.
+    columns = (('id',) if with_ids else ()) + COLUMNS
+    sql = f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        # Durante a carga, não espera o disco a cada commit: se a máquina cair, basta gerar de novo.
+        # A conexão volta para o pool no close(): o valor anterior é restaurado antes.
+        synchronous = cursor.execute('PRAGMA synchronous').fetchone()[0]
+        cursor.execute('PRAGMA synchronous=OFF')
+        try:
+            cursor.executemany(sql, rows)
+            conn.commit()
+        finally:
+            cursor.execute(f'PRAGMA synchronous={int(synchronous)}')
+    finally:
+        conn.close()
+
+
+def seed_users(count, seed=0, batch_size=20000, anchor=None, confirmed_ratio=0.85, password='cat',
+               start=0, progress=None):
+    """
+    Insere 'count' usuários gerados por UserGenerator, em lotes de 'batch_size'.
+
+    Para acelerar a carga, o índice de busca (FTS5) e os seus gatilhos são removidos antes e
+    reconstruídos uma única vez no final. Com o particionamento ligado, os ids são reservados
+    em blocos por balde e cada lote é gravado no shard certo. 'start' é o primeiro número usado
+    nos e-mails: use um valor diferente para acrescentar usuários a uma carga anterior.
+    'progress', se informado, é chamado com o total inserido depois de cada lote.
+    Retorna o número de usuários inseridos.
+    """
+    Role.insert_roles()
+    role_ids = {name: Role.id_by_name(name) for name, _ in ROLE_WEIGHTS}
+    generator = UserGenerator(role_ids, seed=seed, anchor=anchor, confirmed_ratio=confirmed_ratio,
+                              password=password, start=start)
+    sqlite = db.engine.dialect.name == 'sqlite'
+    if sqlite:
+        for _ in shards.each():
+            for statement in search._drop_sql(search.INDEX):
+                db.session.execute(db.text(statement))
+            db.session.commit()
+    inserted = 0
+    while inserted < count:
+        rows = list(generator.rows(min(batch_size, count - inserted)))
+        if shards.enabled:
+            # Agrupa as linhas por balde (pelo e-mail), reserva os ids e grava por shard.
+            by_bucket = {}
+            for row in rows:
+                by_bucket.setdefault(shards.bucket_of_key(row[0]), []).append(row)
+            by_shard = {}
+            for bucket, items in by_bucket.items():
+                ids = shards.reserve_ids(bucket, len(items))
+                by_shard.setdefault(shards.shard_of_bucket(bucket), []).extend(
+                    (user_id,) + row for user_id, row in zip(ids, items))
+            for shard, items in by_shard.items():
+                _insert(shards.engine(shard), items, with_ids=True)
+        else:
+            _insert(db.engine, rows, with_ids=False)
+        inserted += len(rows)
+        if progress is not None:
+            progress(inserted)
+    if sqlite:
+        search.rebuild(batch_size=max(batch_size, 5000))
+    # Os INSERTs diretos não passam pelos eventos de User: invalida as entradas do cache ligadas aos
+    # usuários e avisa os filtros de busca de todos os processos. O deste processo é montado de novo.
+    lookup_filter.invalidate()
+    if lookup_filter.enabled:
+        lookup_filter.rebuild(current_app._get_current_object())
+    return inserted
@@ -0,0 +1,413 @@
+# Importa os módulos da biblioteca padrão usados pela captura e pela reprodução de tráfego.
+import atexit
+import base64
+import hashlib
+import json
+import queue
+import random
+import re
+import subprocess
+import threading
+import time
+
+# Importa os objetos do Flask usados para inspecionar a requisição.
+from flask import g, request, session
+
+# Reaproveita a thread de gravação em lotes (com rotação) do registro de requisições.
+from .request_log import _LogWriter
+
+
+class TrafficCapture:
+    """
+    Captura anonimizada do tráfego real, para ser reproduzida depois (ver replay()).
+
+    Cada requisição vira um registro JSONL com o método, o endpoint, a regra da rota, o status,
+    a latência (ms) e o "formato" dos dados enviados, nunca os valores: os argumentos da rota,
+    da query string e do formulário são gravados como 'email', 'password', 'int', 'text:<tamanho>',
+    'empty' ou, para o id do próprio usuário, 'self'. O usuário vira um balde
+    '<tipo>:<n>' ('user', 'moderator' ou 'admin', e n = HMAC do id módulo
+    FLASKY_TRAFFIC_USER_BUCKETS), ou 'anon'. Um login bem-sucedido grava também o balde da
+    conta que entrou em 'as'.
+
+    Como no RequestLogger, a requisição só monta o dicionário e o coloca em uma fila em memória;
+    uma thread grava em lotes. Com a fila cheia, o registro é descartado e contado em 'dropped'.
+
+    Configuração:
+    - FLASKY_TRAFFIC_CAPTURE: caminho do arquivo JSONL (vazio desliga a captura).
+    - FLASKY_TRAFFIC_CAPTURE_RATE: fração das requisições capturadas.
+    - FLASKY_TRAFFIC_USER_BUCKETS: número de baldes por tipo de usuário.
+    """
+
+    def __init__(self, app=None):
+        self._queue = None
+        self._lock = threading.Lock()
+        self._stats = {'written': 0, 'dropped': 0, 'sampled_out': 0, 'errors': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_TRAFFIC_CAPTURE', None)
+        app.config.setdefault('FLASKY_TRAFFIC_CAPTURE_RATE', 1.0)
+        app.config.setdefault('FLASKY_TRAFFIC_USER_BUCKETS', 64)
+        app.config.setdefault('FLASKY_TRAFFIC_QUEUE_SIZE', 10000)
+        app.config.setdefault('FLASKY_TRAFFIC_MAX_BYTES', 50 * 1024 * 1024)
+        app.config.setdefault('FLASKY_TRAFFIC_BACKUP_COUNT', 5)
+        app.extensions['traffic'] = self
+        path = app.config['FLASKY_TRAFFIC_CAPTURE']
+        if not path:
+            return
+        self.rate = app.config['FLASKY_TRAFFIC_CAPTURE_RATE']
+        self.buckets = app.config['FLASKY_TRAFFIC_USER_BUCKETS']
+        # Chave do HMAC dos ids: sem a SECRET_KEY, o balde não revela o usuário.
+        self._key = (app.config.get('SECRET_KEY') or '').encode('utf-8')[:64]
+        if self._queue is None:
+            self._queue = queue.Queue(maxsize=app.config['FLASKY_TRAFFIC_QUEUE_SIZE'])
+            self._writer = _LogWriter(self, path, batch_size=500, flush_interval=1.0,
+                                      max_bytes=app.config['FLASKY_TRAFFIC_MAX_BYTES'],
+                                      backup_count=app.config['FLASKY_TRAFFIC_BACKUP_COUNT'])
+            self._writer.name = 'flasky-traffic-capture'
+            self._writer.start()
+            # Grava o que ainda estiver na fila quando o processo terminar normalmente.
+            atexit.register(self.close)
+        app.before_request(self._start)
+        app.after_request(self._capture)
+
+    @property
+    def enabled(self):
+        return self._queue is not None
+
+    def stats(self):
+        """Retorna os contadores de registros gravados, descartados e removidos pela amostragem."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+    def close(self, timeout=5):
+        """Esvazia a fila e encerra a thread de gravação."""
+        if self._queue is None:
+            return
+        writer = self._writer
+        self._queue = None
+        writer.stop(timeout)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _start(self):
+        if self._queue is None:
+            return
+        if self.rate < 1.0 and random.random() >= self.rate:
+            self._count('sampled_out')
+            return
+        g.traffic_start = time.perf_counter()
+        # O usuário com que a requisição chegou (antes de um login ou logout).
+        g.traffic_uid = session.get('_user_id')
+
+    def _capture(self, response):
+        start = g.pop('traffic_start', None)
+        if start is None or self._queue is None:
+            return response
+        ms = round((time.perf_counter() - start) * 1000, 3)
+        uid = g.pop('traffic_uid', None)
+        identity = g.get('api_identity')
+        if uid is None and identity is not None:
+            uid = identity.id
+        uid = str(uid) if uid is not None else None
+        rule = request.url_rule
+        record = {'ts': time.time(),
+                  'method': request.method,
+                  'endpoint': request.endpoint,
+                  'rule': rule.rule if rule is not None else None,
+                  'status': response.status_code,
+                  'ms': ms,
+                  'bucket': self._bucket(uid)}
+        if request.view_args:
+            # Os arquivos estáticos não identificam ninguém: o nome é gravado como está.
+            if request.endpoint == 'static':
+                record['args'] = dict(request.view_args)
+            else:
+                record['args'] = {name: _arg_shape(name, value, uid) for name, value in request.view_args.items()}
+        if request.args:
+            record['query'] = _form_shape(request.args)
+        if request.form:
+            record['form'] = _form_shape(request.form)
+        scheme = request.headers.get('Authorization', '').partition(' ')[0].lower()
+        if scheme:
+            record['auth'] = scheme
+        after = session.get('_user_id')
+        if after is not None and str(after) != uid:
+            record['as'] = self._bucket(str(after))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count('dropped')
+        return response
+
+    def _bucket(self, uid):
+        if uid is None:
+            return 'anon'
+        # O tipo vem do usuário já carregado pela requisição (sessão ou token da API), sem consultas.
+        kind = 'user'
+        for user in (g.get('_login_user'), g.get('api_identity')):
+            if user is not None and getattr(user, 'is_authenticated', True) and str(user.id) == uid:
+                kind = _kind(user)
+                break
+        digest = hashlib.blake2b(uid.encode('utf-8'), key=self._key, digest_size=8).digest()
+        return f'{kind}:{int.from_bytes(digest, "little") % self.buckets}'
+
+
+def _kind(user):
+    # Importado aqui: os modelos importam o pacote 'app', que cria esta extensão.
+    from app.models import Permission
+    if user.can(Permission.ADMIN):
+        return 'admin'
+    if user.can(Permission.MODERATE):
+        return 'moderator'
+    return 'user'
+
+
+def _value_shape(name, value):
+    # Formato de um valor enviado: o suficiente para reproduzir a requisição, sem o conteúdo.
+    if not value:
+        return 'empty'
+    if 'password' in name:
+        return 'password'
+    if '@' in value:
+        return 'email'
+    if value.isdigit():
+        return 'int'
+    return f'text:{len(value)}'
+
+
+def _arg_shape(name, value, uid):
+    if isinstance(value, int):
+        return 'self' if str(value) == uid else 'int'
+    return _value_shape(name, str(value))
+
+
+def _form_shape(data):
+    # O token CSRF não é reproduzido (a reprodução roda com WTF_CSRF_ENABLED desligado).
+    return {name: _value_shape(name, value) for name, value in data.items() if name != 'csrf_token'}
+
+
+# --- Reprodução ---
+
+# Papel das contas criadas para cada tipo de balde.
+ROLES = {'user': 'User', 'moderator': 'Moderator', 'admin': 'Administrator'}
+# Tokens gerados para os endpoints que os recebem na rota.
+TOKENS = {'auth.confirm': 'generate_confirmation_token', 'auth.password_reset': 'generate_reset_token'}
+# Senha das contas criadas para a reprodução.
+REPLAY_PASSWORD = 'replay'
+# Argumentos de uma regra de rota, ex: '<int:id>'.
+_RULE_ARG = re.compile(r'<(?:[^:<>]+:)?(?P<name>[^<>]+)>')
+
+
+def load_capture(paths):
+    """Lê um ou mais arquivos de captura e retorna os registros reproduzíveis, em ordem de chegada."""
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    # Requisições sem rota (404) não têm como ser remontadas.
+    return sorted((r for r in records if r.get('rule')), key=lambda r: r['ts'])
+
+
+class _Account:
+    # Conta criada para um balde, com o cliente já logado e os tokens usados pela reprodução.
+    __slots__ = ('id', 'email', 'client', 'token', 'tokens')
+
+
+class _Replayer:
+    def __init__(self, app, records, seed=0):
+        self.app = app
+        self.rng = random.Random(seed)
+        self.accounts = {}
+        from .seed import FIRST_NAMES, LAST_NAMES, CITIES
+        self.words = [w.lower() for w in FIRST_NAMES + LAST_NAMES + CITIES]
+        self._prepare(records)
+
+    def _prepare(self, records):
+        # Cria (fora da medição) uma conta por balde, com o papel do tipo, e já faz o login.
+        from werkzeug.security import generate_password_hash
+        from app import db, shards
+        from app.models import Role, User
+        buckets = sorted({b for r in records for b in (r['bucket'], r.get('as')) if b and b != 'anon'})
+        with self.app.app_context():
+            # Com o particionamento ligado, cada shard tem a sua parte dos ids.
+            self.max_id = max((db.session.query(db.func.max(User.id)).scalar() or 0)
+                              for _ in shards.each()) or 1
+            password_hash = generate_password_hash(REPLAY_PASSWORD)
+            users = {}
+            for bucket in buckets:
+                kind, _, n = bucket.partition(':')
+                email = f'replay.{kind}.{n}@example.com'
+                user = User.get_by_email(email)
+                if user is None:
+                    user = User(email=email, name=f'replay {kind} {n}', confirmed=True,
+                                role_id=Role.id_by_name(ROLES.get(kind, 'User')))
+                    user.password_hash = password_hash
+                    db.session.add(user)
+                users[bucket] = user
+            db.session.commit()
+            for bucket, user in users.items():
+                account = _Account()
+                account.id, account.email = user.id, user.email
+                account.token = user.generate_auth_token()
+                account.tokens = {endpoint: getattr(user, method)() for endpoint, method in TOKENS.items()}
+                self.accounts[bucket] = account
+            db.session.remove()
+        for account in self.accounts.values():
+            account.client = self.app.test_client()
+            account.client.post('/auth/login', data={'email': account.email, 'password': REPLAY_PASSWORD})
+
+    def _value(self, name, shape, account):
+        if shape == 'empty':
+            return ''
+        if shape == 'password':
+            return REPLAY_PASSWORD if account is not None else self._text(8)
+        if shape == 'email':
+            return account.email if account is not None else f'nobody{self.rng.randrange(10 ** 6)}@example.com'
+        if shape == 'int':
+            return str(self.rng.randint(1, self.max_id))
+        return self._text(int(shape.partition(':')[2] or 1))
+
+    def _text(self, length):
+        # Palavras dos dados gerados por 'flask seed', para que as buscas encontrem resultados.
+        words = []
+        while len(' '.join(words)) < length:
+            words.append(self.rng.choice(self.words))
+        return ' '.join(words)
+
+    def _arg(self, record, name, account):
+        shape = record.get('args', {}).get(name, 'empty')
+        if record['endpoint'] == 'static':
+            return shape
+        if name == 'token' and record['endpoint'] in TOKENS and account is not None:
+            return account.tokens[record['endpoint']]
+        if shape == 'self':
+            return account.id if account is not None else self.rng.randint(1, self.max_id)
+        return self._value(name, shape, account)
+
+    def request(self, record):
+        """Remonta a requisição do registro. Retorna (cliente, argumentos de client.open)."""
+        account = self.accounts.get(record['bucket'])
+        # Em um login, os dados do formulário são os da conta que entrou.
+        target = self.accounts.get(record.get('as')) or account
+        path = _RULE_ARG.sub(lambda m: str(self._arg(record, m.group('name'), account)), record['rule'])
+        headers = {}
+        auth = record.get('auth')
+        if auth == 'bearer' and account is not None:
+            headers['Authorization'] = f'Bearer {account.token}'
+        elif auth == 'basic' and target is not None:
+            credentials = base64.b64encode(f'{target.email}:{REPLAY_PASSWORD}'.encode('utf-8')).decode('ascii')
+            headers['Authorization'] = f'Basic {credentials}'
+        kwargs = {'path': path, 'method': record['method'], 'headers': headers,
+                  'query_string': {k: self._value(k, v, target) for k, v in record.get('query', {}).items()}}
+        if 'form' in record:
+            kwargs['data'] = {k: self._value(k, v, target) for k, v in record['form'].items()}
+        # Visitantes anônimos chegam sem sessão: um cliente novo a cada requisição.
+        client = account.client if account is not None else self.app.test_client()
+        return client, kwargs
+
+
+def replay(app, records, speed=1.0, seed=0, label=None):
+    """
+    Reproduz os registros de uma captura contra 'app' (com WTF_CSRF_ENABLED desligado), respeitando
+    os intervalos originais divididos por 'speed' (1 = tempo real, 10 = dez vezes mais rápido,
+    0 = sem esperas). As requisições são feitas uma de cada vez, pelo cliente de testes.
+
+    Os dados dos registros são sintetizados a partir dos formatos: cada balde de usuário ganha uma
+    conta com o papel do tipo (criada e logada antes da medição), ids 'int' são sorteados entre os
+    usuários existentes e textos usam as palavras de 'flask seed'. A mesma semente sorteia os mesmos
+    valores, então duas versões do código recebem exatamente as mesmas requisições.
+
+    Retorna um dicionário serializável em JSON com a latência (ms) de cada requisição por endpoint,
+    os status e o atraso máximo em relação ao agendamento (lag_ms); compare dois com compare().
+    """
+    replayer = _Replayer(app, records, seed=seed)
+    # Aquecimento (fora da medição): um GET anônimo de cada endpoint, para compilar os templates e
+    # abrir as conexões antes da primeira amostra. Só GETs anônimos, que não mudam nenhuma sessão.
+    warmed = set()
+    for record in records:
+        if record['method'] == 'GET' and record['bucket'] == 'anon' and record['endpoint'] not in warmed:
+            warmed.add(record['endpoint'])
+            client, kwargs = replayer.request(record)
+            client.open(**kwargs).close()
+    endpoints = {}
+    lag = 0.0
+    started = time.perf_counter()
+    first = records[0]['ts'] if records else 0
+    for record in records:
+        if speed:
+            delay = (record['ts'] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+        client, kwargs = replayer.request(record)
+        start = time.perf_counter()
+        response = client.open(**kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        response.close()
+        result = endpoints.setdefault(record['endpoint'], {'samples': [], 'statuses': {}, 'captured': []})
+        result['samples'].append(round(elapsed, 3))
+        result['captured'].append(record['ms'])
+        status = str(response.status_code)
+        result['statuses'][status] = result['statuses'].get(status, 0) + 1
+    revision = _revision(app.root_path)
+    return {'label': label or revision, 'revision': revision, 'speed': speed, 'seed': seed,
+            'requests': len(records), 'elapsed': round(time.perf_counter() - started, 3),
+            'lag_ms': round(lag * 1000, 3), 'endpoints': endpoints}
+
+
+def _revision(path):
+    # Commit atual do repositório, para identificar a versão do código medida.
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=path,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def summarize(samples):
+    """Resume uma lista de latências (ms): quantidade, média e percentis (por posição)."""
+    values = sorted(samples)
+    if not values:
+        return {'count': 0}
+
+    def percentile(p):
+        return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+    return {'count': len(values), 'mean': round(sum(values) / len(values), 3),
+            'p50': percentile(50), 'p90': percentile(90), 'p95': percentile(95), 'p99': percentile(99),
+            'max': values[-1]}
+
+
+def compare(base, head, threshold=0.25, min_count=20):
+    """
+    Compara as latências por endpoint de dois resultados de replay(). Retorna uma lista de
+    (endpoint, resumo base, resumo head, variação da p50, variação da p95, regressão), ordenada
+    pela maior piora. É regressão quando a p50 ou a p95 pioram mais que 'threshold' (fração) com
+    pelo menos 'min_count' amostras dos dois lados, ou quando aparecem respostas 5xx novas.
+    Em uma máquina compartilhada, duas reproduções do mesmo código variam em torno de 20%: use
+    limites menores só com máquinas dedicadas (ou comparando várias reproduções de cada lado).
+    """
+    rows = []
+    for endpoint in sorted(set(base['endpoints']) | set(head['endpoints'])):
+        before = base['endpoints'].get(endpoint, {'samples': [], 'statuses': {}})
+        after = head['endpoints'].get(endpoint, {'samples': [], 'statuses': {}})
+        a, b = summarize(before['samples']), summarize(after['samples'])
+        if not a['count'] or not b['count']:
+            rows.append((endpoint, a, b, None, None, False))
+            continue
+        p50 = b['p50'] / a['p50'] - 1 if a['p50'] else 0.0
+        p95 = b['p95'] / a['p95'] - 1 if a['p95'] else 0.0
+        errors = lambda result: sum(n for status, n in result['statuses'].items() if status.startswith('5'))
+        regression = errors(after) > errors(before) or (
+            min(a['count'], b['count']) >= min_count and max(p50, p95) > threshold)
+        rows.append((endpoint, a, b, p50, p95, regression))
+    rows.sort(key=lambda row: -max(row[3] or 0, row[4] or 0))
+    return rows
@@ -0,0 +1,54 @@
+# Importa o inspetor de esquema e o construtor de SQL textual do SQLAlchemy.
+from sqlalchemy import inspect, text
+
+# Importa a instância do banco de dados e o particionamento de usuários (as tabelas existem em cada shard).
+from extensions import db, shards
+
+# Colunas acrescentadas a tabelas que já existiam: db.create_all() só cria as tabelas que faltam,
+# nunca acrescenta colunas às existentes. Cada item é (tabela, coluna, definição da coluna no ALTER TABLE).
+COLUMNS = (
+    ('users', 'claims_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('roles', 'effective_permissions', 'VARCHAR(255)'),
+    ('email_outbox', 'context', 'TEXT'),
+    ('email_outbox', 'base_url', 'VARCHAR(255)'),
+    ('email_outbox', 'coalesced', 'INTEGER NOT NULL DEFAULT 0'),
+    ('email_outbox', 'throttled', 'INTEGER NOT NULL DEFAULT 0'),
+)
+
+
+def init_app(app):
+    """
+    Acrescenta as colunas de COLUMNS que faltam em bancos criados antes delas, em todos os shards.
+    Pode ser chamada a cada inicialização: colunas já existentes e tabelas ausentes (ex: 'email_outbox'
+    nos shards adicionais) são ignoradas.
+    Retorna o conjunto de (tabela, coluna) acrescentadas no banco principal.
+    """
+    added = set()
+    with app.app_context():
+        for shard in range(max(shards.count, 1)):
+            with shards.engine(shard).begin() as conn:
+                # Inspeciona pela mesma conexão que altera as tabelas.
+                inspector = inspect(conn)
+                tables = set(inspector.get_table_names())
+                for table, column, definition in COLUMNS:
+                    if table not in tables:
+                        continue
+                    if column in {c['name'] for c in inspector.get_columns(table)}:
+                        continue
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+                    if shard == 0:
+                        added.add((table, column))
+        if ('roles', 'effective_permissions') in added:
+            _fill_effective_permissions()
+    return added
+
+
+def _fill_effective_permissions():
+    # Sem as permissões efetivas (NULL), o papel não teria nenhuma permissão: calcula as de todos os
+    # papéis existentes. O commit também replica os papéis nos shards (ver models/role.py).
+    from sqlalchemy.orm import selectinload
+    from app.models.role import Role, effective_permissions
+    roles = Role.query.options(selectinload(Role.parents)).all()
+    for role, bits in effective_permissions(roles).items():
+        role.effective_permissions = bits
+    db.session.commit()
@@ -0,0 +1,58 @@
+"""
+Filtro de Bloom: um conjunto probabilístico e compacto para testes de pertinência.
+"""
+# Importa os módulos da biblioteca padrão usados pelo filtro.
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Conjunto probabilístico: 'valor in filtro' nunca erra quando responde False (o valor
+    certamente não foi adicionado), mas pode responder True para um valor que nunca foi
+    adicionado (falso positivo), com probabilidade próxima de 'error_rate' enquanto o número
+    de valores não passar de 'capacity'. Não é possível remover valores: para descartar os
+    removidos, monte um filtro novo.
+
+    Cada valor liga 'hashes' bits de um bytearray de 'bits' bits, calculados com hashing duplo
+    (h1 + i * h2) a partir de um único blake2b de 128 bits.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        # Tamanho e número de funções de hash ótimos para a capacidade e a taxa de erro pedidas.
+        self.bits = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.bits / capacity * math.log(2))), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value):
+        array = self._array
+        for position in self._positions(value):
+            array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def __len__(self):
+        return self.count
+
+    def fill_ratio(self):
+        """Fração dos bits ligados."""
+        return int.from_bytes(self._array, 'little').bit_count() / self.bits
+
+    def stats(self):
+        """Retorna o tamanho, a ocupação e a taxa de falsos positivos estimada pela fração de bits ligados."""
+        return {'capacity': self.capacity, 'count': self.count, 'bits': self.bits, 'hashes': self.hashes,
+                'bytes': len(self._array), 'error_rate': self.error_rate,
+                'estimated_false_positive_rate': self.fill_ratio() ** self.hashes}
@@ -0,0 +1,334 @@
+"""
+Extensão de cache da aplicação.
+"""
+# Importa os módulos da biblioteca padrão usados pelo cache.
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+# Valor sentinela que representa "não encontrado" (permite guardar None no cache).
+MISS = object()
+
+
+class MemoryBackend:
+    """
+    Backend em memória do processo: um dicionário LRU (menos usado recentemente) com tempo de vida.
+    É o mais rápido, mas cada processo (worker) tem o seu próprio cache.
+    """
+
+    # Entradas e tags não são vistas por outros processos.
+    shared = False
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISS
+            value, expires = item
+            if expires is not None and expires <= time.time():
+                del self._data[key]
+                return MISS
+            # Marca a entrada como usada recentemente.
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            # Descarta as entradas menos usadas quando o limite é atingido.
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def tag_version(self, tag):
+        with self._lock:
+            return self._tags.get(tag, 0)
+
+    def bump_tag(self, tag):
+        with self._lock:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+
+class SQLiteConnections:
+    """
+    Fornece uma conexão SQLite por thread e por processo para o arquivo informado.
+    Conexões SQLite não podem ser compartilhadas entre threads nem atravessar um fork,
+    então cada worker (e cada thread dele) abre a sua na primeira utilização.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            # WAL permite leituras concorrentes enquanto outro processo grava.
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class SQLiteBackend:
+    """
+    Backend em um arquivo SQLite compartilhado entre processos.
+    Vários workers (inclusive criados por fork) enxergam as mesmas entradas e invalidações.
+    Apontar CACHE_SQLITE_PATH para um diretório em memória (ex: /dev/shm no Linux)
+    evita E/S de disco e funciona como memória compartilhada entre os workers.
+    """
+
+    # Remove entradas expiradas a cada N gravações.
+    PURGE_EVERY = 1000
+    # Entradas e tags são vistas por todos os processos que usam o mesmo arquivo.
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = SQLiteConnections(path).get
+        self._writes = 0
+        conn = self._connection()
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_entries '
+                     '(key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_tags '
+                     '(tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return MISS
+        if row[1] is not None and row[1] <= time.time():
+            return MISS
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl if ttl else None
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)',
+                     (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def tag_version(self, tag):
+        row = self._connection().execute('SELECT version FROM cache_tags WHERE tag = ?', (tag,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_tag(self, tag):
+        # Incremento atômico, mesmo com vários processos invalidando a mesma tag.
+        self._connection().execute(
+            'INSERT INTO cache_tags (tag, version) VALUES (?, 1) '
+            'ON CONFLICT(tag) DO UPDATE SET version = version + 1', (tag,))
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache_entries')
+        conn.execute('DELETE FROM cache_tags')
+
+
+class NullBackend:
+    """Backend que não guarda nada. Útil para desligar o cache sem mudar o código."""
+
+    shared = False
+
+    def get(self, key):
+        return MISS
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def tag_version(self, tag):
+        return 0
+
+    def bump_tag(self, tag):
+        pass
+
+    def clear(self):
+        pass
+
+
+class Cache:
+    """
+    Extensão de cache no padrão das demais extensões (db, mail...): a instância é criada
+    em extensions.py e associada à aplicação com init_app() dentro de create_app().
+
+    Configuração:
+    - CACHE_BACKEND: 'memory' (LRU em memória do processo), 'sqlite' (arquivo compartilhado
+      entre workers) ou 'null' (desligado).
+    - CACHE_DEFAULT_TTL: tempo de vida padrão das entradas, em segundos.
+    - CACHE_MAX_ENTRIES: limite de entradas do backend em memória.
+    - CACHE_SQLITE_PATH: caminho do arquivo do backend SQLite.
+
+    Invalidação por tags: cada entrada pode ser associada a tags (ex: 'roles'). Ao gravar,
+    a entrada guarda a versão atual de cada tag; invalidate_tag() apenas incrementa a versão,
+    o que torna obsoletas, de uma vez, todas as entradas gravadas com a versão anterior.
+
+    As estatísticas (hits, misses, sets, stale, deletes) são contadas por namespace, no processo atual.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl = 300
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'stale': 0, 'sets': 0, 'deletes': 0})
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 10000)
+        app.config.setdefault('CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'cache.sqlite'))
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+        elif backend == 'sqlite':
+            os.makedirs(os.path.dirname(os.path.abspath(app.config['CACHE_SQLITE_PATH'])), exist_ok=True)
+            self.backend = SQLiteBackend(app.config['CACHE_SQLITE_PATH'])
+        elif backend == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'CACHE_BACKEND desconhecido: {backend}')
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        with self._lock:
+            self._stats.clear()
+        app.extensions['cache'] = self
+
+    def _count(self, namespace, name):
+        with self._lock:
+            self._stats[namespace][name] += 1
+
+    def _key(self, namespace, key):
+        return f'{namespace}:{key}'
+
+    def get(self, key, namespace='default', default=None):
+        """Retorna o valor guardado ou 'default' se ele não existir, tiver expirado ou estiver invalidado."""
+        value = self._get(key, namespace)
+        return default if value is MISS else value
+
+    def _get(self, key, namespace):
+        if self.backend is None:
+            return MISS
+        item = self.backend.get(self._key(namespace, key))
+        if item is MISS:
+            self._count(namespace, 'misses')
+            return MISS
+        value, tags = item
+        # Se alguma tag foi invalidada depois da gravação, a entrada está obsoleta.
+        for tag, version in tags.items():
+            if self.backend.tag_version(tag) != version:
+                self._count(namespace, 'stale')
+                self._count(namespace, 'misses')
+                return MISS
+        self._count(namespace, 'hits')
+        return value
+
+    def set(self, key, value, namespace='default', ttl=None, tags=()):
+        """Guarda um valor, opcionalmente associado a tags para invalidação em grupo."""
+        if self.backend is None:
+            return
+        versions = {tag: self.backend.tag_version(tag) for tag in tags}
+        self.backend.set(self._key(namespace, key), (value, versions),
+                         self.default_ttl if ttl is None else ttl)
+        self._count(namespace, 'sets')
+
+    def delete(self, key, namespace='default'):
+        if self.backend is None:
+            return
+        self.backend.delete(self._key(namespace, key))
+        self._count(namespace, 'deletes')
+
+    def invalidate_tag(self, *tags):
+        """Invalida todas as entradas associadas às tags informadas."""
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.backend.bump_tag(tag)
+
+    def tag_version(self, tag):
+        """Retorna a versão atual da tag (0 se ela nunca foi invalidada)."""
+        return self.backend.tag_version(tag) if self.backend is not None else 0
+
+    @property
+    def shared(self):
+        """True se as entradas e as invalidações são vistas por todos os processos (backend 'sqlite')."""
+        return self.backend is not None and self.backend.shared
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """Retorna as estatísticas por namespace, com a taxa de acerto de cada um."""
+        with self._lock:
+            stats = {namespace: dict(counters) for namespace, counters in self._stats.items()}
+        for counters in stats.values():
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_ratio'] = counters['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def memoize(self, namespace, ttl=None, tags=None, cache_none=True):
+        """
+        Decorador que guarda o resultado da função, usando os argumentos como chave.
+        'tags' pode ser uma lista fixa ou uma função que recebe os mesmos argumentos
+        e retorna as tags da entrada. Os valores precisam ser serializáveis com pickle
+        (para o backend SQLite): prefira ids e tipos simples a objetos do SQLAlchemy.
+
+            @cache.memoize('roles', tags=['roles'])
+            def role_id(name): ...
+
+        Com cache_none=False, resultados None não são guardados (ex: "não encontrado", que deixaria
+        de ser verdade assim que outro processo criasse o registro).
+
+        A função decorada ganha os atributos 'uncached' (a função original) e
+        'invalidate(*args, **kwargs)', que remove a entrada daqueles argumentos.
+        """
+        def decorator(f):
+            def make_key(args, kwargs):
+                return f'{f.__module__}.{f.__qualname__}:{args!r}:{sorted(kwargs.items())!r}'
+
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                key = make_key(args, kwargs)
+                value = self._get(key, namespace)
+                if value is MISS:
+                    value = f(*args, **kwargs)
+                    if value is None and not cache_none:
+                        return value
+                    entry_tags = tags(*args, **kwargs) if callable(tags) else (tags or ())
+                    self.set(key, value, namespace=namespace, ttl=ttl, tags=entry_tags)
+                return value
+
+            decorated_function.uncached = f
+            decorated_function.invalidate = lambda *args, **kwargs: self.delete(make_key(args, kwargs), namespace)
+            return decorated_function
+        return decorator
@@ -36,6 +36,103 @@ class Config:
     # Desativa o sistema de eventos do SQLAlchemy, que não é necessário e consome recursos.
     # É recomendado manter como False, a menos que você precise explicitamente dos eventos.
     SQLALCHEMY_TRACK_MODIFICATIONS = False 
+    # Fila de saída de e-mails: número de mensagens enviadas por lote (e por conexão SMTP).
+    FLASKY_OUTBOX_BATCH_SIZE = int(os.environ.get('FLASKY_OUTBOX_BATCH_SIZE', 50))
+    # Número máximo de tentativas antes de a mensagem ir para o estado 'dead'.
+    FLASKY_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('FLASKY_OUTBOX_MAX_ATTEMPTS', 5))
+    # Espera base (em segundos) entre tentativas; dobra a cada nova falha.
+    FLASKY_OUTBOX_BACKOFF = int(os.environ.get('FLASKY_OUTBOX_BACKOFF', 30))
+    # Define se uma thread em segundo plano drena a fila. Sem ela, use o comando 'flask outbox'.
+    FLASKY_OUTBOX_WORKER = os.environ.get('FLASKY_OUTBOX_WORKER', 'true').lower() == 'true'
+    # Janela (em segundos) em que pedidos repetidos do mesmo e-mail (reenvio da confirmação,
+    # redefinição de senha) são agrupados na mensagem já existente. 0 desliga o agrupamento.
+    FLASKY_MAIL_DEDUP_WINDOW = int(os.environ.get('FLASKY_MAIL_DEDUP_WINDOW', 300))
+    # Cota de e-mails pedidos por destinatário: no máximo FLASKY_MAIL_QUOTA mensagens a cada
+    # FLASKY_MAIL_QUOTA_PERIOD segundos. 0 desliga a cota.
+    FLASKY_MAIL_QUOTA = int(os.environ.get('FLASKY_MAIL_QUOTA', 5))
+    FLASKY_MAIL_QUOTA_PERIOD = int(os.environ.get('FLASKY_MAIL_QUOTA_PERIOD', 3600))
+    # Filtro de Bloom em memória com os nomes existentes: buscas na página inicial por nomes que
+    # certamente não existem não consultam o banco (o nome não tem índice).
+    # Exige o cache compartilhado entre os processos (CACHE_BACKEND='sqlite'); com outro backend, fica desligado.
+    FLASKY_LOOKUP_FILTER = os.environ.get('FLASKY_LOOKUP_FILTER', 'false').lower() == 'true'
+    # Taxa de falsos positivos desejada e intervalo (em segundos) entre as reconstruções do filtro.
+    FLASKY_LOOKUP_FILTER_ERROR_RATE = float(os.environ.get('FLASKY_LOOKUP_FILTER_ERROR_RATE', 0.01))
+    FLASKY_LOOKUP_FILTER_REBUILD = int(os.environ.get('FLASKY_LOOKUP_FILTER_REBUILD', 3600))
+    # Intervalo (em segundos) entre as leituras dos usuários criados por outros processos e da tag do filtro.
+    FLASKY_LOOKUP_FILTER_CHECK = float(os.environ.get('FLASKY_LOOKUP_FILTER_CHECK', 1))
+    # Renderiza os formulários (quick_form) a partir do HTML compilado uma vez por classe de formulário,
+    # em vez de expandir as macros do Flask-Bootstrap a cada requisição.
+    FLASKY_FORM_PRECOMPILE = os.environ.get('FLASKY_FORM_PRECOMPILE', 'true').lower() == 'true'
+    # Cache de página inteira para GETs anônimos (página inicial, login, registro e reset de senha).
+    FLASKY_PAGE_CACHE = os.environ.get('FLASKY_PAGE_CACHE', 'true').lower() == 'true'
+    # Tempo (em segundos) que cada página fica guardada antes de ser renderizada novamente.
+    FLASKY_PAGE_CACHE_TTL = int(os.environ.get('FLASKY_PAGE_CACHE_TTL', 300))
+    # Caminho do arquivo JSONL de registro de acessos e eventos de autenticação. Vazio desliga o registro.
+    FLASKY_REQUEST_LOG = os.environ.get('FLASKY_REQUEST_LOG')
+    # Taxa de amostragem por endpoint, no formato 'static=0.01,main.index=0.1'. O padrão é registrar tudo.
+    FLASKY_REQUEST_LOG_SAMPLING = {
+        endpoint.strip(): float(rate)
+        for endpoint, rate in (item.split('=') for item in
+                               os.environ.get('FLASKY_REQUEST_LOG_SAMPLING', '').split(',') if item.strip())
+    }
+    # Caminho do arquivo JSONL da captura anonimizada de tráfego (ver 'flask traffic-replay'). Vazio desliga a captura.
+    FLASKY_TRAFFIC_CAPTURE = os.environ.get('FLASKY_TRAFFIC_CAPTURE')
+    # Fração das requisições capturadas (ex: 0.1 = 10%).
+    FLASKY_TRAFFIC_CAPTURE_RATE = float(os.environ.get('FLASKY_TRAFFIC_CAPTURE_RATE', 1.0))
+    # Número de baldes em que os usuários de cada tipo são agrupados na captura.
+    FLASKY_TRAFFIC_USER_BUCKETS = int(os.environ.get('FLASKY_TRAFFIC_USER_BUCKETS', 64))
+    # Backend do cache: 'memory' (em memória, por processo), 'sqlite' (compartilhado entre workers) ou 'null'.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    # Arquivo do backend SQLite. Em Linux, um caminho em /dev/shm mantém o cache em memória compartilhada.
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or os.path.join(basedir, 'instance', 'cache.sqlite')
+    # Liga o profiler por amostragem para uma fração das requisições (além das que trazem o token de profiling).
+    FLASKY_PROFILER = os.environ.get('FLASKY_PROFILER', 'false').lower() == 'true'
+    # Fração das requisições perfiladas quando FLASKY_PROFILER está ligado (ex: 0.01 = 1%).
+    FLASKY_PROFILER_SAMPLE_RATE = float(os.environ.get('FLASKY_PROFILER_SAMPLE_RATE', 0.01))
+    # Backend do rastreador de presença: 'memory' (por processo) ou 'sqlite' (agregado entre workers).
+    FLASKY_PRESENCE_BACKEND = os.environ.get('FLASKY_PRESENCE_BACKEND', 'memory')
+    # Maior janela (em minutos) consultável para "usuários online".
+    FLASKY_PRESENCE_WINDOW = int(os.environ.get('FLASKY_PRESENCE_WINDOW', 60))
+    # Arquivo do backend SQLite de presença. Em Linux, um caminho em /dev/shm o mantém em memória compartilhada.
+    FLASKY_PRESENCE_SQLITE_PATH = os.environ.get('FLASKY_PRESENCE_SQLITE_PATH') or \
+        os.path.join(basedir, 'instance', 'presence.sqlite')
+
+    # Validade (em segundos) dos tokens de acesso da API. As permissões do token são fixadas
+    # na emissão, então esta é também a demora máxima para uma mudança de papel valer na API.
+    FLASKY_API_TOKEN_EXPIRATION = int(os.environ.get('FLASKY_API_TOKEN_EXPIRATION', 3600))
+    # Número máximo de ids/e-mails por requisição em /api/v1/users.
+    FLASKY_API_BATCH_LIMIT = int(os.environ.get('FLASKY_API_BATCH_LIMIT', 100))
+
+    # Número de bancos SQLite entre os quais a tabela 'users' é particionada (0 = sem particionamento).
+    # O shard 0 é o próprio banco da configuração; os demais ficam ao lado dele ('dev-shard1.sqlite'...).
+    # Ao mudar o valor em um banco já populado, rode 'flask shards-rebalance'.
+    FLASKY_USER_SHARDS = int(os.environ.get('FLASKY_USER_SHARDS', 0))
+
+    # Guarda na sessão claims assinadas (id, nome, e-mail, confirmação, permissões do papel, versão) e monta o
+    # current_user a partir delas, sem consultar a tabela 'users' a cada requisição.
+    FLASKY_SESSION_CLAIMS = os.environ.get('FLASKY_SESSION_CLAIMS', 'false').lower() == 'true'
+    # Validade (em segundos) das claims. Depois dela, a identidade é recarregada do banco.
+    FLASKY_SESSION_CLAIMS_TTL = int(os.environ.get('FLASKY_SESSION_CLAIMS_TTL', 300))
+
+    # Agrupamento (single-flight) de leituras idênticas simultâneas: identidade do usuário logado,
+    # perfis em /user/<id> e tokens da API. Cada leitura é feita uma vez e o resultado é repartido.
+    FLASKY_SINGLEFLIGHT = os.environ.get('FLASKY_SINGLEFLIGHT', 'true').lower() == 'true'
+    # Espera máxima (em segundos) pelo resultado de outra requisição antes de fazer a leitura sozinha.
+    FLASKY_SINGLEFLIGHT_TIMEOUT = float(os.environ.get('FLASKY_SINGLEFLIGHT_TIMEOUT', 2.0))
+
+    # Controle de admissão: limita as requisições simultâneas por classe ('static', 'read', 'write', 'auth')
+    # e descarta com 503 + Retry-After as que não conseguem vaga a tempo.
+    FLASKY_ADMISSION = os.environ.get('FLASKY_ADMISSION', 'false').lower() == 'true'
+    # Total de requisições simultâneas (use o número de threads de cada worker do servidor).
+    FLASKY_ADMISSION_SLOTS = int(os.environ.get('FLASKY_ADMISSION_SLOTS', 8))
+    # Limites por classe, no formato 'auth=2:8:5,read=8:32:2' (concorrência:fila:espera em segundos).
+    # As classes omitidas usam os padrões de app/admission.py.
+    FLASKY_ADMISSION_LIMITS = {
+        name.strip(): (int(concurrency), int(queue), float(timeout))
+        for name, (concurrency, queue, timeout) in (
+            (item.split('=')[0], item.split('=')[1].split(':')) for item in
+            os.environ.get('FLASKY_ADMISSION_LIMITS', '').split(',') if item.strip())
+    }
 
     @staticmethod
     def init_app(app):
@@ -52,6 +149,8 @@ class DevelopmentConfig(Config):
     """
     # Ativa o modo de depuração do Flask, que fornece um debugger interativo no navegador em caso de erro.
     DEBUG = True 
+    # Em desenvolvimento os templates mudam com frequência, então o cache de página fica desligado.
+    FLASKY_PAGE_CACHE = False
     # Define a URI de conexão para o banco de dados de desenvolvimento (ex: um arquivo SQLite local).
     SQLALCHEMY_DATABASE_URI = os.environ.get('DB') + ':///' + os.path.join(basedir, os.environ.get('DEV_DATABASE'))
     
@@ -62,6 +161,10 @@ class TestingConfig(Config):
     """
     # Ativa o modo de teste, que desabilita o tratamento de erros e facilita as asserções nos testes.
     TESTING = True 
+    # Nos testes a fila é drenada explicitamente, sem thread em segundo plano.
+    FLASKY_OUTBOX_WORKER = False
+    # O cache de página é ligado apenas pelos testes que o exercitam.
+    FLASKY_PAGE_CACHE = False
     # Define a URI para um banco de dados de teste, garantindo que os testes não afetem os dados de desenvolvimento.
     SQLALCHEMY_DATABASE_URI = os.environ.get('DB') + ':///' + os.path.join(basedir, os.environ.get('TEST_DATABASE'))
     
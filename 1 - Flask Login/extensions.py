@@ -6,12 +6,26 @@ from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 # Importa a extensão Flask-Mail para enviar e-mails a partir da aplicação Flask.
 from flask_mail import Mail
+# Importa a extensão de cache da aplicação (definida em caching.py).
+from caching import Cache
+# Importa a sessão com roteamento por shard e o particionamento de usuários (definidos em sharding.py).
+from sharding import ShardedSession, UserShards
+# Importa o agrupamento de computações simultâneas idênticas (definido em singleflight.py).
+from singleflight import SingleFlight
 
 # Inicializa o Flask-Bootstrap na nossa aplicação.
 bootstrap = Bootstrap()
 # Inicializa o Flask-Moment na nossa aplicação.
 moment = Moment()
 # Inicializa o Flask-SQLAlchemy na nossa aplicação.
-db = SQLAlchemy()
+# A sessão ShardedSession envia as consultas da tabela 'users' para o shard certo
+# quando o particionamento está ligado (FLASKY_USER_SHARDS); caso contrário, é a sessão padrão.
+db = SQLAlchemy(session_options={'class_': ShardedSession})
 # Inicializa o Flask-Mail na nossa aplicação.
 mail = Mail()
+# Inicializa o cache (LRU em memória ou SQLite compartilhado entre workers) na nossa aplicação.
+cache = Cache()
+# Inicializa o particionamento da tabela de usuários entre vários bancos SQLite.
+shards = UserShards(db)
+# Inicializa o agrupamento (single-flight) de leituras idênticas e simultâneas.
+flights = SingleFlight()
@@ -4,8 +4,9 @@ Arquivo principal da aplicação Flask.
 # Cria a instância da aplicação Flask utilizando a função factory.
 # O padrão Factory evita importações circulares e permite múltiplas instâncias/configurações.
 #import os 
+import click
 from app import create_app, db 
-from app.models import User, Role 
+from app.models import User, Role, OutboxMessage, AccessEntry
 #from flask_migrate import Migrate
 
 app = create_app('development') 
@@ -26,9 +27,399 @@ def test():
     # 'verbosity=2' fornece uma saída mais detalhada, mostrando o resultado de cada teste individualmente.
     unittest.TextTestRunner(verbosity=2).run(tests)
 
+# Comando 'flask outbox': drena a fila de saída de e-mails.
+# Útil quando a thread de envio está desabilitada (FLASKY_OUTBOX_WORKER=false),
+# por exemplo para rodar o despachante como um processo separado ou via cron.
+@app.cli.command()
+@click.option('--loop', is_flag=True, help='Continua rodando e drena a fila periodicamente.')
+@click.option('--batch-size', type=int, default=None, help='Mensagens por lote.')
+def outbox(loop, batch_size):
+    """Send queued emails from the outbox."""
+    import time
+    from app import outbox as dispatcher
+    while True:
+        stats = dispatcher.drain(app, batch_size)
+        click.echo('enviados: {sent}, retentativas: {retried}, dead: {dead}'.format(**stats))
+        if not loop:
+            break
+        time.sleep(app.config['FLASKY_OUTBOX_POLL_INTERVAL'])
+
+# Comando 'flask profile-token': gera o token do cabeçalho de profiling para um administrador.
+# Uso: curl -H "X-Flasky-Profile: <token>" http://localhost:5000/
+@app.cli.command('profile-token')
+@click.argument('email')
+def profile_token(email):
+    """Generate a profiling header token for an administrator."""
+    from app import profiler
+    user = User.get_by_email(email)
+    if user is None or not user.is_administrator():
+        raise click.ClickException('O usuário não existe ou não é administrador.')
+    click.echo(profiler.generate_token(user))
+
+# Comando 'flask profile-report': agrega os perfis gravados em collapsed stacks.
+# A saída pode ser passada direto para o flamegraph.pl ou aberta no speedscope.
+@app.cli.command('profile-report')
+@click.option('--endpoint', default=None, help='Agrega apenas os perfis deste endpoint (ex: main.index).')
+@click.option('--output', type=click.File('w'), default='-', help='Arquivo de saída (padrão: stdout).')
+def profile_report(endpoint, output):
+    """Aggregate request profiles into collapsed stacks."""
+    from app.profiler import aggregate_profiles
+    stacks = aggregate_profiles(app.config['FLASKY_PROFILER_DIR'], endpoint)
+    for stack, count in stacks.most_common():
+        output.write(f'{stack} {count}\n')
+
+# Comando 'flask search-rebuild': reconstrói o índice de busca de usuários em lotes.
+@app.cli.command('search-rebuild')
+@click.option('--batch-size', type=int, default=5000, help='Usuários indexados por transação.')
+def search_rebuild(batch_size):
+    """Rebuild the user full-text search index."""
+    from app.search import rebuild
+    click.echo(f'{rebuild(batch_size)} usuários indexados.')
+
+# Comando 'flask seed': gera usuários sintéticos (determinísticos a partir da semente) para testes de escala.
+# Ex: 'flask seed --count 10000000 --seed 42' cria um banco de 10 milhões de usuários em poucos minutos.
+# Todas as contas têm a mesma senha: fora das configurações de desenvolvimento e de testes, exige --yes.
+@app.cli.command()
+@click.option('--count', type=int, default=100000, help='Número de usuários gerados.')
+@click.option('--seed', type=int, default=0, help='Semente do gerador (mesma semente, mesmos dados).')
+@click.option('--batch-size', type=int, default=20000, help='Usuários inseridos por transação.')
+@click.option('--anchor', type=click.DateTime(), default='2025-01-01',
+              help='Data de referência para member_since e last_seen.')
+@click.option('--confirmed-ratio', type=float, default=0.85, help='Fração de contas confirmadas.')
+@click.option('--password', default='cat', help='Senha de todas as contas geradas.')
+@click.option('--start', type=int, default=0, help='Primeiro número usado nos e-mails (para acrescentar a uma carga).')
+@click.option('--yes', is_flag=True, help='Confirma a carga fora das configurações de desenvolvimento e de testes.')
+def seed(count, seed, batch_size, anchor, confirmed_ratio, password, start, yes):
+    """Generate a large deterministic dataset of users."""
+    import time
+    if not (app.config['TESTING'] or app.config['DEBUG']) and not yes:
+        raise click.ClickException('Esta configuração não é de desenvolvimento nem de testes; use --yes para confirmar.')
+    from app.seed import seed_users
+    started = time.perf_counter()
+
+    def progress(done):
+        elapsed = time.perf_counter() - started
+        click.echo(f'\r{done}/{count} usuários ({done / elapsed:.0f}/s)', nl=False)
+
+    seed_users(count, seed=seed, batch_size=batch_size, anchor=anchor, confirmed_ratio=confirmed_ratio,
+               password=password, start=start, progress=progress)
+    click.echo(f'\n{count} usuários gerados em {time.perf_counter() - started:.1f}s (índice de busca incluído).')
+
+# Comando 'flask bench-register': mede quantos registros por segundo a rota de registro suporta.
+# Usa a configuração de testes (e o banco de testes, que é recriado e apagado no final).
+# O hash de senha (scrypt) domina o tempo do registro; --fast-hash o troca por um hash barato
+# para medir apenas o restante do caminho (consultas, commit, e-mail).
+@app.cli.command('bench-register')
+@click.option('--count', type=int, default=200, help='Número de registros.')
+@click.option('--fast-hash', is_flag=True, help='Usa um hash de senha barato (apenas para medição).')
+def bench_register(count, fast_hash):
+    """Benchmark the registration endpoint."""
+    import time
+    from functools import partial
+    from unittest import mock
+    from werkzeug.security import generate_password_hash
+    from extensions import shards
+    bench = create_app('testing')
+    bench.config['WTF_CSRF_ENABLED'] = False
+    with bench.app_context():
+        db.drop_all()
+        db.create_all()
+        Role.insert_roles()
+    fast = partial(generate_password_hash, method='pbkdf2:sha256:1')
+    try:
+        with mock.patch('app.models.user.generate_password_hash', fast if fast_hash else generate_password_hash):
+            start = time.perf_counter()
+            for i in range(count):
+                # Um cliente por registro, como usuários diferentes (sem acumular mensagens flash na sessão).
+                response = bench.test_client().post('/auth/register',
+                                                    data={'email': f'bench{i}@example.com', 'name': f'Bench {i}',
+                                                          'password': 'cat', 'password2': 'cat'})
+                # Um registro aceito redireciona para o login; qualquer outra resposta invalida a medição.
+                if response.status_code != 302:
+                    raise click.ClickException(f'O registro {i} respondeu {response.status_code} em vez de 302.')
+            elapsed = time.perf_counter() - start
+        with bench.app_context():
+            registered = sum(User.query.count() for _ in shards.each())
+        if registered != count:
+            raise click.ClickException(f'{registered} usuários no banco depois de {count} registros.')
+    finally:
+        with bench.app_context():
+            db.drop_all()
+    click.echo(f'{count} registros em {elapsed:.2f}s: {count / elapsed:.1f} registros/s')
+
+# Comando 'flask bench-identity': compara o custo de carregar o usuário logado como User
+# completo (linha inteira) e como Identity (só as colunas de autenticação), por requisição.
+# Usa a configuração de testes (o banco de testes é recriado e apagado no final).
+@app.cli.command('bench-identity')
+@click.option('--count', type=int, default=2000, help='Número de carregamentos.')
+@click.option('--about-size', type=int, default=4096, help='Tamanho (em caracteres) do about_me do usuário.')
+def bench_identity(count, about_size):
+    """Compare per-request memory and latency of User vs Identity loading."""
+    import time
+    import tracemalloc
+    from app.models import Identity, Permission
+    bench = create_app('testing')
+    with bench.app_context():
+        db.drop_all()
+        db.create_all()
+        Role.insert_roles()
+        user = User(email='bench@example.com', name='Bench', password='cat', confirmed=True,
+                    location='Porto Alegre', about_me='x' * about_size)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        db.session.remove()
+        # Cada "requisição" carrega o usuário e faz o que o before_request e os decoradores fazem:
+        # lê 'confirmed' e verifica uma permissão (o que, no User, carrega o papel).
+        def request_with(load):
+            def run():
+                current = load()
+                current.confirmed and current.can(Permission.MODERATE)
+                return current
+            return run
+        loaders = [('User', request_with(lambda: db.session.get(User, user_id))),
+                   ('Identity', request_with(lambda: Identity.load(user_id)))]
+        for name, load in loaders:
+            # Latência: cada carregamento em uma sessão nova, como em uma requisição.
+            start = time.perf_counter()
+            for _ in range(count):
+                load()
+                db.session.remove()
+            elapsed = time.perf_counter() - start
+            # Memória retida pelo objeto carregado (e pelo estado da sessão), em um carregamento.
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            obj = load()
+            retained = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            del obj
+            db.session.remove()
+            click.echo(f'{name:8}: {elapsed / count * 1e6:8.1f} us/requisição, {retained:7d} bytes retidos')
+        db.drop_all()
+
+# Comando 'flask shards-rebalance': move os usuários para o shard certo depois de mudar FLASKY_USER_SHARDS.
+# Rode com a aplicação parada. Ao reduzir o número de shards, informe o valor anterior em --previous.
+@app.cli.command('shards-rebalance')
+@click.option('--previous', type=int, default=None, help='Número de shards antes da mudança (se era maior).')
+@click.option('--batch-size', type=int, default=500, help='Usuários movidos por transação.')
+def shards_rebalance(previous, batch_size):
+    """Move user rows to their shard after changing FLASKY_USER_SHARDS."""
+    from extensions import shards
+    if not shards.enabled:
+        raise click.ClickException('O particionamento está desligado (FLASKY_USER_SHARDS=0).')
+    shards.create_all()
+    click.echo(f'{shards.rebalance(previous, batch_size)} usuários movidos.')
+
+# Comando 'flask bench-shards': mede a vazão de gravação de usuários (um commit por usuário)
+# com 1, 2, 4... shards, com vários processos gravando ao mesmo tempo, como os workers do servidor.
+# Cada configuração roda em bancos temporários, apagados no final. O hash de senha é trocado
+# por um barato, para medir o banco.
+@app.cli.command('bench-shards')
+@click.option('--count', type=int, default=2000, help='Usuários gravados por configuração.')
+@click.option('--workers', type=int, default=4, help='Processos gravando ao mesmo tempo.')
+@click.option('--shards', 'counts', default='1,2,4', help='Números de shards a comparar.')
+def bench_shards(count, workers, counts):
+    """Benchmark concurrent user writes as shards are added."""
+    import multiprocessing
+    import tempfile
+    import time
+    from functools import partial
+    from unittest import mock
+    from werkzeug.security import generate_password_hash
+    from config import TestingConfig
+    from extensions import shards
+    fast = partial(generate_password_hash, method='pbkdf2:sha256:1')
+    for n in [int(c) for c in counts.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(TestingConfig, 'FLASKY_USER_SHARDS', n), \
+                mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp}/bench.sqlite'), \
+                mock.patch('app.models.user.generate_password_hash', fast):
+            bench = create_app('testing')
+            with bench.app_context():
+                Role.insert_roles()
+                # Os processos filhos (fork) abrem as suas próprias conexões.
+                for shard in range(n):
+                    shards.engine(shard).dispose()
+
+            def worker(offset):
+                with bench.app_context():
+                    for i in range(offset, count, workers):
+                        db.session.add(User(email=f'bench{i}@example.com', name=f'Bench {i}', password='cat'))
+                        db.session.commit()
+
+            processes = [multiprocessing.get_context('fork').Process(target=worker, args=(w,))
+                         for w in range(workers)]
+            start = time.perf_counter()
+            for p in processes:
+                p.start()
+            for p in processes:
+                p.join()
+            elapsed = time.perf_counter() - start
+            with bench.app_context():
+                written = sum(db.session.query(User).count() for _ in shards.each())
+                db.session.remove()
+                for shard in range(n):
+                    shards.engine(shard).dispose()
+        click.echo(f'{n} shard(s): {written} usuários em {elapsed:.2f}s: {written / elapsed:.1f} gravações/s')
+
+# Comando 'flask bench-permissions': mede o cálculo das permissões efetivas com centenas de papéis
+# herdando uns dos outros (um grafo acíclico aleatório) e compara a verificação com um único E
+# bit a bit (Role.can) com o percurso da herança a cada verificação.
+@app.cli.command('bench-permissions')
+@click.option('--roles', type=int, default=500, help='Número de papéis.')
+@click.option('--permissions', type=int, default=200, help='Número de permissões registradas.')
+@click.option('--max-parents', type=int, default=3, help='Máximo de papéis herdados por papel.')
+@click.option('--checks', type=int, default=200000, help='Verificações de permissão medidas.')
+def bench_permissions(roles, permissions, max_parents, checks):
+    """Benchmark the effective-permission closure and permission checks."""
+    import random
+    import time
+    from app.models import Permission
+    from app.models.role import effective_permissions
+    rng = random.Random(0)
+    perms = [Permission.register(f'BENCH_{i}') for i in range(permissions)]
+    bench = create_app('testing')
+    with bench.app_context():
+        db.create_all()
+        created = []
+        for i in range(roles):
+            role = Role(name=f'bench-{i}', permissions=rng.choice(perms) | rng.choice(perms))
+            # Herda apenas de papéis criados antes: o grafo nunca tem ciclos.
+            role.parents = rng.sample(created, min(len(created), rng.randint(0, max_parents)))
+            created.append(role)
+        db.session.add_all(created)
+        start = time.perf_counter()
+        db.session.commit()
+        click.echo(f'{roles} papéis, {permissions} permissões: commit com o cálculo em '
+                   f'{(time.perf_counter() - start) * 1000:.1f}ms')
+        # Recarrega os papéis (o commit os expirou) antes de medir só o cálculo, sem consultas.
+        from sqlalchemy.orm import selectinload
+        created = Role.query.options(selectinload(Role.parents)).order_by(Role.id).all()
+        start = time.perf_counter()
+        effective_permissions(created)
+        click.echo(f'Cálculo das permissões efetivas: {(time.perf_counter() - start) * 1000:.2f}ms')
+
+        # Percurso da herança a cada verificação, como seria sem as permissões pré-calculadas.
+        def walk(role, perm):
+            seen, stack, bits = set(), [role], 0
+            while stack:
+                r = stack.pop()
+                if r not in seen:
+                    seen.add(r)
+                    bits |= r.permissions
+                    stack.extend(r.parents)
+            return bits & perm == perm
+
+        samples = [(rng.choice(created), rng.choice(perms)) for _ in range(checks)]
+        for name, check in (('Role.can', lambda r, p: r.can(p)), ('percurso', walk)):
+            start = time.perf_counter()
+            granted = sum(1 for r, p in samples if check(r, p))
+            elapsed = time.perf_counter() - start
+            click.echo(f'{name}: {elapsed / checks * 1e6:.2f}µs por verificação ({granted} concedidas)')
+        db.session.remove()
+        db.drop_all()
+
+# Comando 'flask traffic-replay': reproduz capturas de tráfego (FLASKY_TRAFFIC_CAPTURE) contra um banco
+# gerado por 'flask seed' e grava a latência por endpoint em JSON. Rode uma vez em cada versão do
+# código (mesma captura, mesma semente) e compare os resultados com 'flask traffic-compare'.
+# O banco da configuração é recriado e apagado no final: só configurações de teste (TESTING) são aceitas.
+@app.cli.command('traffic-replay')
+@click.argument('captures', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--speed', type=float, default=1.0,
+              help='Velocidade (1 = tempo real, 10 = dez vezes mais rápido, 0 = sem esperas).')
+@click.option('--users', type=int, default=10000, help='Usuários gerados antes da reprodução.')
+@click.option('--seed', type=int, default=0, help='Semente dos dados gerados e dos valores sorteados.')
+@click.option('--config', 'config_name', default='testing', help='Configuração da aplicação reproduzida (só as de testes).')
+@click.option('--label', default=None, help='Nome do resultado (padrão: o commit atual).')
+@click.option('--output', type=click.File('w'), default='-', help='Arquivo de saída (padrão: stdout).')
+def traffic_replay(captures, speed, users, seed, config_name, label, output):
+    """Replay captured traffic against a seeded database."""
+    import json
+    from app.seed import seed_users
+    from app.traffic import load_capture, replay, summarize
+    records = load_capture(captures)
+    if not records:
+        raise click.ClickException('Nenhuma requisição reproduzível nas capturas.')
+    bench = create_app(config_name)
+    if not bench.config['TESTING']:
+        raise click.ClickException(f"A configuração '{config_name}' não é de testes: o banco seria apagado.")
+    bench.config['WTF_CSRF_ENABLED'] = False
+    with bench.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_users(users, seed=seed)
+    try:
+        results = replay(bench, records, speed=speed, seed=seed, label=label)
+    finally:
+        with bench.app_context():
+            db.session.remove()
+            db.drop_all()
+    json.dump(results, output)
+    click.echo(f"{results['requests']} requisições em {results['elapsed']:.1f}s "
+               f"(atraso máximo {results['lag_ms']:.0f}ms)", err=True)
+    for endpoint, result in sorted(results['endpoints'].items()):
+        stats = summarize(result['samples'])
+        click.echo(f"{endpoint}: {stats['count']} req, p50 {stats['p50']:.2f}ms, p95 {stats['p95']:.2f}ms", err=True)
+
+# Comando 'flask traffic-compare': compara a latência por endpoint de dois resultados de 'flask traffic-replay'.
+# Termina com código 1 se houver regressão (útil em CI).
+@app.cli.command('traffic-compare')
+@click.argument('base', type=click.File('r'))
+@click.argument('head', type=click.File('r'))
+@click.option('--threshold', type=float, default=0.25,
+              help='Piora máxima aceita na p50/p95 (fração). O ruído entre duas reproduções fica perto de 0.2.')
+@click.option('--min-count', type=int, default=20, help='Amostras mínimas para avaliar um endpoint.')
+def traffic_compare(base, head, threshold, min_count):
+    """Compare per-endpoint latency between two replays."""
+    import json
+    from app.traffic import compare
+    base, head = json.load(base), json.load(head)
+    click.echo(f"base: {base['label']}  head: {head['label']}")
+    regressions = 0
+    for endpoint, a, b, p50, p95, regression in compare(base, head, threshold, min_count):
+        if p50 is None:
+            click.echo(f"  {endpoint}: {a['count']} -> {b['count']} req (sem comparação)")
+            continue
+        regressions += regression
+        click.echo(f"{'!' if regression else ' '} {endpoint}: {b['count']} req, "
+                   f"p50 {a['p50']:.2f} -> {b['p50']:.2f}ms ({p50:+.0%}), "
+                   f"p95 {a['p95']:.2f} -> {b['p95']:.2f}ms ({p95:+.0%})")
+    if regressions:
+        click.echo(f'{regressions} endpoint(s) com regressão.')
+        raise SystemExit(1)
+
+# Comando 'flask bench-forms': compara, por formulário, o tempo de renderização da macro wtf.quick_form
+# do Flask-Bootstrap e da versão pré-compilada (form_renderer), com o formulário vazio e com erros.
+@app.cli.command('bench-forms')
+@click.option('--count', type=int, default=2000, help='Renderizações medidas por formulário.')
+def bench_forms(count):
+    """Benchmark form rendering: quick_form macro vs precompiled."""
+    import time
+    from app import form_renderer
+    from app.auth.forms import LoginForm, RegistrationForm, PasswordResetRequestForm, PasswordResetForm
+    from app.models.nameform import NameForm
+    # Dados inválidos em todos os campos, para medir também as mensagens de erro.
+    invalid = {'email': 'x', 'name': 'x', 'password': 'a', 'password2': 'b', 'remember_me': 'y'}
+    for form_class in (NameForm, LoginForm, RegistrationForm, PasswordResetRequestForm, PasswordResetForm):
+        for state, data in (('vazio', None), ('com erros', invalid)):
+            options = {'method': 'POST', 'data': data} if data else {}
+            with app.test_request_context('/', **options):
+                form = form_class()
+                if data:
+                    form.validate()
+                timings = []
+                for render in (form_renderer.macro, form_renderer.quick_form):
+                    render(form)
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        render(form)
+                    timings.append((time.perf_counter() - start) / count * 1e6)
+            click.echo(f'{form_class.__name__} ({state}): macro {timings[0]:.1f}µs, '
+                       f'pré-compilado {timings[1]:.1f}µs ({timings[0] / timings[1]:.1f}x)')
+
 @app.shell_context_processor 
 def make_shell_context(): 
-    return dict(db=db, User=User, Role=Role)
+    return dict(db=db, User=User, Role=Role, OutboxMessage=OutboxMessage, AccessEntry=AccessEntry)
 
 # Bloco de execução principal: só roda quando o script é executado diretamente.
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+"""
+Particionamento (sharding) horizontal da tabela de usuários entre vários bancos SQLite.
+"""
+# Importa os módulos da biblioteca padrão usados pelo roteamento.
+import os
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Importa o SQLAlchemy e a sessão do Flask-SQLAlchemy, que é estendida aqui.
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.sql.util import find_tables
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+# Shard escolhido para as consultas à tabela particionada no contexto atual (thread ou requisição).
+_current_shard = ContextVar('flasky_user_shard', default=None)
+
+
+class ShardRoutingError(RuntimeError):
+    """Consulta à tabela particionada sem indicação de shard (use shards.route_id/route_key/each)."""
+
+
+class UserShards:
+    """
+    Particiona as linhas da tabela 'users' entre FLASKY_USER_SHARDS arquivos SQLite.
+    O shard 0 é o banco principal (SQLALCHEMY_DATABASE_URI); os demais ficam ao lado dele
+    ('dev.sqlite' -> 'dev-shard1.sqlite', ...). Com FLASKY_USER_SHARDS=0 (padrão), nada muda.
+
+    Cada usuário pertence a um balde (bucket), entre FLASKY_USER_BUCKETS baldes fixos, dado
+    pelo hash estável (crc32) do e-mail. O id do usuário codifica o balde
+    (id = sequência * BUCKETS + balde), então tanto a busca por e-mail quanto a busca por id
+    chegam ao mesmo balde sem consultar nenhum diretório. Cada balde pertence ao shard
+    'balde % FLASKY_USER_SHARDS'; ao mudar o número de shards, 'flask shards-rebalance' move
+    os baldes (com seus usuários e contadores) sem mudar nenhum id.
+
+    A tabela 'roles' é replicada em todos os shards (para JOINs locais); as demais tabelas
+    ficam apenas no banco principal.
+
+    O roteamento é explícito: as consultas à tabela 'users' devem ser feitas dentro de
+    route_id(id), route_key(email) ou each() (todos os shards). Gravações de objetos User
+    (flush) vão sozinhas para o shard do id. Uma consulta sem roteamento com mais de um
+    shard levanta ShardRoutingError, em vez de consultar o shard errado em silêncio.
+
+    Observação: as transações que tocam mais de um banco (ex: usuário no shard 2 e e-mail
+    na fila do banco principal) são efetivadas banco a banco, sem two-phase commit.
+    """
+
+    def __init__(self, db, table='users', key='email'):
+        self._db = db
+        self.table = table
+        self.key = key
+        # Contadores de sequência por balde. Ficam no shard dono do balde e se movem com ele.
+        self.buckets = sa.Table(f'{table}_buckets', db.metadata,
+                                sa.Column('bucket', sa.Integer, primary_key=True),
+                                sa.Column('next_seq', sa.Integer, nullable=False))
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_USER_SHARDS', 0)
+        app.config.setdefault('FLASKY_USER_BUCKETS', 64)
+        app.extensions['user_shards'] = self
+        # Engines dos shards adicionais, por aplicação (o shard 0 usa o engine do próprio db).
+        # Não são binds do Flask-SQLAlchemy: o esquema deles é só o das tabelas particionadas.
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        app.extensions['user_shards_engines'] = {
+            shard: sa.create_engine(self.uri(shard, app), **options)
+            for shard in range(1, app.config['FLASKY_USER_SHARDS'])}
+
+    # --- Configuração ---
+
+    @property
+    def count(self):
+        return current_app.config['FLASKY_USER_SHARDS']
+
+    @property
+    def enabled(self):
+        return self.count > 0
+
+    @property
+    def bucket_count(self):
+        return current_app.config['FLASKY_USER_BUCKETS']
+
+    def uri(self, shard, app=None):
+        """URI do banco do shard: o banco principal com o sufixo '-shard<n>' no nome do arquivo."""
+        base = (app or current_app).config['SQLALCHEMY_DATABASE_URI']
+        if shard == 0:
+            return base
+        root, ext = os.path.splitext(base)
+        return f'{root}-shard{shard}{ext}'
+
+    def engine(self, shard):
+        if shard == 0:
+            return self._db.engines[None]
+        return current_app.extensions['user_shards_engines'][shard]
+
+    # --- Baldes e shards ---
+
+    def bucket_of_key(self, key):
+        return zlib.crc32(str(key or '').encode('utf-8')) % self.bucket_count
+
+    def bucket_of_id(self, user_id):
+        return int(user_id) % self.bucket_count
+
+    def shard_of_bucket(self, bucket):
+        return bucket % self.count
+
+    def shard_of_id(self, user_id):
+        return self.shard_of_bucket(self.bucket_of_id(user_id))
+
+    def shard_of_key(self, key):
+        return self.shard_of_bucket(self.bucket_of_key(key))
+
+    # --- Roteamento ---
+
+    def current(self):
+        return _current_shard.get()
+
+    @contextmanager
+    def route(self, shard):
+        """Direciona as consultas à tabela particionada para o shard informado."""
+        if not self.enabled:
+            yield None
+            return
+        token = _current_shard.set(shard)
+        try:
+            yield shard
+        finally:
+            _current_shard.reset(token)
+
+    def route_id(self, user_id):
+        """Direciona as consultas para o shard do usuário com o id informado."""
+        return self.route(self.shard_of_id(user_id) if self.enabled else None)
+
+    def route_key(self, key):
+        """Direciona as consultas para o shard do usuário com o e-mail informado."""
+        return self.route(self.shard_of_key(key) if self.enabled else None)
+
+    def each(self):
+        """Percorre todos os shards, direcionando as consultas para cada um deles."""
+        for shard in (range(self.count) if self.enabled else [None]):
+            with self.route(shard):
+                yield shard
+
+    def group_ids(self, ids):
+        """Agrupa ids por shard: {shard: [ids]} (um único grupo se o sharding estiver desligado)."""
+        if not self.enabled:
+            return {None: list(ids)}
+        groups = {}
+        for user_id in ids:
+            groups.setdefault(self.shard_of_id(user_id), []).append(user_id)
+        return groups
+
+    def is_sharded(self, mapper=None, clause=None):
+        """Indica se a consulta envolve a tabela particionada (ou é SQL textual dentro de um roteamento)."""
+        if mapper is not None:
+            table = getattr(sa.inspect(mapper), 'local_table', None)
+            if table is not None and table.name in (self.table, self.buckets.name):
+                return True
+        if clause is not None:
+            if isinstance(clause, sa.TextClause):
+                return self.current() is not None
+            names = {getattr(t, 'name', None) for t in find_tables(clause, include_crud=True)}
+            return self.table in names or self.buckets.name in names
+        return False
+
+    # --- Ids ---
+
+    def allocate_id(self, session, key):
+        """
+        Gera o id de um novo usuário: reserva o próximo número da sequência do balde
+        (no shard dono do balde, na transação da sessão) e codifica o balde no id.
+        """
+        bucket = self.bucket_of_key(key)
+        conn = session.connection(bind_arguments={'shard_id': self.shard_of_bucket(bucket)})
+        conn.execute(sa.insert(self.buckets).prefix_with('OR IGNORE').values(bucket=bucket, next_seq=0))
+        seq = conn.execute(sa.update(self.buckets).where(self.buckets.c.bucket == bucket)
+                           .values(next_seq=self.buckets.c.next_seq + 1)
+                           .returning(self.buckets.c.next_seq)).scalar_one()
+        return seq * self.bucket_count + bucket
+
+    def reserve_ids(self, bucket, size):
+        """
+        Reserva de uma vez 'size' ids do balde (cargas em lote, ex: 'flask seed'), em uma
+        transação própria no shard dono do balde. Retorna a lista de ids, em ordem.
+        """
+        with self.engine(self.shard_of_bucket(bucket)).begin() as conn:
+            conn.execute(sa.insert(self.buckets).prefix_with('OR IGNORE').values(bucket=bucket, next_seq=0))
+            last = conn.execute(sa.update(self.buckets).where(self.buckets.c.bucket == bucket)
+                                .values(next_seq=self.buckets.c.next_seq + size)
+                                .returning(self.buckets.c.next_seq)).scalar_one()
+        return [seq * self.bucket_count + bucket for seq in range(last - size + 1, last + 1)]
+
+    # --- Esquema e replicação ---
+
+    def _shard_tables(self):
+        # Tabelas presentes em todos os shards: a particionada, os contadores e as replicadas (as referenciadas por FK).
+        users = self._db.metadata.tables[self.table]
+        replicated = [fk.column.table for fk in users.foreign_keys]
+        return replicated + [users, self.buckets]
+
+    def create_all(self):
+        """Cria as tabelas nos shards adicionais e copia para eles as tabelas replicadas."""
+        if self.count < 2:
+            return
+        for shard in range(1, self.count):
+            self._db.metadata.create_all(self.engine(shard), tables=self._shard_tables())
+        self.replicate()
+
+    def replicate(self):
+        """Copia as tabelas replicadas (ex: 'roles') do banco principal para os demais shards."""
+        if self.count < 2:
+            return
+        users = self._db.metadata.tables[self.table]
+        tables = [fk.column.table for fk in users.foreign_keys]
+        with self.engine(0).connect() as conn:
+            data = {t: [dict(r) for r in conn.execute(sa.select(t)).mappings()] for t in tables}
+        for shard in range(1, self.count):
+            with self.engine(shard).begin() as conn:
+                for table, rows in data.items():
+                    conn.execute(sa.delete(table))
+                    if rows:
+                        conn.execute(sa.insert(table), rows)
+
+    def rebalance(self, previous=None, batch_size=500):
+        """
+        Move baldes (contadores e usuários) para o shard correto depois de uma mudança em
+        FLASKY_USER_SHARDS. 'previous' é o número de shards anterior, quando maior que o atual
+        (os arquivos excedentes também são esvaziados). Os ids não mudam. Cada lote é copiado
+        para o destino (INSERT OR REPLACE, o que torna o comando seguro de repetir após uma
+        interrupção) e só então removido da origem. Deve rodar com a aplicação parada.
+        Retorna o número de usuários movidos.
+        """
+        if not self.enabled:
+            return 0
+        count, buckets = self.count, self.bucket_count
+        users = self._db.metadata.tables[self.table]
+        engines = {shard: self.engine(shard) for shard in range(count)}
+        extra = []
+        for shard in range(count, max(previous or 0, count)):
+            if os.path.exists(sa.engine.make_url(self.uri(shard)).database or ''):
+                engines[shard] = sa.create_engine(self.uri(shard))
+                extra.append(engines[shard])
+        moved = 0
+        try:
+            for source, engine in engines.items():
+                # Contadores de sequência: o destino fica com o maior valor, para nunca repetir ids.
+                with engine.connect() as conn:
+                    counters = conn.execute(sa.select(self.buckets)).all() \
+                        if sa.inspect(conn).has_table(self.buckets.name) else []
+                for bucket, next_seq in counters:
+                    target = bucket % count
+                    if target == source:
+                        continue
+                    with engines[target].begin() as conn:
+                        conn.execute(sa.insert(self.buckets).prefix_with('OR IGNORE').values(bucket=bucket, next_seq=0))
+                        conn.execute(sa.update(self.buckets).where(self.buckets.c.bucket == bucket)
+                                     .values(next_seq=sa.func.max(self.buckets.c.next_seq, next_seq)))
+                    with engine.begin() as conn:
+                        conn.execute(sa.delete(self.buckets).where(self.buckets.c.bucket == bucket))
+                # Usuários, em lotes.
+                misplaced = (users.c.id % buckets) % count != source
+                while True:
+                    with engine.connect() as conn:
+                        if not sa.inspect(conn).has_table(self.table):
+                            break
+                        rows = [dict(r) for r in conn.execute(
+                            sa.select(users).where(misplaced).limit(batch_size)).mappings()]
+                    if not rows:
+                        break
+                    targets = {}
+                    for row in rows:
+                        targets.setdefault((row['id'] % buckets) % count, []).append(row)
+                    for target, items in targets.items():
+                        with engines[target].begin() as conn:
+                            conn.execute(sa.insert(users).prefix_with('OR REPLACE'), items)
+                    with engine.begin() as conn:
+                        conn.execute(sa.delete(users).where(users.c.id.in_([r['id'] for r in rows])))
+                    moved += len(rows)
+        finally:
+            for engine in extra:
+                engine.dispose()
+        return moved
+
+
+class ShardedSession(Session):
+    """
+    Sessão do Flask-SQLAlchemy que envia as consultas e gravações da tabela particionada
+    para o shard certo (ver UserShards). Com o sharding desligado, comporta-se exatamente
+    como a sessão padrão.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        shards = current_app.extensions.get('user_shards')
+        # Com connection_callable definido, o flush escolhe a conexão objeto a objeto.
+        if shards is not None and shards.enabled:
+            self.connection_callable = self._connection_for_instance
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard_id=None, **kwargs):
+        if bind is None:
+            shards = current_app.extensions.get('user_shards')
+            if shards is not None and shards.enabled:
+                if shard_id is None and shards.is_sharded(mapper, clause):
+                    shard_id = shards.current()
+                    if shard_id is None:
+                        if shards.count > 1:
+                            raise ShardRoutingError(
+                                f'Consulta à tabela {shards.table!r} sem shard definido.')
+                        shard_id = 0
+                if shard_id is not None:
+                    return shards.engine(shard_id)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _connection_for_instance(self, mapper=None, instance=None, **kwargs):
+        shards = current_app.extensions['user_shards']
+        if instance is not None and shards.is_sharded(mapper):
+            return self.connection(bind_arguments={'mapper': mapper, 'shard_id': shards.shard_of_id(instance.id)})
+        return self.connection(bind_arguments={'mapper': mapper})
+
+
+# Gera os ids dos novos usuários antes do flush: o id decide em qual shard a linha é gravada.
+@event.listens_for(ShardedSession, 'before_flush')
+def _assign_ids(session, flush_context, instances):
+    shards = current_app.extensions.get('user_shards')
+    if shards is None or not shards.enabled:
+        return
+    for obj in session.new:
+        if getattr(obj, '__tablename__', None) == shards.table and obj.id is None:
+            obj.id = shards.allocate_id(session, getattr(obj, shards.key))
@@ -0,0 +1,107 @@
+"""
+Agrupamento (single-flight) de computações idênticas e simultâneas.
+"""
+# Importa os módulos da biblioteca padrão usados pelo agrupamento.
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    # Uma computação em andamento: o líder preenche 'result' (ou 'failed') e sinaliza 'done'.
+    __slots__ = ('done', 'result', 'failed', 'leader')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+        self.leader = threading.get_ident()
+
+
+class SingleFlight:
+    """
+    Extensão no padrão das demais (db, cache...): a instância é criada em extensions.py e
+    associada à aplicação com init_app() dentro de create_app().
+
+    do(namespace, key, fn, *args) executa fn(*args) uma única vez para chamadas simultâneas com
+    a mesma chave: a primeira thread (líder) executa a função e as que chegam enquanto ela roda
+    (seguidoras) esperam e recebem o mesmo resultado. Nada é guardado depois que o líder termina:
+    ao contrário do cache, o resultado nunca fica obsoleto.
+
+    O resultado é compartilhado entre threads, então deve ser imutável ou independente de sessão
+    (tuplas, dicionários que ninguém altera, objetos desanexados da sessão do líder). Use apenas
+    para leituras.
+
+    Se o líder falhar, ou demorar mais que o tempo de espera, cada seguidora executa a função
+    por conta própria: o agrupamento nunca deixa uma chamada sem resposta nem compartilha erros.
+
+    Configuração:
+    - FLASKY_SINGLEFLIGHT: liga o agrupamento (desligado, do() apenas chama a função).
+    - FLASKY_SINGLEFLIGHT_TIMEOUT: espera máxima das seguidoras, em segundos.
+
+    As estatísticas (leaders, coalesced, timeouts, failures) são contadas por namespace, no processo atual.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.timeout = 5.0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'leaders': 0, 'coalesced': 0, 'timeouts': 0, 'failures': 0})
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLASKY_SINGLEFLIGHT', True)
+        app.config.setdefault('FLASKY_SINGLEFLIGHT_TIMEOUT', 5.0)
+        self.enabled = app.config['FLASKY_SINGLEFLIGHT']
+        self.timeout = app.config['FLASKY_SINGLEFLIGHT_TIMEOUT']
+        with self._lock:
+            self._stats.clear()
+        app.extensions['singleflight'] = self
+
+    def _count(self, namespace, name):
+        with self._lock:
+            self._stats[namespace][name] += 1
+
+    def do(self, namespace, key, fn, *args, timeout=None, **kwargs):
+        """Executa fn(*args, **kwargs), compartilhando o resultado com chamadas simultâneas de mesma chave."""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        name = (namespace, key)
+        with self._lock:
+            call = self._calls.get(name)
+            leader = call is None
+            if leader:
+                call = self._calls[name] = _Call()
+                self._stats[namespace]['leaders'] += 1
+        if leader:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException:
+                call.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[name]
+                call.done.set()
+            return call.result
+        # Chamada reentrante (a própria função do líder pedindo a mesma chave): executa direto.
+        if call.leader == threading.get_ident():
+            return fn(*args, **kwargs)
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            self._count(namespace, 'timeouts')
+            return fn(*args, **kwargs)
+        if call.failed:
+            self._count(namespace, 'failures')
+            return fn(*args, **kwargs)
+        self._count(namespace, 'coalesced')
+        return call.result
+
+    def stats(self):
+        """Retorna as estatísticas por namespace, com a fração de chamadas agrupadas."""
+        with self._lock:
+            stats = {namespace: dict(counters) for namespace, counters in self._stats.items()}
+        for counters in stats.values():
+            calls = sum(counters.values())
+            counters['coalesced_ratio'] = counters['coalesced'] / calls if calls else 0.0
+        return stats
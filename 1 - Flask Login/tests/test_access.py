@@ -0,0 +1,123 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import AccessEntry, Identity, Permission, Role, User
+
+# Define uma suíte de testes para as permissões sobre objetos (AccessEntry).
+class AccessEntryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.moderator = Role.query.filter_by(name='Moderator').first()
+        self.staff = User(email='staff@example.com', name='Staff', password='cat', confirmed=True,
+                          role=self.moderator)
+        self.users = [User(email=f'user{i}@example.com', name=f'Usuario {i}') for i in range(30)]
+        db.session.add_all([self.staff] + self.users)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    # Conta as consultas executadas dentro do bloco 'with'.
+    def count_queries(self):
+        class Counter:
+            def __enter__(self):
+                self.count = 0
+                event.listen(db.engine, 'before_cursor_execute', self.hook)
+                return self
+
+            def hook(self, *args):
+                self.count += 1
+
+            def __exit__(self, *exc):
+                event.remove(db.engine, 'before_cursor_execute', self.hook)
+
+        return Counter()
+
+    # Testa as permissões pelo papel, por objeto, por papel e o dono do objeto, em uma consulta.
+    def test_allowed_ids(self):
+        identity = Identity.load(self.staff.id)
+        ids = lambda: AccessEntry.allowed_ids(identity, self.users + [self.staff], Permission.ADMIN)
+        # Pelo papel, o moderador não é administrador: só o próprio perfil (dono).
+        self.assertEqual(ids(), {self.staff.id})
+        # Pelo papel, pode moderar todos.
+        self.assertEqual(len(AccessEntry.allowed_ids(identity, self.users, Permission.MODERATE)), 30)
+        AccessEntry.grant(self.users[0], Permission.ADMIN, user=self.staff)
+        AccessEntry.grant(self.users[1], 'ADMIN', role=self.moderator)
+        AccessEntry.grant(self.users[2], Permission.FOLLOW, user=self.staff)
+        db.session.commit()
+        # Recarrega os objetos expirados pelo commit antes de contar as consultas.
+        User.query.all()
+        with self.count_queries() as counter:
+            self.assertEqual(ids(), {self.staff.id, self.users[0].id, self.users[1].id})
+        self.assertEqual(counter.count, 1)
+        # Uma entrada para o modelo inteiro vale para todos os objetos.
+        AccessEntry.grant(User, Permission.ADMIN, role=self.moderator)
+        db.session.commit()
+        self.assertEqual(len(ids()), 31)
+        # Usuários não logados não recebem nada.
+        self.assertEqual(AccessEntry.allowed_ids(None, self.users, Permission.FOLLOW), set())
+
+    # Testa que combinar entradas diferentes completa as permissões pedidas.
+    def test_combined_bits(self):
+        target = self.users[0]
+        AccessEntry.grant(target, 'ADMIN', user=self.staff)
+        AccessEntry.grant(target, Permission.register('TEST_ACCESS'))
+        db.session.commit()
+        identity = Identity.load(self.staff.id)
+        self.assertEqual(AccessEntry.allowed_ids(identity, self.users, Permission.mask('ADMIN', 'TEST_ACCESS')),
+                         {target.id})
+        self.assertEqual(AccessEntry.allowed_ids(identity, self.users, Permission.mask('ADMIN', 'MODERATE')),
+                         {target.id})
+
+    # Testa a consulta filtrada: a listagem continua sendo uma consulta só.
+    def test_filter_query(self):
+        AccessEntry.grant(self.users[3], Permission.ADMIN, user=self.staff)
+        db.session.commit()
+        identity = Identity.load(self.staff.id)
+        with self.count_queries() as counter:
+            users = AccessEntry.filter_query(User.query, User, identity, Permission.ADMIN).all()
+        self.assertEqual(counter.count, 2)
+        self.assertEqual({u.id for u in users}, {self.staff.id, self.users[3].id})
+        # Quem tem a permissão pelo papel recebe a consulta sem filtro.
+        admin = User(email='admin@example.com', role=Role.query.filter_by(name='Administrator').first())
+        db.session.add(admin)
+        db.session.commit()
+        query = User.query
+        self.assertIs(AccessEntry.filter_query(query, User, Identity.load(admin.id), Permission.ADMIN), query)
+
+    # Testa a retirada de permissões.
+    def test_revoke(self):
+        AccessEntry.grant(self.users[0], Permission.mask('ADMIN', 'FOLLOW'), user=self.staff)
+        db.session.commit()
+        AccessEntry.revoke(self.users[0], Permission.ADMIN, user=self.staff)
+        db.session.commit()
+        self.assertEqual(AccessEntry.query.one().permissions, Permission.FOLLOW)
+        AccessEntry.revoke(self.users[0], Permission.FOLLOW, user=self.staff)
+        db.session.commit()
+        self.assertEqual(AccessEntry.query.count(), 0)
+
+    # Testa a página de busca: o e-mail só aparece para os usuários com ADMIN concedido.
+    def test_search_shows_granted_emails(self):
+        AccessEntry.grant(self.users[5], Permission.ADMIN, user=self.staff)
+        db.session.commit()
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app_context.pop()
+        try:
+            client = self.app.test_client()
+            client.post('/auth/login', data={'email': 'staff@example.com', 'password': 'cat'})
+            html = client.get('/search?q=usuario').get_data(as_text=True)
+        finally:
+            self.app_context.push()
+        self.assertIn('mailto:user5@example.com', html)
+        self.assertNotIn('mailto:user6@example.com', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Importa os módulos necessários para os testes.
+import threading
+import time
+import unittest
+from app import create_app, db
+from app.admission import AdmissionControl
+from app.models import Role
+
+# Define uma suíte de testes para o controle de admissão.
+class AdmissionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config.update(FLASKY_ADMISSION=True, FLASKY_ADMISSION_SLOTS=2, FLASKY_ADMISSION_RETRY_AFTER=3,
+                               FLASKY_ADMISSION_LIMITS={'auth': (1, 0, 0.1), 'write': (2, 4, 1.0)})
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+        self.admission = AdmissionControl(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Testa a classificação das requisições por endpoint e método.
+    def test_classify(self):
+        def classify(path, method='GET'):
+            return self.admission.classify(self.app, {'PATH_INFO': path, 'REQUEST_METHOD': method,
+                                                      'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+                                                      'wsgi.url_scheme': 'http'})
+        self.assertEqual(classify('/static/favicon.ico'), 'static')
+        self.assertEqual(classify('/auth/logout'), 'read')
+        self.assertEqual(classify('/auth/login'), 'read')
+        self.assertEqual(classify('/auth/login', 'POST'), 'auth')
+        self.assertEqual(classify('/', 'POST'), 'write')
+
+    # Testa que uma classe saturada é descartada com 503 e Retry-After, sem afetar as demais.
+    def test_shed_saturated_class(self):
+        self.assertTrue(self.admission.acquire('auth'))
+        try:
+            response = self.client.post('/auth/login', data={'email': 'a@example.com', 'password': 'x'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '3')
+            response = self.client.post('/api/v1/tokens', headers={'Accept': 'application/json'})
+            self.assertEqual(response.get_json()['error'], 'service unavailable')
+            # A vaga é devolvida quando o servidor fecha a resposta.
+            with self.client.get('/auth/logout') as response:
+                self.assertEqual(response.status_code, 302)
+        finally:
+            self.admission.release('auth')
+        with self.client.post('/auth/login', data={'email': 'a@example.com', 'password': 'x'}) as response:
+            self.assertEqual(response.status_code, 200)
+        stats = self.admission.stats()
+        self.assertEqual(stats['classes']['auth']['shed'], 2)
+        self.assertEqual(stats['classes']['auth']['admitted'], 2)
+        self.assertEqual(stats['running'], 0)
+
+    # Testa que uma vaga liberada vai para a classe mais prioritária que está esperando.
+    def test_priority(self):
+        admitted = []
+
+        def request(name):
+            if self.admission.acquire(name):
+                admitted.append(name)
+
+        self.assertTrue(self.admission.acquire('write'))
+        self.assertTrue(self.admission.acquire('write'))
+        threads = [threading.Thread(target=request, args=('write',))]
+        threads[0].start()
+        time.sleep(0.05)
+        threads.append(threading.Thread(target=request, args=('read',)))
+        threads[1].start()
+        time.sleep(0.05)
+        self.assertEqual(self.admission.stats()['classes']['write']['waiting'], 1)
+        self.assertEqual(self.admission.stats()['classes']['read']['waiting'], 1)
+        # A escrita chegou antes, mas a leitura é mais prioritária.
+        self.admission.release('write')
+        threads[1].join(1)
+        self.assertEqual(admitted, ['read'])
+        self.admission.release('read')
+        threads[0].join(1)
+        self.assertEqual(admitted, ['read', 'write'])
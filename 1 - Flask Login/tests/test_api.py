@@ -0,0 +1,87 @@
+# Importa os módulos necessários para os testes.
+import base64
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.models import Role, User
+
+# Define uma suíte de testes para a API JSON com tokens de acesso.
+class APITestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            db.session.add_all([
+                User(email='john@example.com', name='John', password='cat', confirmed=True),
+                User(email='susan@example.com', name='Susan', password='dog', confirmed=False),
+            ])
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _basic(self, email, password):
+        credentials = base64.b64encode(f'{email}:{password}'.encode()).decode()
+        return {'Authorization': 'Basic ' + credentials}
+
+    def _token(self, email='john@example.com', password='cat'):
+        response = self.client.post('/api/v1/tokens', headers=self._basic(email, password))
+        self.assertEqual(response.status_code, 200)
+        return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+    # Testa a emissão de tokens por HTTP Basic e por JSON.
+    def test_token_issuance(self):
+        self.assertEqual(self.client.post('/api/v1/tokens',
+                                          headers=self._basic('john@example.com', 'dog')).status_code, 401)
+        response = self.client.post('/api/v1/tokens', json={'email': 'john@example.com', 'password': 'cat'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.get_json())
+
+    # Testa que as rotas exigem um token válido e rejeitam contas não confirmadas.
+    def test_requires_token(self):
+        self.assertEqual(self.client.get('/api/v1/me').status_code, 401)
+        self.assertEqual(self.client.get('/api/v1/me', headers={'Authorization': 'Bearer x'}).status_code, 401)
+        self.assertEqual(self.client.get('/api/v1/me', headers=self._token('susan@example.com', 'dog')).status_code, 403)
+
+    # Testa que /me e as verificações de permissão não consultam o banco.
+    def test_me_without_database(self):
+        headers = self._token()
+        with mock.patch('sqlalchemy.orm.Session.execute', side_effect=AssertionError('consulta ao banco')):
+            me = self.client.get('/api/v1/me', headers=headers).get_json()
+            self.assertEqual(me['id'], 1)
+            self.assertTrue(self.client.get('/api/v1/me/can/follow', headers=headers).get_json()['granted'])
+            self.assertFalse(self.client.get('/api/v1/me/can/admin', headers=headers).get_json()['granted'])
+        self.assertEqual(self.client.get('/api/v1/me/can/nada', headers=headers).status_code, 404)
+
+    # Testa o perfil em JSON: sem e-mail para quem não é administrador, 404 em JSON para ids inexistentes.
+    def test_user_profile(self):
+        headers = self._token()
+        data = self.client.get('/api/v1/users/2', headers=headers).get_json()
+        self.assertEqual(data['name'], 'Susan')
+        self.assertNotIn('email', data)
+        response = self.client.get('/api/v1/users/99', headers=headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['error'], 'not found')
+
+    # Testa o lote de perfis: uma única consulta, ordem preservada, ausentes listados e ETag.
+    def test_batch_profiles(self):
+        headers = self._token()
+        response = self.client.get('/api/v1/users?ids=2,99,1,2', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual([u['name'] for u in data['users']], ['Susan', 'John'])
+        self.assertEqual(data['users'][0]['role'], 'User')
+        self.assertEqual(data['missing'], [99])
+        self.assertEqual(response.headers['X-Query-Count'], '1')
+        # Requisição condicional com o mesmo ETag: 304 sem corpo.
+        headers['If-None-Match'] = response.headers['ETag']
+        self.assertEqual(self.client.get('/api/v1/users?ids=2,99,1,2', headers=headers).status_code, 304)
+        # Busca por e-mail apenas para administradores; limite de tamanho do lote.
+        del headers['If-None-Match']
+        self.assertEqual(self.client.get('/api/v1/users?emails=john@example.com', headers=headers).status_code, 403)
+        self.app.config['FLASKY_API_BATCH_LIMIT'] = 2
+        self.assertEqual(self.client.get('/api/v1/users?ids=1,2,3', headers=headers).status_code, 400)
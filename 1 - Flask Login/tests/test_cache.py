@@ -0,0 +1,110 @@
+# Importa os módulos necessários para os testes.
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from app import create_app, db
+from app.models import User, Role
+from caching import Cache, MemoryBackend, SQLiteBackend, MISS
+from extensions import cache
+
+# Define uma suíte de testes para a extensão de cache.
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    # Testa o descarte LRU e a expiração do backend em memória.
+    def test_memory_backend_lru_and_ttl(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', 1, None)
+        backend.set('b', 2, None)
+        backend.get('a')
+        backend.set('c', 3, None)
+        self.assertIs(backend.get('b'), MISS)
+        self.assertEqual(backend.get('a'), 1)
+        backend.set('d', 4, 0.01)
+        time.sleep(0.02)
+        self.assertIs(backend.get('d'), MISS)
+
+    # Testa que duas instâncias (como dois workers) compartilham entradas e invalidações pelo SQLite.
+    def test_sqlite_backend_is_shared(self):
+        path = os.path.join(self.tmpdir, 'cache.sqlite')
+        worker1, worker2 = Cache(), Cache()
+        worker1.backend, worker2.backend = SQLiteBackend(path), SQLiteBackend(path)
+        worker1.set('k', {'v': 1}, tags=['t'])
+        self.assertEqual(worker2.get('k'), {'v': 1})
+        worker2.invalidate_tag('t')
+        self.assertIsNone(worker1.get('k'))
+
+    # Testa o memoize, a invalidação por tag e as estatísticas por namespace.
+    def test_memoize_and_tags(self):
+        calls = []
+
+        @cache.memoize('test', tags=lambda x: ['x:' + str(x)])
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(3), 9)
+        self.assertEqual(calls, [3])
+        cache.invalidate_tag('x:3')
+        self.assertEqual(square(3), 9)
+        self.assertEqual(calls, [3, 3])
+        stats = cache.stats()['test']
+        self.assertEqual((stats['hits'], stats['misses'], stats['stale']), (1, 2, 1))
+
+    # Testa que a busca negativa por e-mail não fica no cache e que a positiva é invalidada só no commit.
+    def test_email_lookup_cache(self):
+        self.assertIsNone(User.get_by_email('john@example.com'))
+        self.assertIsNone(User.get_by_email('john@example.com'))
+        self.assertEqual(cache.stats()['users']['misses'], 2)
+        u = User(email='john@example.com', password='cat')
+        db.session.add(u)
+        db.session.commit()
+        self.assertEqual(User.get_by_email('john@example.com'), u)
+        self.assertEqual(User.id_by_email('john@example.com'), u.id)
+        self.assertEqual(cache.stats()['users']['hits'], 1)
+        # A remoção desfeita não invalida nada; a confirmada, sim.
+        db.session.delete(u)
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(User.id_by_email('john@example.com'), u.id)
+        self.assertEqual(cache.stats()['users']['stale'], 0)
+        db.session.delete(u)
+        db.session.commit()
+        self.assertIsNone(User.id_by_email('john@example.com'))
+        self.assertEqual(cache.stats()['users']['stale'], 1)
+
+    # Testa o memoize com cache_none=False: resultados None são recalculados a cada chamada.
+    def test_memoize_skips_none(self):
+        calls = []
+
+        @cache.memoize('test-none', cache_none=False)
+        def find(x):
+            calls.append(x)
+            return None if x < 0 else x
+
+        find(-1), find(-1), find(1), find(1)
+        self.assertEqual(calls, [-1, -1, 1])
+
+    # Testa que os papéis vêm do cache e que insert_roles() invalida as entradas.
+    def test_role_lookup_cached(self):
+        User(email='a@example.com', password='cat')
+        User(email='b@example.com', password='cat')
+        self.assertEqual(cache.stats()['roles']['hits'], 1)
+        Role.insert_roles()
+        User(email='c@example.com', password='cat')
+        self.assertEqual(cache.stats()['roles']['stale'], 1)
@@ -0,0 +1,109 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.models import Identity, Permission, Role, User
+
+# Define uma suíte de testes para as claims de autorização guardadas na sessão.
+class SessionClaimsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config.update(WTF_CSRF_ENABLED=False, FLASKY_SESSION_CLAIMS=True)
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            user = User(email='john@example.com', name='John', password='cat')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            self.token = user.generate_confirmation_token()
+        self.client = self.app.test_client()
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        # A primeira requisição depois do login carrega a identidade e grava as claims.
+        self.client.get('/auth/unconfirmed')
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def loads(self, path='/auth/unconfirmed'):
+        # Faz a requisição contando quantas vezes a identidade foi carregada do banco.
+        with mock.patch.object(Identity, 'load', wraps=Identity.load) as load:
+            response = self.client.get(path)
+        return response, load.call_count
+
+    # Testa que, com claims válidas, as requisições não carregam a identidade do banco.
+    def test_claims_skip_hydration(self):
+        with self.client.session_transaction() as session:
+            self.assertIn('_claims', session)
+        response, loads = self.loads()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads, 0)
+        # Sem confirmação, as demais páginas continuam redirecionando (decisão tomada pelas claims).
+        response, loads = self.loads('/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(loads, 0)
+
+    # Testa que a confirmação incrementa a versão e a próxima requisição recarrega as claims.
+    def test_confirm_bumps_version(self):
+        self.client.get(f'/auth/confirm/{self.token}')
+        response, loads = self.loads('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads, 1)
+        self.assertEqual(self.loads('/')[1], 0)
+
+    # Testa que a mudança de papel (do usuário ou das permissões do papel) invalida as claims.
+    def test_role_changes(self):
+        with self.app.app_context():
+            moderator = Role.query.filter_by(name='Moderator').first()
+            user = db.session.get(User, self.user_id)
+            version = user.claims_version
+            user.confirmed = True
+            user.role = moderator
+            db.session.commit()
+            self.assertEqual(user.claims_version, version + 1)
+            user.location = 'Porto Alegre'
+            db.session.commit()
+            self.assertEqual(user.claims_version, version + 1)
+        self.assertEqual(self.loads('/')[1], 1)
+        with self.app.app_context():
+            role = Role.query.filter_by(name='Moderator').first()
+            role.permissions = Permission.FOLLOW
+            db.session.commit()
+            self.assertEqual(db.session.get(User, self.user_id).claims_version, version + 2)
+            Role.insert_roles()
+            self.assertEqual(db.session.get(User, self.user_id).claims_version, version + 3)
+        self.assertEqual(self.loads('/')[1], 1)
+
+    # Testa que claims expiradas ou adulteradas são descartadas e recarregadas do banco.
+    def test_expired_or_tampered(self):
+        self.app.config['FLASKY_SESSION_CLAIMS_TTL'] = -1
+        self.assertEqual(self.loads()[1], 1)
+        self.app.config['FLASKY_SESSION_CLAIMS_TTL'] = 300
+        with self.client.session_transaction() as session:
+            session['_claims'] = session['_claims'][:-2] + 'xx'
+        self.assertEqual(self.loads()[1], 1)
+        self.assertEqual(self.loads()[1], 0)
+        # O logout remove as claims.
+        self.client.get('/auth/logout')
+        with self.client.session_transaction() as session:
+            self.assertNotIn('_claims', session)
+
+    # Testa que a versão só é invalidada no commit e que a remoção do usuário também invalida as claims.
+    def test_invalidated_after_commit_and_on_delete(self):
+        with self.app.app_context():
+            user = db.session.get(User, self.user_id)
+            version = User.claims_version_of(self.user_id)
+            user.confirmed = True
+            db.session.flush()
+            # Antes do commit, outra leitura ainda vê (e guarda) a versão antiga.
+            self.assertEqual(User.claims_version_of(self.user_id), version)
+            db.session.rollback()
+            self.assertEqual(User.claims_version_of(self.user_id), version)
+            db.session.delete(db.session.get(User, self.user_id))
+            db.session.commit()
+            self.assertIsNone(User.claims_version_of(self.user_id))
+        response, loads = self.loads()
+        self.assertEqual(loads, 1)
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,118 @@
+# Importa os módulos necessários para os testes.
+import re
+import unittest
+from flask_wtf import FlaskForm
+from markupsafe import Markup
+from wtforms import BooleanField, SelectField, StringField, SubmitField
+from wtforms.validators import Length
+from app import create_app, db, form_renderer
+from app.auth.forms import LoginForm, RegistrationForm, PasswordResetRequestForm, PasswordResetForm
+from app.models import Role
+from app.models.nameform import NameForm
+
+
+# Formulário com descrição no campo (mostrada quando não há erros), em HTML marcado como seguro.
+class DescribedForm(FlaskForm):
+    name = StringField('Nome', description=Markup('<em>Como aparece no perfil</em>'), validators=[Length(max=3)])
+    submit = SubmitField('Enviar')
+
+
+# Formulário com '<' e '&' no rótulo e na descrição, em texto simples: precisam ser escapados.
+class EscapedForm(FlaskForm):
+    name = StringField('Nome <e> sobrenome', description='Use <b> & </b> à vontade')
+    accept = BooleanField('Aceito os termos <script>alert(1)</script> & condições')
+    submit = SubmitField('Enviar')
+
+
+# Formulário com um campo de seleção, que a versão pré-compilada não cobre.
+class ChoiceForm(FlaskForm):
+    name = StringField('Nome')
+    color = SelectField('Cor', choices=[('r', 'Vermelho'), ('g', 'Verde')])
+    submit = SubmitField('Enviar')
+
+
+# Compara o HTML sem diferenças de espaços em branco.
+def normalize(html):
+    html = re.sub(r'\s+', ' ', str(html))
+    return re.sub(r'\s*([<>"])\s*', r'\1', html).strip()
+
+
+# Define uma suíte de testes para o renderizador de formulários pré-compilados.
+class FormRenderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        form_renderer.clear()
+
+    def render_both(self, form_class, data=None, **options):
+        request = {'method': 'POST', 'data': data} if data is not None else {}
+        with self.app.test_request_context('/', **request):
+            form = form_class()
+            if data is not None:
+                form.validate()
+            return form_renderer.macro(form, **options), form_renderer.quick_form(form, **options)
+
+    # Testa que o HTML é o mesmo da macro para todos os formulários, vazios, preenchidos e com erros.
+    def test_same_markup_as_macro(self):
+        invalid = {'email': 'a<b>"c', 'name': 'x', 'password': 'a', 'password2': 'b', 'remember_me': 'y'}
+        valid = {'email': 'john@example.com', 'name': 'John', 'password': 'cat', 'password2': 'cat'}
+        for form_class in (NameForm, LoginForm, RegistrationForm, PasswordResetRequestForm, PasswordResetForm,
+                           DescribedForm):
+            for data in (None, invalid, valid):
+                macro, compiled = self.render_both(form_class, data)
+                self.assertEqual(normalize(macro), normalize(compiled), form_class.__name__)
+        # Rótulos e descrições em texto simples são escapados (a macro os repassa com |safe).
+        _, compiled = self.render_both(EscapedForm)
+        self.assertNotIn('<script>', str(compiled))
+        self.assertIn('termos &lt;script&gt;alert(1)&lt;/script&gt; &amp; condições</label>', str(compiled))
+        self.assertIn('<p class="help-block">Use &lt;b&gt; &amp; &lt;/b&gt; à vontade</p>', str(compiled))
+        # Os valores são escapados.
+        _, compiled = self.render_both(LoginForm, invalid)
+        self.assertIn('value="a&lt;b&gt;&#34;c"', str(compiled))
+        self.assertIn('checked', str(compiled))
+
+    # Testa que as opções da macro também são respeitadas.
+    def test_options(self):
+        options = {'action': '/x?a=1&b=2', 'id': 'f', 'extra_classes': 'wide', 'novalidate': True,
+                   'button_map': {'submit': 'primary'}}
+        macro, compiled = self.render_both(LoginForm, **options)
+        self.assertEqual(normalize(macro), normalize(compiled))
+        self.assertIn('btn btn-primary', str(compiled))
+
+    # Testa que cada classe de formulário é compilada uma vez só.
+    def test_compiled_once(self):
+        for _ in range(3):
+            self.render_both(LoginForm)
+            self.render_both(LoginForm, {'email': 'x'})
+        self.assertEqual(len(form_renderer._compiled), 1)
+
+    # Testa o fallback para a macro: campos não suportados, outros layouts e a configuração desligada.
+    def test_fallback(self):
+        macro, compiled = self.render_both(ChoiceForm, {'name': 'x', 'color': 'g'})
+        self.assertEqual(str(macro), str(compiled))
+        macro, compiled = self.render_both(LoginForm, form_type='horizontal')
+        self.assertEqual(str(macro), str(compiled))
+        self.app.config['FLASKY_FORM_PRECOMPILE'] = False
+        macro, compiled = self.render_both(LoginForm)
+        self.assertEqual(str(macro), str(compiled))
+
+    # Testa as páginas que usam quick_form.
+    def test_pages(self):
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+        try:
+            client = self.app.test_client()
+            html = client.get('/auth/login').get_data(as_text=True)
+            self.assertIn('<input class="form-control" id="email"', html)
+            html = client.post('/auth/register', data={'email': 'x'}).get_data(as_text=True)
+            self.assertIn('has-error', html)
+            self.assertIn('name="password2"', html)
+        finally:
+            with self.app.app_context():
+                db.session.remove()
+                db.drop_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Identity, Permission, Role, User
+
+# Define uma suíte de testes para a identidade enxuta usada como current_user.
+class IdentityTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.user = User(email='john@example.com', name='John', password='cat', confirmed=True,
+                         about_me='x' * 1000, last_seen=datetime.utcnow() - timedelta(days=1))
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    # Testa que a consulta traz só as colunas de autenticação e autorização.
+    def test_projected_columns(self):
+        sql = str(Identity.QUERY)
+        self.assertNotIn('about_me', sql)
+        self.assertNotIn('password_hash', sql)
+        identity = Identity.load(self.user.id)
+        self.assertEqual((identity.id, identity.name, identity.confirmed), (self.user.id, 'John', True))
+        self.assertTrue(identity.can(Permission.FOLLOW))
+        self.assertFalse(identity.is_administrator())
+        self.assertEqual(identity.get_id(), str(self.user.id))
+        self.assertIsNone(Identity.load(999))
+        # Sem __dict__: atributos desconhecidos não podem ser criados.
+        with self.assertRaises(AttributeError):
+            identity.foo = 1
+
+    # Testa o carregamento preguiçoso do User e a delegação de atributos.
+    def test_lazy_user(self):
+        user_id = self.user.id
+        db.session.expunge_all()
+        identity = Identity.load(user_id)
+        self.assertIsNone(identity._user)
+        self.assertEqual(len(identity.about_me), 1000)
+        self.assertIsInstance(identity.user, User)
+        self.assertTrue(identity.verify_password('cat'))
+        self.assertEqual(identity, identity.user)
+
+    # Testa o ping com UPDATE direto.
+    def test_ping(self):
+        before = self.user.last_seen
+        Identity.load(self.user.id).ping()
+        db.session.refresh(self.user)
+        self.assertGreater(self.user.last_seen, before)
+
+    # Testa que o current_user das requisições é uma Identity.
+    def test_current_user_is_identity(self):
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        client = self.app.test_client()
+        client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        response = client.get(f'/user/{self.user.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'John', response.data)
@@ -0,0 +1,186 @@
+# Importa os módulos necessários para os testes.
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from sqlalchemy import event
+from bloom import BloomFilter
+from app import create_app, db, cache, lookup_filter
+from app.models import Role, User
+
+# Define uma suíte de testes para o filtro de Bloom.
+class BloomFilterTestCase(unittest.TestCase):
+    # Testa que não há falsos negativos e que a taxa de falsos positivos fica perto da pedida.
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(5000, 0.01)
+        for i in range(5000):
+            bloom.add(f'user{i}@example.com')
+        self.assertTrue(all(f'user{i}@example.com' in bloom for i in range(5000)))
+        false_positives = sum(f'other{i}@example.com' in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+        stats = bloom.stats()
+        self.assertEqual(stats['count'], 5000)
+        self.assertLess(stats['estimated_false_positive_rate'], 0.02)
+        self.assertEqual(stats['bytes'], (bloom.bits + 7) // 8)
+
+
+# Define uma suíte de testes para o filtro de buscas negativas por nome.
+class UserLookupFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app('testing')
+        # O filtro exige um cache compartilhado entre os processos.
+        self.app.config['CACHE_BACKEND'] = 'sqlite'
+        self.app.config['CACHE_SQLITE_PATH'] = os.path.join(self.tmpdir, 'cache.sqlite')
+        self.app.config['FLASKY_LOOKUP_FILTER'] = True
+        # Os testes que dependem da leitura periódica zeram o intervalo.
+        self.app.config['FLASKY_LOOKUP_FILTER_CHECK'] = 3600
+        cache.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        db.session.add(User(email='john@example.com', name='john', password='cat', confirmed=True))
+        db.session.commit()
+        # Monta o filtro com as tabelas já criadas (create_app roda antes do create_all).
+        lookup_filter.init_app(self.app)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    # Conta as consultas executadas dentro do bloco 'with'.
+    def count_queries(self):
+        class Counter:
+            def __enter__(self):
+                self.count = 0
+                event.listen(db.engine, 'before_cursor_execute', self.hook)
+                return self
+
+            def hook(self, *args):
+                self.count += 1
+
+            def __exit__(self, *exc):
+                event.remove(db.engine, 'before_cursor_execute', self.hook)
+
+        return Counter()
+
+    # Espera a reconstrução em segundo plano.
+    def wait_rebuild(self):
+        for thread in threading.enumerate():
+            if thread.name == 'flasky-lookup-filter':
+                thread.join()
+
+    # Testa que nomes inexistentes não chegam ao banco nem ao cache, e os existentes continuam passando.
+    def test_negative_lookup_skipped(self):
+        with self.count_queries() as counter, \
+                mock.patch.object(cache.backend, 'tag_version', side_effect=AssertionError):
+            self.assertFalse(lookup_filter.might_exist('name', 'nobody'))
+        self.assertEqual(counter.count, 0)
+        self.assertTrue(lookup_filter.might_exist('name', 'john'))
+        # O e-mail (com índice único) não é filtrado.
+        self.assertTrue(lookup_filter.might_exist('email', 'nobody@example.com'))
+        stats = lookup_filter.stats()['name']
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(stats['lookups'], 2)
+
+    # Testa que um usuário novo entra no filtro na hora (sem reconstrução).
+    def test_insert_visible(self):
+        self.assertFalse(lookup_filter.might_exist('name', 'susan'))
+        u = User(email='susan@example.com', name='susan', password='dog')
+        db.session.add(u)
+        db.session.commit()
+        self.assertTrue(lookup_filter.might_exist('name', 'susan'))
+        # Mudança de nome: o novo valor também entra, e os outros processos são avisados.
+        generation = cache.tag_version(lookup_filter.GENERATION_TAG)
+        u.name = 'susan2'
+        db.session.commit()
+        self.assertTrue(lookup_filter.might_exist('name', 'susan2'))
+        self.assertEqual(cache.tag_version(lookup_filter.GENERATION_TAG), generation + 1)
+
+    # Testa que um usuário criado por outro processo (sem eventos neste) entra no filtro na leitura pelo id.
+    def test_other_process_insert(self):
+        self.assertFalse(lookup_filter.might_exist('name', 'remote'))
+        db.session.execute(User.__table__.insert().values(email='remote@example.com', name='remote'))
+        db.session.commit()
+        # Antes do fim do intervalo, o filtro ainda não leu o usuário novo.
+        self.assertFalse(lookup_filter.might_exist('name', 'remote'))
+        lookup_filter.check_interval = 0
+        self.assertTrue(lookup_filter.might_exist('name', 'remote'))
+        self.assertFalse(lookup_filter.might_exist('name', 'nobody'))
+
+    # Testa que limpar o cache compartilhado não faz usuários existentes parecerem inexistentes.
+    def test_cache_clear(self):
+        lookup_filter.invalidate()
+        lookup_filter.check_interval = 0
+        self.assertTrue(lookup_filter.might_exist('name', 'nobody'))
+        self.wait_rebuild()
+        self.assertFalse(lookup_filter.might_exist('name', 'nobody'))
+        db.session.execute(User.__table__.insert().values(email='remote@example.com', name='remote'))
+        db.session.commit()
+        cache.clear()
+        self.assertTrue(lookup_filter.might_exist('name', 'remote'))
+        self.wait_rebuild()
+        self.assertTrue(lookup_filter.might_exist('name', 'remote'))
+        self.assertTrue(lookup_filter.might_exist('name', 'john'))
+        self.assertFalse(lookup_filter.might_exist('name', 'nobody'))
+
+    # Testa que a reconstrução descarta os valores removidos.
+    def test_rebuild_drops_deleted(self):
+        db.session.execute(User.__table__.insert().values(email='raw@example.com', name='raw'))
+        db.session.commit()
+        lookup_filter.rebuild(self.app)
+        self.assertTrue(lookup_filter.might_exist('name', 'raw'))
+        db.session.execute(User.__table__.delete().where(User.__table__.c.name == 'raw'))
+        db.session.commit()
+        self.assertTrue(lookup_filter.might_exist('name', 'raw'))
+        lookup_filter.rebuild(self.app)
+        self.assertFalse(lookup_filter.might_exist('name', 'raw'))
+
+    # Testa que uma mudança avisada pela tag libera as consultas e dispara a reconstrução.
+    def test_bulk_change(self):
+        lookup_filter.check_interval = 0
+        john = User.query.filter_by(name='john').one()
+        self.assertFalse(lookup_filter.might_exist('name', 'bulk'))
+        db.session.execute(User.__table__.update().where(User.__table__.c.id == john.id).values(name='bulk'))
+        db.session.commit()
+        lookup_filter.invalidate()
+        self.assertTrue(lookup_filter.might_exist('name', 'other'))
+        self.wait_rebuild()
+        self.assertTrue(lookup_filter.might_exist('name', 'bulk'))
+        self.assertFalse(lookup_filter.might_exist('name', 'john'))
+
+    # Testa que o filtro fica desligado com um cache por processo.
+    def test_requires_shared_cache(self):
+        self.app.config['CACHE_BACKEND'] = 'memory'
+        cache.init_app(self.app)
+        lookup_filter.init_app(self.app)
+        self.assertFalse(lookup_filter.enabled)
+        self.assertTrue(lookup_filter.might_exist('name', 'nobody'))
+
+    # Testa a rota de administração com as estatísticas do filtro.
+    def test_admin_route(self):
+        admin = User(email='admin@example.com', password='cat', confirmed=True,
+                     role=Role.query.filter_by(name='Administrator').first())
+        db.session.add(admin)
+        db.session.commit()
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app_context.pop()
+        try:
+            client = self.app.test_client()
+            client.post('/', data={'name': 'nobody'})
+            client.post('/auth/login', data={'email': 'admin@example.com', 'password': 'cat'})
+            stats = client.get('/admin/lookup-filter').get_json()
+        finally:
+            self.app_context.push()
+        self.assertEqual(stats['name']['skipped'], 1)
+        self.assertIn('estimated_false_positive_rate', stats['name'])
+        self.assertGreater(stats['name']['bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from app import create_app, db, outbox
+from app.models import User, Role, OutboxMessage
+from app.email import send_email, request_email, QUEUED, COALESCED, THROTTLED
+from extensions import mail
+
+# Define uma suíte de testes para a fila de saída de e-mails.
+class OutboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # Os templates de e-mail usam url_for(_external=True), que precisa de um contexto de requisição.
+        self.request_context = self.app.test_request_context()
+        self.request_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.user = User(email='john@example.com', password='cat')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.request_context.pop()
+
+    def _enqueue(self, **kwargs):
+        token = self.user.generate_confirmation_token()
+        return send_email(self.user.email, 'Confirme sua conta', 'auth/email/confirm',
+                          user=self.user, token=token, **kwargs)
+
+    # Testa que a mensagem só é gravada quando a transação de quem chamou é efetivada.
+    def test_message_is_part_of_caller_transaction(self):
+        self._enqueue()
+        db.session.rollback()
+        self.assertEqual(OutboxMessage.query.count(), 0)
+        self._enqueue()
+        db.session.commit()
+        self.assertEqual(OutboxMessage.query.count(), 1)
+
+    # Testa que a mesma chave de idempotência não gera duas mensagens.
+    def test_idempotency_key(self):
+        m1 = self._enqueue(idempotency_key='abc')
+        db.session.commit()
+        m2 = self._enqueue(idempotency_key='abc')
+        db.session.commit()
+        self.assertEqual(m1.id, m2.id)
+        self.assertEqual(OutboxMessage.query.count(), 1)
+        # Sem chave, cada chamada é uma mensagem nova (o token muda a cada chamada).
+        self._enqueue()
+        self._enqueue()
+        db.session.commit()
+        self.assertEqual(OutboxMessage.query.count(), 3)
+
+    # Testa que o despachante envia a mensagem e a marca como enviada.
+    def test_dispatch_sends(self):
+        self._enqueue()
+        db.session.commit()
+        with mail.record_messages() as outbox_sent:
+            stats = outbox.drain(self.app)
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(len(outbox_sent), 1)
+        self.assertEqual(outbox_sent[0].recipients, ['john@example.com'])
+        self.assertEqual(OutboxMessage.query.first().status, OutboxMessage.SENT)
+
+    # Testa as retentativas com espera exponencial e o dead letter.
+    def test_retry_and_dead_letter(self):
+        self.app.config['FLASKY_OUTBOX_MAX_ATTEMPTS'] = 2
+        self._enqueue()
+        db.session.commit()
+        with mock.patch('flask_mail.Connection.send', side_effect=RuntimeError('smtp down')):
+            stats = outbox.dispatch(self.app)
+            self.assertEqual(stats['retried'], 1)
+            msg = OutboxMessage.query.first()
+            self.assertEqual(msg.status, OutboxMessage.PENDING)
+            self.assertEqual(msg.attempts, 1)
+            self.assertGreater(msg.next_attempt_at, datetime.utcnow())
+            # Antes do fim da espera, a mensagem não é retentada.
+            self.assertEqual(outbox.dispatch(self.app)['retried'], 0)
+            msg.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            stats = outbox.dispatch(self.app)
+        self.assertEqual(stats['dead'], 1)
+        msg = OutboxMessage.query.first()
+        self.assertEqual(msg.status, OutboxMessage.DEAD)
+        self.assertEqual(msg.last_error, 'smtp down')
+
+    # Testa que uma mensagem reservada por um despachante que morreu volta à fila quando a reserva expira.
+    def test_expired_claim_is_reclaimed(self):
+        msg = self._enqueue()
+        db.session.commit()
+        msg.status = OutboxMessage.SENDING
+        msg.claimed_by = 'dead-worker'
+        msg.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        self.assertEqual(outbox.drain(self.app)['sent'], 1)
+
+    def _request(self, template='auth/email/confirm'):
+        return request_email(self.user.email, 'Assunto', template, email=self.user.email)
+
+    # Testa que pedidos repetidos dentro da janela são agrupados na mensagem já enfileirada.
+    def test_request_email_coalesces(self):
+        results = [self._request() for _ in range(10)]
+        db.session.commit()
+        self.assertEqual(results, [QUEUED] + [COALESCED] * 9)
+        msg = OutboxMessage.query.one()
+        self.assertEqual(msg.coalesced, 9)
+        # Nada foi renderizado durante os pedidos: o corpo (e o token) são gerados no envio.
+        self.assertIsNone(msg.body)
+        # Outro template não é agrupado.
+        self.assertEqual(self._request('auth/email/reset_password'), QUEUED)
+        # Depois da janela, um novo pedido gera outra mensagem (mesmo que a anterior já tenha sido enviada).
+        with mail.record_messages() as sent:
+            outbox.drain(self.app)
+        self.assertEqual(len(sent), 2)
+        self.assertIn('/auth/confirm/', sent[0].body)
+        self.assertEqual(self._request(), COALESCED)
+        self.assertEqual(self._request(), COALESCED)
+        window = self.app.config['FLASKY_MAIL_DEDUP_WINDOW']
+        with mock.patch('app.email.datetime', wraps=datetime) as clock:
+            clock.utcnow.return_value = datetime.utcnow() + timedelta(seconds=window + 1)
+            self.assertEqual(self._request(), QUEUED)
+
+    # Testa a corrida entre dois pedidos: o segundo INSERT, com a mesma chave, vira COALESCED.
+    def test_request_email_race(self):
+        # Relógio parado: os dois pedidos caem na mesma fatia da janela.
+        clock = mock.patch('app.email.datetime', wraps=datetime)
+        clock.start().utcnow.return_value = datetime.utcnow()
+        self.addCleanup(clock.stop)
+        self.assertEqual(self._request(), QUEUED)
+        db.session.commit()
+        msg = OutboxMessage.query.one()
+        # Esconde a mensagem da consulta, como se o outro pedido ainda não tivesse feito commit.
+        msg.created_at = datetime.utcnow() - timedelta(days=1)
+        db.session.commit()
+        self.assertEqual(self._request(), COALESCED)
+        db.session.commit()
+        msg = OutboxMessage.query.one()
+        self.assertEqual(msg.coalesced, 1)
+        # A transação de quem chamou continua utilizável.
+        self.assertEqual(self._request('auth/email/reset_password'), QUEUED)
+        db.session.commit()
+        self.assertEqual(OutboxMessage.query.count(), 2)
+
+    # Testa a cota por destinatário e o relatório dos pedidos suprimidos.
+    def test_request_email_quota(self):
+        self.app.config.update(FLASKY_MAIL_DEDUP_WINDOW=0, FLASKY_MAIL_QUOTA=3)
+        results = [self._request() for _ in range(5)]
+        db.session.commit()
+        self.assertEqual(results, [QUEUED] * 3 + [THROTTLED] * 2)
+        self.assertEqual([m.throttled for m in OutboxMessage.query.order_by(OutboxMessage.id)], [0, 0, 2])
+        stats = outbox.stats()
+        self.assertEqual(stats['status'], {OutboxMessage.PENDING: 3})
+        self.assertEqual(stats['templates']['auth/email/confirm'],
+                         {'messages': 3, 'coalesced': 0, 'throttled': 2})
+        # Fora do período da cota, os pedidos voltam a ser aceitos.
+        self.app.config['FLASKY_MAIL_QUOTA_PERIOD'] = 0
+        self.assertEqual(self._request(), QUEUED)
+
+    # Testa a rota de redefinição de senha: vários envios do formulário geram um único e-mail.
+    def test_password_reset_request_coalesces(self):
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        client = self.app.test_client()
+        for _ in range(3):
+            response = client.post('/auth/reset', data={'email': 'john@example.com'})
+            self.assertEqual(response.status_code, 302)
+        msg = OutboxMessage.query.one()
+        self.assertEqual((msg.template, msg.coalesced), ('auth/email/reset_password', 2))
+        with mail.record_messages() as sent:
+            outbox.drain(self.app)
+        self.assertIn('/auth/reset/', sent[0].body)
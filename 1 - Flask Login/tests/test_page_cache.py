@@ -0,0 +1,82 @@
+# Importa os módulos necessários para os testes.
+import re
+import unittest
+from app import create_app, db, page_cache
+from app.models import Role, User
+
+# Define uma suíte de testes para o cache de página inteira.
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['FLASKY_PAGE_CACHE'] = True
+        # O contexto de aplicação não fica ativo durante as requisições: cada requisição
+        # precisa do seu próprio 'g', onde o Flask-WTF guarda o token CSRF.
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+        page_cache.clear()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _csrf(self, response):
+        return re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                         response.get_data(as_text=True)).group(1)
+
+    # Testa que a segunda requisição vem do cache, com um token CSRF válido e próprio do visitante.
+    def test_hit_fills_csrf_token(self):
+        first = self.client.get('/auth/login')
+        self.assertEqual(first.headers['X-Page-Cache'], 'MISS')
+        other = self.app.test_client()
+        second = other.get('/auth/login')
+        self.assertEqual(second.headers['X-Page-Cache'], 'HIT')
+        self.assertNotIn('\x00', second.get_data(as_text=True))
+        self.assertNotEqual(self._csrf(first), self._csrf(second))
+        # O token servido a partir do cache precisa ser aceito pelo formulário.
+        response = other.post('/auth/login', data={'csrf_token': self._csrf(second),
+                                                   'email': 'nobody@example.com',
+                                                   'password': 'cat'})
+        self.assertIn('E-mail ou senha inv', response.get_data(as_text=True))
+
+    # Testa que mensagens flash fazem o cache ser ignorado.
+    def test_flashes_bypass(self):
+        self.client.get('/auth/login')
+        with self.client.session_transaction() as sess:
+            sess['_flashes'] = [('message', 'Aviso')]
+        response = self.client.get('/auth/login')
+        self.assertEqual(response.headers['X-Page-Cache'], 'BYPASS')
+        self.assertIn('Aviso', response.get_data(as_text=True))
+
+    # Testa que usuários autenticados não recebem a página do cache.
+    def test_authenticated_bypass(self):
+        with self.app.app_context():
+            u = User(email='john@example.com', password='cat', confirmed=True)
+            db.session.add(u)
+            db.session.commit()
+            user_id = u.id
+        self.client.get('/')
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+        response = self.client.get('/')
+        self.assertEqual(response.headers['X-Page-Cache'], 'BYPASS')
+
+    # Testa que o cookie "lembrar de mim" faz o cache ser ignorado, ao servir e ao guardar.
+    def test_remember_cookie_bypass(self):
+        self.client.set_cookie('remember_token', '1|abc')
+        response = self.client.get('/')
+        self.assertEqual(response.headers['X-Page-Cache'], 'BYPASS')
+        response = self.app.test_client().get('/')
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/').headers['X-Page-Cache'], 'BYPASS')
+
+    # Testa os contadores de acerto.
+    def test_stats(self):
+        for i in range(4):
+            self.app.test_client().get('/')
+        stats = page_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['hit_ratio'], 0.75)
@@ -0,0 +1,123 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from flask_login import login_user
+from werkzeug.exceptions import Forbidden
+from app import create_app, db
+from app.models import Identity, Permission, Role, User
+from app.models.decorators import permission_required
+from app.models.role import effective_permissions
+
+# Define uma suíte de testes para o registro de permissões e a herança de papéis.
+class PermissionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def role(self, name):
+        return Role.query.filter_by(name=name).first()
+
+    # Testa o registro de novas permissões, que recebem o próximo bit livre.
+    def test_registry(self):
+        perm = Permission.register('test_registry')
+        self.assertEqual(Permission.register('TEST_REGISTRY'), perm)
+        self.assertEqual(Permission.TEST_REGISTRY, perm)
+        self.assertGreater(perm, Permission.ADMIN)
+        self.assertEqual(perm & (perm - 1), 0)
+        self.assertEqual(Permission.mask('follow', Permission.WRITE), Permission.FOLLOW | Permission.WRITE)
+        self.assertEqual(Permission.names(Permission.FOLLOW | perm), ['FOLLOW', 'TEST_REGISTRY'])
+
+    # Testa que insert_roles declara só o que cada papel acrescenta e que a herança completa o resto.
+    def test_inherited_roles(self):
+        moderator, admin = self.role('Moderator'), self.role('Administrator')
+        self.assertEqual(moderator.permissions, Permission.MODERATE)
+        self.assertEqual([r.name for r in moderator.parents], ['User'])
+        self.assertEqual(admin.effective_permissions, Permission.mask('FOLLOW', 'COMMENT', 'WRITE',
+                                                                      'MODERATE', 'ADMIN'))
+        self.assertTrue(moderator.can(Permission.WRITE))
+        self.assertFalse(moderator.has_permission(Permission.WRITE))
+        self.assertFalse(moderator.can(Permission.ADMIN))
+        # Rodar de novo não muda nada.
+        Role.insert_roles()
+        self.assertEqual(Role.query.count(), 3)
+        self.assertEqual(self.role('Moderator').effective_permissions,
+                         Permission.mask('FOLLOW', 'COMMENT', 'WRITE', 'MODERATE'))
+
+    # Testa que uma permissão além de 64 bits é gravada e lida sem perdas.
+    def test_wide_bitset(self):
+        wide = 1 << 100
+        self.role('User').add_permission(wide)
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(self.role('User').permissions & wide, wide)
+        self.assertTrue(self.role('Administrator').can(wide | Permission.ADMIN))
+        u = User(email='john@example.com', password='cat')
+        db.session.add(u)
+        db.session.commit()
+        self.assertTrue(u.can(wide))
+        self.assertTrue(Identity.load(u.id).can(wide))
+
+    # Testa que mudar um papel herdado recalcula os descendentes e incrementa as claims dos usuários deles.
+    def test_change_propagates(self):
+        u = User(email='john@example.com', password='cat', role=self.role('Administrator'))
+        db.session.add(u)
+        db.session.commit()
+        version = u.claims_version
+        self.role('User').remove_permission(Permission.COMMENT)
+        db.session.commit()
+        self.assertFalse(u.can(Permission.COMMENT))
+        self.assertTrue(u.can(Permission.MODERATE))
+        self.assertEqual(u.claims_version, version + 1)
+        # Mudanças que não alteram as permissões efetivas não incrementam as claims.
+        self.role('User').default = True
+        self.role('Administrator').add_permission(Permission.FOLLOW)
+        db.session.commit()
+        self.assertEqual(u.claims_version, version + 1)
+
+    # Testa que remover um papel herdado recalcula os papéis que herdavam dele.
+    def test_delete_parent(self):
+        db.session.delete(self.role('Moderator'))
+        db.session.commit()
+        admin = self.role('Administrator')
+        self.assertEqual(admin.parents, [])
+        self.assertEqual(admin.effective_permissions, Permission.ADMIN)
+
+    # Testa que ciclos na herança são recusados.
+    def test_cycle(self):
+        user, admin = self.role('User'), self.role('Administrator')
+        user.parents.append(admin)
+        with self.assertRaises(ValueError):
+            db.session.commit()
+        db.session.rollback()
+        self.assertEqual(self.role('User').parents, [])
+
+    # Testa o cálculo diretamente, com um grafo em diamante.
+    def test_closure_diamond(self):
+        a, b, c, d = (Role(name=n, permissions=p) for n, p in (('a', 1), ('b', 2), ('c', 4), ('d', 8)))
+        b.parents, c.parents, d.parents = [a], [a], [b, c]
+        self.assertEqual(effective_permissions([a, b, c, d])[d], 15)
+        # Papéis fora do conjunto (ex: removidos) são ignorados.
+        self.assertEqual(effective_permissions([b, c, d])[d], 14)
+
+    # Testa o decorador com o nome de uma permissão.
+    def test_permission_required_by_name(self):
+        view = permission_required('moderate')(lambda: 'ok')
+        u = User(email='john@example.com', password='cat', role=self.role('Moderator'))
+        db.session.add(u)
+        db.session.commit()
+        with self.app.test_request_context():
+            login_user(u)
+            self.assertEqual(view(), 'ok')
+            with self.assertRaises(Forbidden):
+                permission_required('admin')(lambda: 'ok')()
+
+
+if __name__ == '__main__':
+    unittest.main()
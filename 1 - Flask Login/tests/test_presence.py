@@ -0,0 +1,70 @@
+# Importa os módulos necessários para os testes.
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db, presence
+from app.models import Role, User
+from app.presence import PresenceTracker
+
+# Define uma suíte de testes para o rastreador de presença.
+class PresenceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            db.session.add_all([
+                User(email=self.app.config['FLASKY_ADMIN'], password='cat', confirmed=True),
+                User(email='john@example.com', password='cat', confirmed=True),
+            ])
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Testa as janelas deslizantes e a reutilização dos baldes do buffer circular.
+    def test_sliding_windows(self):
+        t = 1_000_000 * 60
+        self.assertTrue(presence.record(1, now=t))
+        self.assertFalse(presence.record(1, now=t + 30))
+        presence.record(2, now=t + 4 * 60)
+        self.assertEqual(presence.count(1, now=t + 4 * 60), 1)
+        self.assertEqual(presence.active_users(5, now=t + 4 * 60), {1, 2})
+        self.assertFalse(presence.is_online(1, minutes=5, now=t + 5 * 60))
+        # Uma volta inteira no buffer: o balde antigo não conta mais.
+        self.assertEqual(presence.count(1, now=t + presence.window * 60), 0)
+
+    # Testa o backend SQLite, que agrega a atividade de vários processos.
+    def test_sqlite_backend(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            self.app.config['FLASKY_PRESENCE_BACKEND'] = 'sqlite'
+            self.app.config['FLASKY_PRESENCE_SQLITE_PATH'] = os.path.join(tmpdir, 'presence.sqlite')
+            worker1, worker2 = PresenceTracker(self.app), PresenceTracker(self.app)
+            worker1.record(1, now=600)
+            worker2.record(2, now=600)
+            self.assertEqual(worker1.active_users(5, now=660), {1, 2})
+        finally:
+            shutil.rmtree(tmpdir)
+
+    # Testa que as requisições registram a presença e que a página de administração a exibe.
+    def test_online_page(self):
+        response = self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        self.assertEqual(response.status_code, 302)
+        self.client.get('/')
+        with self.app.app_context():
+            john = User.query.filter_by(email='john@example.com').first()
+            self.assertTrue(presence.is_online(john.id))
+        self.assertIn(b'online</span>', self.client.get(f'/user/{john.id}').data)
+        # Apenas administradores acessam a lista.
+        self.assertEqual(self.client.get('/admin/online').status_code, 403)
+        admin = self.app.test_client()
+        admin.post('/auth/login', data={'email': self.app.config['FLASKY_ADMIN'], 'password': 'cat'})
+        response = admin.get('/admin/online?minutes=15')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'john@example.com', response.data)
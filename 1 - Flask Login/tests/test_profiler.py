@@ -0,0 +1,62 @@
+# Importa os módulos necessários para os testes.
+import shutil
+import tempfile
+import time
+import unittest
+from app import create_app, db, profiler
+from app.models import Role, User
+from app.profiler import aggregate_profiles
+
+# Define uma suíte de testes para o profiler por amostragem de pilha.
+class ProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.tmpdir = tempfile.mkdtemp()
+        self.app.config['FLASKY_PROFILER_DIR'] = self.tmpdir
+        self.app.config['FLASKY_PROFILER_INTERVAL'] = 0.001
+
+        # Uma rota lenta o bastante para ser amostrada várias vezes.
+        @self.app.route('/slow')
+        def slow():
+            time.sleep(0.05)
+            return 'ok'
+
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            admin = User(email='admin@example.com', password='cat',
+                         role=Role.query.filter_by(name='Administrator').first())
+            user = User(email='john@example.com', password='cat')
+            db.session.add_all([admin, user])
+            db.session.commit()
+            self.token = profiler.generate_token(admin)
+            # Somente administradores recebem tokens de profiling.
+            with self.assertRaises(ValueError):
+                profiler.generate_token(user)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.tmpdir)
+
+    # Testa que uma requisição com token válido é perfilada e agregada em collapsed stacks.
+    def test_signed_header_profiles_request(self):
+        self.client.get('/slow', headers={'X-Flasky-Profile': self.token})
+        stacks = aggregate_profiles(self.tmpdir, 'slow')
+        self.assertTrue(stacks)
+        self.assertTrue(any(stack.split(';')[-1].startswith('slow ') for stack in stacks))
+
+    # Testa que tokens inválidos e requisições comuns não são perfiladas.
+    def test_invalid_or_missing_token(self):
+        self.client.get('/slow', headers={'X-Flasky-Profile': 'forged'})
+        self.client.get('/slow')
+        self.assertFalse(aggregate_profiles(self.tmpdir))
+
+    # Testa a amostragem por configuração.
+    def test_sample_rate(self):
+        self.app.config['FLASKY_PROFILER'] = True
+        self.app.config['FLASKY_PROFILER_SAMPLE_RATE'] = 1.0
+        self.client.get('/slow')
+        self.assertTrue(aggregate_profiles(self.tmpdir, 'slow'))
@@ -0,0 +1,49 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from app import create_app, db, outbox
+from app.models import Role, User, OutboxMessage
+from extensions import mail
+
+# Define uma suíte de testes para o registro com unicidade garantida pelo banco e e-mail adiado.
+class RegisterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _register(self, email='john@example.com'):
+        return self.client.post('/auth/register', base_url='https://flasky.example.com',
+                                data={'email': email, 'name': 'John', 'password': 'cat', 'password2': 'cat'})
+
+    # Testa que o e-mail de confirmação é gravado sem corpo e renderizado pelo despachante.
+    def test_confirmation_is_deferred(self):
+        self.assertEqual(self._register().status_code, 302)
+        with self.app.app_context():
+            msg = OutboxMessage.query.one()
+            self.assertIsNone(msg.body)
+            self.assertEqual(msg.recipient, 'john@example.com')
+            with mail.record_messages() as sent:
+                self.assertEqual(outbox.drain(self.app)['sent'], 1)
+            # O link usa a URL da requisição de origem e o token é válido para o usuário.
+            token = sent[0].body.split('https://flasky.example.com/auth/confirm/')[-1].split()[0]
+            user = User.query.filter_by(email='john@example.com').one()
+            self.assertTrue(user.confirm(token))
+            self.assertIsNotNone(OutboxMessage.query.one().body)
+
+    # Testa que um e-mail repetido vira erro do formulário, sem gravar usuário nem mensagem.
+    def test_duplicate_email(self):
+        self._register()
+        response = self._register()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('O e-mail já está em uso.', response.get_data(as_text=True))
+        with self.app.app_context():
+            self.assertEqual(User.query.count(), 1)
+            self.assertEqual(OutboxMessage.query.count(), 1)
@@ -0,0 +1,93 @@
+# Importa os módulos necessários para os testes.
+import json
+import os
+import queue
+import shutil
+import tempfile
+import time
+import unittest
+from app import create_app, db, request_log
+from app.models import Role, User
+
+# Define uma suíte de testes para o registro estruturado de requisições.
+class RequestLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'requests.jsonl')
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config['FLASKY_REQUEST_LOG'] = self.path
+        self.app.config['FLASKY_REQUEST_LOG_SAMPLING'] = {'main.index': 0.0}
+        # Inicializa de novo, agora com um caminho configurado, para iniciar a thread de gravação.
+        request_log.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            db.session.add(User(email='john@example.com', password='cat', confirmed=True))
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        request_log.close()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.tmpdir)
+
+    def _records(self):
+        # Fecha o registro para garantir que tudo o que estava na fila foi gravado.
+        request_log.close()
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    # Testa que acessos e eventos de autenticação são gravados, respeitando a amostragem.
+    def test_access_and_auth_records(self):
+        self.client.get('/')
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'dog'})
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        self.client.get('/auth/logout')
+        records = self._records()
+        access = [r for r in records if r['t'] == 'access']
+        auth = [(r['event'], r['ok']) for r in records if r['t'] == 'auth']
+        self.assertEqual(auth, [('login', False), ('login', True), ('logout', True)])
+        # main.index tem taxa de amostragem 0, então nunca aparece.
+        self.assertNotIn('main.index', [r['endpoint'] for r in access])
+        self.assertIn('auth.login', [r['endpoint'] for r in access])
+        self.assertGreaterEqual(request_log.stats()['sampled_out'], 1)
+
+    # Testa que, com a fila cheia, os registros são descartados e contados em vez de bloquear.
+    def test_overflow_is_counted(self):
+        # Troca a fila por uma já cheia, que a thread de gravação não consome.
+        writer_queue = request_log._queue
+        request_log._queue = queue.Queue(maxsize=1)
+        request_log._queue.put({'t': 'filler'})
+        before = request_log.stats()['dropped']
+        with self.app.test_request_context():
+            request_log.auth_event('login', ok=True)
+        self.assertEqual(request_log.stats()['dropped'], before + 1)
+        request_log._queue = writer_queue
+
+    # Testa que um registro que não vira JSON é descartado e contado, sem parar a thread de gravação.
+    def test_write_error_is_counted(self):
+        before = request_log.stats()
+
+        def wait_for(name, n):
+            deadline = time.monotonic() + 5
+            while request_log.stats()[name] < before[name] + n and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        writer = request_log._writer
+        request_log._enqueue({'t': 'auth', 'event': object()})
+        with self.app.test_request_context():
+            request_log.auth_event('login', ok=True)
+        wait_for('written', 1)
+        # Uma falha de E/S (arquivo fechado) perde o lote, e o arquivo é reaberto para os próximos.
+        writer.stream.close()
+        request_log._enqueue({'t': 'auth', 'event': 'lost'})
+        wait_for('errors', 2)
+        with self.app.test_request_context():
+            request_log.auth_event('logout', ok=True)
+        self.assertTrue(writer.is_alive())
+        records = self._records()
+        self.assertEqual([r['event'] for r in records], ['login', 'logout'])
+        self.assertEqual(request_log.stats()['errors'], before['errors'] + 2)
@@ -0,0 +1,61 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from app import create_app, db
+from app.models import User, Role
+from app.search import search_users, rebuild
+
+# Define uma suíte de testes para a busca de usuários.
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        db.session.add_all([
+            User(email='maria@example.com', name='Maria Silva', location='Porto Alegre'),
+            User(email='joao@example.com', name='João Souza', location='Recife',
+                 about_me='Gosto de Python e de Porto Alegre'),
+            User(email='ana@example.com', name='Ana Lima', location='Salvador'),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _names(self, query):
+        return [u.name for u in search_users(query)[0]]
+
+    # Testa a busca por prefixo, sem acentos, e a ordenação por relevância (nome > localização > biografia).
+    def test_prefix_and_ranking(self):
+        self.assertEqual(self._names('mar'), ['Maria Silva'])
+        self.assertEqual(self._names('joao'), ['João Souza'])
+        self.assertEqual(self._names('porto'), ['Maria Silva', 'João Souza'])
+        # Operadores FTS5 digitados pelo usuário são tratados como texto.
+        self.assertEqual(self._names('ana OR "'), [])
+
+    # Testa que os gatilhos mantêm o índice sincronizado com a tabela.
+    def test_index_follows_changes(self):
+        ana = User.query.filter_by(email='ana@example.com').first()
+        ana.location = 'Curitiba'
+        db.session.commit()
+        self.assertEqual(self._names('curitiba'), ['Ana Lima'])
+        self.assertEqual(self._names('salvador'), [])
+        db.session.delete(ana)
+        db.session.commit()
+        self.assertEqual(self._names('ana'), [])
+
+    # Testa a reconstrução em lotes.
+    def test_rebuild(self):
+        self.assertEqual(rebuild(batch_size=2), 3)
+        self.assertEqual(self._names('recife'), ['João Souza'])
+        db.session.add(User(email='bia@example.com', name='Beatriz Recife'))
+        db.session.commit()
+        self.assertEqual(len(self._names('recife')), 2)
+
+    # Testa que a rota de busca é restrita a moderadores.
+    def test_search_endpoint_requires_moderator(self):
+        client = self.app.test_client()
+        self.assertEqual(client.get('/search?q=mar').status_code, 302)
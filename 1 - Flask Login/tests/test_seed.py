@@ -0,0 +1,64 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from datetime import datetime
+from app import create_app, db
+from app.models import Identity, Role, User
+from app.search import search_users
+from app.seed import seed_users
+
+# Define uma suíte de testes para o gerador de usuários sintéticos ('flask seed').
+class SeedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def dump(self):
+        return [(u.id, u.email, u.name, u.location, u.about_me, u.member_since, u.last_seen, u.role_id,
+                 u.confirmed) for u in User.query.order_by(User.id)]
+
+    # Testa que a mesma semente gera exatamente os mesmos usuários, e outra semente não.
+    def test_deterministic(self):
+        self.assertEqual(seed_users(500, seed=7, batch_size=128), 500)
+        first = self.dump()
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        seed_users(500, seed=7, batch_size=64)
+        self.assertEqual(self.dump(), first)
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        seed_users(500, seed=8)
+        self.assertNotEqual(self.dump(), first)
+
+    # Testa a distribuição dos dados gerados e que as contas funcionam como as criadas pelo registro.
+    def test_realistic_rows(self):
+        seed_users(2000, seed=1, anchor=datetime(2025, 1, 1), confirmed_ratio=0.8)
+        users = User.query.all()
+        confirmed = sum(u.confirmed for u in users)
+        self.assertTrue(1400 < confirmed < 1800)
+        roles = {r.id: r.name for r in Role.query}
+        self.assertEqual({roles[u.role_id] for u in users} >= {'User', 'Moderator'}, True)
+        self.assertTrue(all(u.member_since <= u.last_seen <= datetime(2025, 1, 1) for u in users))
+        # Cauda longa: a maioria foi vista no último dia, mas há contas inativas há meses.
+        idle_days = sorted((datetime(2025, 1, 1) - u.last_seen).days for u in users)
+        self.assertEqual(idle_days[len(idle_days) // 2], 0)
+        self.assertGreater(idle_days[-1], 30)
+        user = users[0]
+        self.assertTrue(user.verify_password('cat'))
+        self.assertEqual(User.id_by_email(user.email), user.id)
+        self.assertEqual(Identity.load(user.id).email, user.email)
+        # O índice de busca foi reconstruído com os usuários carregados.
+        self.assertIn(user, search_users(user.name.split()[0], per_page=2000)[0])
+        # Só domínios reservados para exemplos.
+        self.assertEqual({u.email.rsplit('@', 1)[1] for u in users}, {'example.com', 'example.org', 'example.net'})
+        # As conexões devolvidas ao pool voltam com o PRAGMA synchronous original.
+        with db.engine.connect() as conn:
+            self.assertNotEqual(conn.exec_driver_sql('PRAGMA synchronous').scalar(), 0)
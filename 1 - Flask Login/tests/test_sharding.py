@@ -0,0 +1,115 @@
+# Importa os módulos necessários para os testes.
+import os
+import unittest
+from unittest import mock
+import sqlalchemy as sa
+from config import TestingConfig
+from app import create_app, db, shards
+from app.models import Identity, Role, User
+from app.search import search_users
+from sharding import ShardRoutingError
+
+# Define uma suíte de testes para o particionamento da tabela de usuários.
+class ShardingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = self._create_app(3)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        Role.insert_roles()
+        self.emails = [f'user{i}@example.com' for i in range(12)]
+        for email in self.emails:
+            db.session.add(User(email=email, name=email.split('@')[0], password='cat', confirmed=True))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        for shard in range(shards.count):
+            db.metadata.drop_all(shards.engine(shard))
+        self.app_context.pop()
+        # Remove os arquivos dos shards adicionais.
+        for shard in range(1, 4):
+            path = sa.engine.make_url(shards.uri(shard, self.app)).database
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _create_app(self, count):
+        with mock.patch.object(TestingConfig, 'FLASKY_USER_SHARDS', count):
+            return create_app('testing')
+
+    def _rows(self, shard):
+        with shards.engine(shard).connect() as conn:
+            return {row.email: row.id for row in conn.execute(sa.text('SELECT id, email FROM users'))}
+
+    # Testa que cada usuário é gravado no shard do seu e-mail e que o id codifica o mesmo shard.
+    def test_rows_are_partitioned(self):
+        placed = {}
+        for shard in range(3):
+            for email, user_id in self._rows(shard).items():
+                self.assertEqual(shards.shard_of_key(email), shard)
+                self.assertEqual(shards.shard_of_id(user_id), shard)
+                placed[email] = user_id
+        self.assertEqual(sorted(placed), sorted(self.emails))
+        self.assertGreater(len({shards.shard_of_id(i) for i in placed.values()}), 1)
+        # Os papéis estão replicados em todos os shards.
+        with shards.engine(2).connect() as conn:
+            self.assertEqual(conn.execute(sa.text('SELECT count(*) FROM roles')).scalar(), 3)
+
+    # Testa as buscas roteadas por e-mail e por id, e o erro para consultas sem roteamento.
+    def test_routed_lookups(self):
+        user = User.get_by_email('user7@example.com')
+        self.assertEqual(user.name, 'user7')
+        self.assertEqual(Identity.load(user.id).email, 'user7@example.com')
+        self.assertTrue(User.reset_password(user.generate_reset_token(), 'dog'))
+        db.session.commit()
+        db.session.expire_all()
+        self.assertTrue(User.get_by_email('user7@example.com').verify_password('dog'))
+        with self.assertRaises(ShardRoutingError):
+            User.query.count()
+        self.assertEqual(sum(User.query.count() for _ in shards.each()), 12)
+        self.assertEqual([u.name for u in search_users('user11')[0]], ['user11'])
+
+    # Testa as rotas que buscam usuários: login, perfil e e-mail repetido no registro.
+    def test_views(self):
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        user_id = User.id_by_email('user3@example.com')
+        # As requisições usam o seu próprio contexto de aplicação (e o seu próprio 'g').
+        db.session.remove()
+        self.app_context.pop()
+        try:
+            client = self.app.test_client()
+            client.post('/auth/login', data={'email': 'user3@example.com', 'password': 'cat'})
+            self.assertIn(b'user3', client.get(f'/user/{user_id}').data)
+            response = client.post('/auth/register', data={'email': 'user5@example.com', 'name': 'Outro',
+                                                           'password': 'cat', 'password2': 'cat'})
+            self.assertIn('O e-mail já está em uso.', response.get_data(as_text=True))
+        finally:
+            self.app_context = self.app.app_context()
+            self.app_context.push()
+
+    # Testa o rebalanceamento ao passar de 3 para 2 shards: nenhum id muda e todos continuam acessíveis.
+    def test_rebalance(self):
+        before = {email: User.id_by_email(email) for email in self.emails}
+        db.session.remove()
+        self.app_context.pop()
+        self.app = self._create_app(2)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.assertEqual(shards.rebalance(previous=3) > 0, True)
+        self.assertEqual(shards.rebalance(previous=3), 0)
+        for email, user_id in before.items():
+            self.assertEqual(shards.shard_of_id(user_id), shards.shard_of_key(email))
+            self.assertEqual(self._rows(shards.shard_of_id(user_id))[email], user_id)
+            with shards.route_id(user_id):
+                self.assertEqual(db.session.get(User, user_id).email, email)
+        # Novos usuários continuam recebendo ids inéditos.
+        db.session.add(User(email='user0@example.org', name='new', password='cat'))
+        db.session.commit()
+        self.assertNotIn(User.id_by_email('user0@example.org'), before.values())
+
+    # Testa a reprodução de tráfego com os usuários em vários shards.
+    def test_replay(self):
+        from app.traffic import replay
+        records = [{'ts': 100.0, 'method': 'GET', 'endpoint': 'main.user', 'rule': '/user/<int:id>',
+                    'args': {'id': 'int'}, 'status': 200, 'ms': 1.0, 'bucket': 'anon'}]
+        results = replay(self.app, records, speed=0, seed=1)
+        self.assertEqual(results['requests'], 1)
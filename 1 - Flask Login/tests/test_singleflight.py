@@ -0,0 +1,133 @@
+# Importa os módulos necessários para os testes.
+import threading
+import time
+import unittest
+from unittest import mock
+from app import create_app, db, flights
+from app.models import Identity, Role, User
+from singleflight import SingleFlight
+
+
+# Executa 'target' em várias threads, iniciadas quase ao mesmo tempo, e retorna os resultados.
+def run_threads(target, count=5):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+    for t in threads:
+        t.start()
+        time.sleep(0.005)
+    for t in threads:
+        t.join()
+    return results
+
+
+# Define uma suíte de testes para o agrupamento (single-flight) de leituras simultâneas.
+class SingleFlightTestCase(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = []
+
+    def slow(self, value, delay=0.1):
+        self.calls.append(value)
+        time.sleep(delay)
+        return value
+
+    # Testa que chamadas simultâneas com a mesma chave executam a função uma única vez.
+    def test_coalesce(self):
+        results = run_threads(lambda: self.flights.do('test', 1, self.slow, 'x'))
+        self.assertEqual(results, ['x'] * 5)
+        self.assertEqual(self.calls, ['x'])
+        self.assertEqual(self.flights.stats()['test']['coalesced'], 4)
+        # Depois que o líder termina, nada fica guardado.
+        self.flights.do('test', 1, self.slow, 'y', delay=0)
+        self.assertEqual(self.calls, ['x', 'y'])
+
+    # Testa que as seguidoras executam a função sozinhas se o líder demorar ou falhar.
+    def test_timeout_and_failure(self):
+        results = run_threads(lambda: self.flights.do('test', 1, self.slow, 'x', timeout=0.01), count=2)
+        self.assertEqual(results, ['x', 'x'])
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.flights.stats()['test']['timeouts'], 1)
+
+        def fail_once():
+            if not self.calls[2:]:
+                self.slow('falha')
+                raise ValueError('falha')
+            return 'ok'
+        errors = []
+
+        def call():
+            try:
+                return self.flights.do('test', 2, fail_once)
+            except ValueError as e:
+                errors.append(e)
+        results = run_threads(call, count=2)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('ok', results)
+        self.assertEqual(self.flights.stats()['test']['failures'], 1)
+
+    # Testa que uma chamada reentrante com a mesma chave não espera por si mesma.
+    def test_reentrant(self):
+        inner = lambda: self.flights.do('test', 1, lambda: 'inner', timeout=5)
+        start = time.monotonic()
+        self.assertEqual(self.flights.do('test', 1, inner), 'inner')
+        self.assertLess(time.monotonic() - start, 1)
+
+
+# Define uma suíte de testes para as leituras da aplicação que usam o single-flight.
+class SingleFlightAppTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            user = User(email='john@example.com', name='John', password='cat', confirmed=True)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Testa que carregamentos simultâneos da identidade fazem uma única consulta, e cada
+    # requisição recebe o seu próprio objeto.
+    def test_identity(self):
+        fetch = Identity._fetch.__func__
+
+        def slow_fetch(cls, user_id):
+            time.sleep(0.1)
+            return fetch(cls, user_id)
+
+        def load():
+            with self.app.app_context():
+                return Identity.load(self.user_id)
+
+        with mock.patch.object(Identity, '_fetch', classmethod(slow_fetch)):
+            identities = run_threads(load, count=4)
+        self.assertEqual([i.email for i in identities], ['john@example.com'] * 4)
+        self.assertEqual(len({id(i) for i in identities}), 4)
+        self.assertEqual(flights.stats()['identity']['coalesced'], 3)
+
+    # Testa que perfis visitados ao mesmo tempo são renderizados com cópias do usuário na sessão de cada requisição.
+    def test_profile(self):
+        from app.main import views
+        load_profile = views._load_profile
+
+        def slow_load(id):
+            time.sleep(0.1)
+            return load_profile(id)
+
+        def visit(id):
+            # Um cliente logado por requisição (a sessão é montada direto, sem passar pelo login).
+            client = self.app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(self.user_id)
+            return client.get(f'/user/{id}')
+
+        with mock.patch.object(views, '_load_profile', slow_load):
+            responses = run_threads(lambda: visit(self.user_id), count=3)
+        self.assertEqual([r.status_code for r in responses], [200] * 3)
+        self.assertTrue(all(b'John' in r.data for r in responses))
+        self.assertEqual(flights.stats()['profile']['coalesced'], 2)
+        self.assertEqual(visit(999).status_code, 404)
@@ -0,0 +1,109 @@
+# Importa os módulos necessários para os testes.
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db, traffic
+from app.models import Role, User
+from app.seed import seed_users
+from app.traffic import load_capture, replay, summarize, compare
+
+# Define uma suíte de testes para a captura e a reprodução de tráfego.
+class TrafficTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'traffic.jsonl')
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config['FLASKY_TRAFFIC_CAPTURE'] = self.path
+        # Inicializa de novo, agora com um caminho configurado, para iniciar a thread de gravação.
+        traffic.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            Role.insert_roles()
+            seed_users(50, seed=1)
+            user = User(email='john@example.com', name='john', password='cat', confirmed=True)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        traffic.close()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.tmpdir)
+
+    def capture(self):
+        self.client.get('/')
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'cat'})
+        self.client.get(f'/user/{self.user_id}')
+        self.client.get('/search?q=silva')
+        self.client.get('/auth/logout')
+        self.client.post('/auth/login', data={'email': 'john@example.com', 'password': 'dog'})
+        # Fecha a captura para garantir que tudo o que estava na fila foi gravado.
+        traffic.close()
+        with open(self.path) as f:
+            text = f.read()
+        return text, load_capture([self.path])
+
+    # Testa que a captura grava o formato das requisições, sem e-mails, senhas ou ids.
+    def test_capture_is_anonymized(self):
+        text, records = self.capture()
+        self.assertNotIn('john', text)
+        self.assertNotIn('silva', text)
+        self.assertEqual([r['endpoint'] for r in records],
+                         ['main.index', 'auth.login', 'main.user', 'main.search', 'auth.logout', 'auth.login'])
+        login, profile, search = records[1], records[2], records[3]
+        self.assertEqual(login['bucket'], 'anon')
+        self.assertEqual(login['form'], {'email': 'email', 'password': 'password'})
+        self.assertRegex(login['as'], r'^user:\d+$')
+        self.assertEqual(profile['bucket'], login['as'])
+        self.assertEqual(profile['args'], {'id': 'self'})
+        self.assertEqual(search['query'], {'q': 'text:5'})
+        # O login com a senha errada não troca de usuário.
+        self.assertNotIn('as', records[5])
+
+    # Testa a reprodução: a mesma sequência, com os mesmos resultados (login aceito e recusado).
+    def test_replay(self):
+        _, records = self.capture()
+        results = replay(self.app, records, speed=0, seed=3)
+        endpoints = results['endpoints']
+        self.assertEqual(results['requests'], 6)
+        # Cada requisição reproduzida tem o mesmo status da capturada.
+        for record in records:
+            self.assertIn(str(record['status']), endpoints[record['endpoint']]['statuses'])
+        self.assertEqual(endpoints['auth.login']['statuses'], {'302': 1, '200': 1})
+        self.assertEqual(endpoints['main.user']['statuses'], {'200': 1})
+        self.assertEqual(len(endpoints['main.index']['samples']), 1)
+        # Uma segunda reprodução reaproveita as contas criadas para os baldes.
+        replay(self.app, records, speed=0, seed=3)
+        with self.app.app_context():
+            self.assertEqual(User.query.filter(User.email.like('replay.%')).count(), 1)
+
+    # Testa que a reprodução respeita os intervalos originais divididos pela velocidade.
+    def test_replay_speed(self):
+        records = [{'ts': 100.0 + i * 0.3, 'method': 'GET', 'endpoint': 'main.index', 'rule': '/',
+                    'status': 200, 'ms': 1.0, 'bucket': 'anon'} for i in range(3)]
+        self.assertGreaterEqual(replay(self.app, records, speed=3)['elapsed'], 0.2)
+        self.assertLess(replay(self.app, records, speed=0)['elapsed'], 0.2)
+
+    # Testa os percentis e a comparação entre duas versões.
+    def test_compare(self):
+        self.assertEqual(summarize(list(range(1, 101)))['p95'], 95)
+        samples = [float(i % 10 + 1) for i in range(100)]
+        base = {'endpoints': {'main.index': {'samples': samples, 'statuses': {'200': 100}},
+                              'main.user': {'samples': samples, 'statuses': {'200': 100}}}}
+        head = {'endpoints': {'main.index': {'samples': [s * 1.02 for s in samples], 'statuses': {'200': 100}},
+                              'main.user': {'samples': [s * 2 for s in samples], 'statuses': {'200': 100}}}}
+        rows = {row[0]: row for row in compare(base, head, threshold=0.1)}
+        self.assertTrue(rows['main.user'][5])
+        self.assertFalse(rows['main.index'][5])
+        # Erros 5xx novos contam como regressão mesmo sem piora na latência.
+        head['endpoints']['main.index']['statuses'] = {'200': 99, '500': 1}
+        self.assertTrue({row[0]: row for row in compare(base, head)}['main.index'][5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# Importa os módulos necessários para os testes.
+import unittest
+from sqlalchemy import inspect, text
+from werkzeug.security import generate_password_hash
+from app import create_app, db, upgrade
+from app.models import Permission, Role, User
+
+# Define uma suíte de testes para o acréscimo de colunas em bancos criados antes delas.
+class UpgradeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def columns(self, table):
+        return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+    def drop_columns(self, table, *columns):
+        # Simula um banco criado antes das colunas (o SQLite aceita DROP COLUMN desde a versão 3.35).
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for column in columns:
+                conn.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+
+    # Testa que a coluna que falta é criada uma única vez e que o login volta a funcionar.
+    def test_users_claims_version(self):
+        self.drop_columns('users', 'claims_version')
+        with db.engine.begin() as conn:
+            conn.execute(text('INSERT INTO users (email, password_hash, confirmed, role_id) '
+                              'VALUES (:email, :password_hash, 1, :role_id)'),
+                         {'email': 'john@example.com', 'password_hash': generate_password_hash('cat'),
+                          'role_id': Role.id_by_name('User')})
+        self.assertEqual(upgrade.init_app(self.app), {('users', 'claims_version')})
+        self.assertEqual(upgrade.init_app(self.app), set())
+        self.assertIn('claims_version', self.columns('users'))
+        self.assertEqual(User.query.filter_by(email='john@example.com').one().claims_version, 0)
+        response = self.app.test_client().post('/auth/login', data={'email': 'john@example.com',
+                                                                    'password': 'cat'})
+        self.assertEqual(response.status_code, 302)
+
+    # Testa que as permissões efetivas dos papéis existentes são calculadas junto com a coluna.
+    def test_roles_effective_permissions(self):
+        self.drop_columns('roles', 'effective_permissions')
+        self.assertEqual(upgrade.init_app(self.app), {('roles', 'effective_permissions')})
+        admin = Role.query.filter_by(name='Administrator').one()
+        self.assertTrue(admin.can(Permission.ADMIN))
+        self.assertTrue(admin.can(Permission.FOLLOW))
+        self.assertTrue(Role.query.filter_by(name='User').one().can(Permission.WRITE))
+
+    # Testa que as mensagens já na fila continuam legíveis depois de criar as colunas da fila de saída.
+    def test_outbox_columns(self):
+        from app.models.outbox import OutboxMessage
+        self.drop_columns('email_outbox', 'context', 'base_url', 'coalesced', 'throttled')
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO email_outbox (recipient, subject, body, status, attempts) "
+                              "VALUES ('john@example.com', 'Hi', 'Hello', 'pending', 0)"))
+        self.assertEqual(upgrade.init_app(self.app), {('email_outbox', 'context'),
+                                                      ('email_outbox', 'base_url'),
+                                                      ('email_outbox', 'coalesced'),
+                                                      ('email_outbox', 'throttled')})
+        self.assertEqual(upgrade.init_app(self.app), set())
+        message = OutboxMessage.query.one()
+        self.assertIsNone(message.context)
+        self.assertIsNone(message.base_url)
+        self.assertEqual((message.coalesced, message.throttled), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()